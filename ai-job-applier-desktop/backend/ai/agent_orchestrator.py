@@ -9,6 +9,8 @@ from enum import Enum
 import asyncio
 import time
 
+from ai.dag_executor import DAGExecutor, DAGNode
+
 class AgentRole(Enum):
     """Agent角色枚举"""
     PLANNER = "职业规划师"
@@ -25,10 +27,15 @@ class AgentTask:
     input_data: Dict[str, Any]
     dependencies: List[str]  # 依赖的其他任务
     priority: int  # 优先级
-    status: str = "pending"  # pending, running, completed, failed
+    status: str = "pending"  # pending, running, completed, failed, cancelled
     output: Optional[Dict] = None
     start_time: Optional[float] = None
     end_time: Optional[float] = None
+    task_id: Optional[str] = None  # 同一角色出现多次时用于区分，默认为角色名
+
+    def __post_init__(self):
+        if not self.task_id:
+            self.task_id = self.role.name
 
 class AgentOrchestrator:
     """
@@ -40,7 +47,9 @@ class AgentOrchestrator:
     5. 错误恢复 (Error Recovery)
     """
     
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 3, task_timeout_s: Optional[float] = 300):
+        self.max_concurrency = max_concurrency
+        self.task_timeout_s = task_timeout_s
         self.tasks: List[AgentTask] = []
         self.results: Dict[str, Any] = {}
         self.execution_log: List[Dict] = []
@@ -88,14 +97,15 @@ class AgentOrchestrator:
                 role=AgentRole.OPTIMIZER,
                 input_data={},
                 dependencies=["REVIEWER"],
-                priority=5
+                priority=5,
+                task_id="OPTIMIZER_2"
             ),
             
             # 阶段6: 面试辅导 (依赖二次优化)
             AgentTask(
                 role=AgentRole.COACH,
                 input_data={},
-                dependencies=["OPTIMIZER"],
+                dependencies=["OPTIMIZER_2"],
                 priority=6
             ),
             
@@ -113,18 +123,11 @@ class AgentOrchestrator:
     
     def get_ready_tasks(self) -> List[AgentTask]:
         """获取可以执行的任务（依赖已满足）"""
-        ready = []
-        for task in self.tasks:
-            if task.status == "pending":
-                # 检查依赖是否都完成
-                deps_satisfied = all(
-                    any(t.role.name == dep and t.status == "completed" 
-                        for t in self.tasks)
-                    for dep in task.dependencies
-                )
-                if deps_satisfied:
-                    ready.append(task)
-        return ready
+        completed = {t.task_id for t in self.tasks if t.status == "completed"}
+        return [
+            task for task in self.tasks
+            if task.status == "pending" and all(dep in completed for dep in task.dependencies)
+        ]
     
     def execute_task(self, task: AgentTask, ai_engine) -> Dict[str, Any]:
         """执行单个任务"""
@@ -134,8 +137,9 @@ class AgentOrchestrator:
         try:
             # 构建上下文（包含依赖任务的输出）
             context = task.input_data.copy()
+            tasks_by_id = {t.task_id: t for t in self.tasks}
             for dep in task.dependencies:
-                dep_task = next((t for t in self.tasks if t.role.name == dep), None)
+                dep_task = tasks_by_id.get(dep)
                 if dep_task and dep_task.output:
                     context[dep] = dep_task.output
             
@@ -174,38 +178,67 @@ class AgentOrchestrator:
     
     def run_pipeline(self, ai_engine) -> Dict[str, Any]:
         """
-        运行完整管道
-        支持并行执行（如果依赖允许）
+        运行完整管道（同步入口）
+        依赖允许的任务并行执行，见 run_pipeline_async
+        """
+        return asyncio.run(self.run_pipeline_async(ai_engine))
+
+    async def run_pipeline_async(self, ai_engine) -> Dict[str, Any]:
+        """
+        按依赖关系并行运行管道
+
+        ai_engine.ai_think 是同步调用，放到线程池里执行；
+        某个任务失败时只取消它的下游，返回其余任务的部分结果。
         """
         print("\n" + "="*60)
         print("🚀 Agent协调器启动")
         print("="*60)
-        
-        while True:
-            # 获取可执行任务
-            ready_tasks = self.get_ready_tasks()
-            
-            if not ready_tasks:
-                # 检查是否全部完成
-                if all(t.status == "completed" for t in self.tasks):
-                    break
-                # 检查是否有失败
-                if any(t.status == "failed" for t in self.tasks):
-                    raise Exception("管道执行失败")
-                continue
-            
-            # 执行任务（这里可以改为并行）
-            for task in ready_tasks:
+
+        def make_runner(task: AgentTask):
+            async def run(_inputs: Dict[str, Any]) -> Dict[str, Any]:
                 print(f"\n▶ 执行: {task.role.value}")
-                self.execute_task(task, ai_engine)
+                result = await asyncio.to_thread(self.execute_task, task, ai_engine)
                 print(f"✓ 完成: {task.role.value}")
-        
+                return result
+            return run
+
+        executor = DAGExecutor(
+            [
+                DAGNode(
+                    id=task.task_id,
+                    run=make_runner(task),
+                    dependencies=task.dependencies,
+                    timeout_s=self.task_timeout_s,
+                    priority=task.priority,
+                )
+                for task in self.tasks
+            ],
+            max_concurrency=self.max_concurrency,
+        )
+        dag_result = await executor.run()
+
+        tasks_by_id = {t.task_id: t for t in self.tasks}
+        for task_id, error in dag_result.errors.items():
+            task = tasks_by_id[task_id]
+            if task.status != "failed":
+                # 超时：线程里的调用仍在运行，但结果不再使用
+                task.status = "failed"
+                self.execution_log.append({"role": task.role.value, "status": "failed", "error": error})
+        for task_id in dag_result.cancelled:
+            tasks_by_id[task_id].status = "cancelled"
+
         print("\n" + "="*60)
-        print("✅ 所有Agent任务完成")
+        if dag_result.ok:
+            print("✅ 所有Agent任务完成")
+        else:
+            print(f"⚠️ 部分Agent任务未完成: 失败 {list(dag_result.errors)}，取消 {dag_result.cancelled}")
         print("="*60)
-        
+
         # 聚合结果
-        return self.aggregate_results()
+        results = self.aggregate_results()
+        results["errors"] = dag_result.errors
+        results["cancelled"] = dag_result.cancelled
+        return results
     
     def aggregate_results(self) -> Dict[str, Any]:
         """聚合所有Agent的输出"""
@@ -1,355 +1,405 @@
 """
 性能优化 - 缓存系统
-解决卡顿问题
+有界内存缓存：条目数/字节上限 + LRU/LFU 淘汰 + 后台过期清理 + 并发请求合并
 """
-import json
+import asyncio
+import functools
 import hashlib
-from typing import Any, Optional
-from datetime import datetime, timedelta
+import heapq
+import json
+import logging
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
-class SimpleCache:
-    """简单内存缓存（生产环境建议用Redis）"""
-    
-    def __init__(self):
-        self._cache = {}
-        self._expire = {}
-    
-    def get(self, key: str) -> Optional[Any]:
-        """获取缓存"""
-        if key not in self._cache:
-            return None
-        
-        # 检查是否过期
-        if key in self._expire:
-            if datetime.now() > self._expire[key]:
-                del self._cache[key]
-                del self._expire[key]
-                return None
-        
-        return self._cache[key]
-    
-    def set(self, key: str, value: Any, expire_seconds: int = 3600):
-        """设置缓存"""
-        self._cache[key] = value
-        self._expire[key] = datetime.now() + timedelta(seconds=expire_seconds)
-    
-    def delete(self, key: str):
-        """删除缓存"""
-        if key in self._cache:
-            del self._cache[key]
-        if key in self._expire:
-            del self._expire[key]
-    
-    def clear(self):
-        """清空缓存"""
-        self._cache.clear()
-        self._expire.clear()
-    
-    def make_key(self, *args, **kwargs) -> str:
-        """生成缓存键"""
-        data = json.dumps([args, kwargs], sort_keys=True)
-        return hashlib.md5(data.encode()).hexdigest()
+logger = logging.getLogger(__name__)
 
-# 全局缓存实例
-cache = SimpleCache()
+_MISSING = object()
+# 异步 leader 被取消时交给跟随者的标记：跟随者重新竞争 leader，而不是跟着一起失败
+_LEADER_CANCELLED = object()
 
-def cached(expire_seconds: int = 3600):
-    """缓存装饰器"""
-    def decorator(func):
-        async def wrapper(*args, **kwargs):
-            # 生成缓存键
-            cache_key = f"{func.__name__}:{cache.make_key(*args, **kwargs)}"
-            
-            # 尝试从缓存获取
-            result = cache.get(cache_key)
-            if result is not None:
-                print(f"✅ 缓存命中: {func.__name__}")
-                return result
-            
-            # 执行函数
-            print(f"🔄 缓存未命中，执行函数: {func.__name__}")
-            result = await func(*args, **kwargs)
-            
-            # 存入缓存
-            cache.set(cache_key, result, expire_seconds)
-            
-            return result
-        return wrapper
-    return decorator
+# 后台过期清理间隔（秒）
+SWEEP_INTERVAL_S = 30
 
-# 使用示例
-"""
-from app.core.cache import cached
 
-@cached(expire_seconds=1800)  # 缓存30分钟
-async def analyze_resume(resume_text: str):
-    # AI分析逻辑
-    pass
-"""
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "hits")
+
+    def __init__(self, value: Any, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.hits = 0
 
-性能优化 - 缓存系统
-解决卡顿问题
-"""
-import json
-import hashlib
-from typing import Any, Optional
-from datetime import datetime, timedelta
 
-class SimpleCache:
-    """简单内存缓存（生产环境建议用Redis）"""
-    
+class _SyncCall:
+    """同步请求合并：同一个键只有一个线程真正执行"""
+    __slots__ = ("event", "result", "error")
+
     def __init__(self):
-        self._cache = {}
-        self._expire = {}
-    
-    def get(self, key: str) -> Optional[Any]:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _estimate_size(value: Any) -> int:
+    """估算缓存值占用的字节数"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class CacheEngine:
+    """
+    有界内存缓存（线程安全 + 协程安全）
+
+    - max_entries / max_bytes：任一超限即淘汰
+    - policy="lru"：淘汰最久未访问的条目
+    - policy="lfu"：从最久未访问的一小批候选中淘汰命中次数最少的（近似 LFU，O(1)）
+    - 过期键由后台线程定期清理，读取时也会惰性清理
+    - get_or_compute / get_or_compute_async：并发未命中只执行一次
+    """
+
+    LFU_SAMPLE = 16
+
+    def __init__(
+        self,
+        namespace: str = "default",
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        policy: str = "lru",
+    ):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"不支持的淘汰策略: {policy}")
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._inflight_sync: Dict[str, _SyncCall] = {}
+        self._inflight_async: Dict[str, asyncio.Future] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "coalesced": 0,
+        }
+
+        _engines.add(self)
+        _ensure_sweeper()
+
+    def get(self, key: str, default: Any = None) -> Any:
         """获取缓存"""
-        if key not in self._cache:
-            return None
-        
-        # 检查是否过期
-        if key in self._expire:
-            if datetime.now() > self._expire[key]:
-                del self._cache[key]
-                del self._expire[key]
-                return None
-        
-        return self._cache[key]
-    
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+
+            if entry.expires_at <= time.time():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+
+            entry.hits += 1
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry.value
+
     def set(self, key: str, value: Any, expire_seconds: int = 3600):
         """设置缓存"""
-        self._cache[key] = value
-        self._expire[key] = datetime.now() + timedelta(seconds=expire_seconds)
-    
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.time() + expire_seconds
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = _Entry(value, expires_at, size)
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            self._stats["sets"] += 1
+            self._evict()
+
     def delete(self, key: str):
         """删除缓存"""
-        if key in self._cache:
-            del self._cache[key]
-        if key in self._expire:
-            del self._expire[key]
-    
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
     def clear(self):
         """清空缓存"""
-        self._cache.clear()
-        self._expire.clear()
-    
+        with self._lock:
+            self._data.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
+
     def make_key(self, *args, **kwargs) -> str:
         """生成缓存键"""
-        data = json.dumps([args, kwargs], sort_keys=True)
+        data = json.dumps([args, kwargs], sort_keys=True, ensure_ascii=False, default=str)
         return hashlib.md5(data.encode()).hexdigest()
 
-# 全局缓存实例
-cache = SimpleCache()
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
 
-def cached(expire_seconds: int = 3600):
-    """缓存装饰器"""
-    def decorator(func):
-        async def wrapper(*args, **kwargs):
-            # 生成缓存键
-            cache_key = f"{func.__name__}:{cache.make_key(*args, **kwargs)}"
-            
-            # 尝试从缓存获取
-            result = cache.get(cache_key)
+    def _evict(self) -> None:
+        """超出容量时按策略淘汰"""
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            if self.policy == "lfu":
+                candidates = []
+                for i, (k, entry) in enumerate(self._data.items()):
+                    if i >= self.LFU_SAMPLE:
+                        break
+                    candidates.append((entry.hits, k))
+                victim = min(candidates)[1]
+            else:
+                victim = next(iter(self._data))
+            self._remove(victim)
+            self._stats["evictions"] += 1
+
+    def purge_expired(self) -> int:
+        """清理所有已过期的键，返回清理数量"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                expires_at, key = heapq.heappop(heap)
+                entry = self._data.get(key)
+                # 堆里可能有被覆盖写入留下的旧记录
+                if entry is not None and entry.expires_at == expires_at:
+                    self._remove(key)
+                    removed += 1
+            if len(heap) > 2 * len(self._data) + 64:
+                self._expiry_heap = [(e.expires_at, k) for k, e in self._data.items()]
+                heapq.heapify(self._expiry_heap)
+            self._stats["expirations"] += removed
+        return removed
+
+    def get_or_compute(self, key: str, func: Callable[[], Any], expire_seconds: int = 3600) -> Any:
+        """同步读取，未命中时执行 func；并发未命中的线程等待同一次执行结果"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            call = self._inflight_sync.get(key)
+            leader = call is None
+            if leader:
+                call = _SyncCall()
+                self._inflight_sync[key] = call
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            result = func()
+            call.result = result
             if result is not None:
-                print(f"✅ 缓存命中: {func.__name__}")
-                return result
-            
-            # 执行函数
-            print(f"🔄 缓存未命中，执行函数: {func.__name__}")
-            result = await func(*args, **kwargs)
-            
-            # 存入缓存
-            cache.set(cache_key, result, expire_seconds)
-            
+                self.set(key, result, expire_seconds)
             return result
-        return wrapper
-    return decorator
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight_sync.pop(key, None)
+            call.event.set()
 
-# 使用示例
-"""
-from app.core.cache import cached
+    async def get_or_compute_async(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        expire_seconds: int = 3600,
+    ) -> Any:
+        """
+        异步读取，未命中时执行 factory()；并发未命中的协程等待同一个进行中的任务
 
-@cached(expire_seconds=1800)  # 缓存30分钟
-async def analyze_resume(resume_text: str):
-    # AI分析逻辑
-    pass
-"""
+        leader 被取消（例如客户端断开）时不会连带取消跟随者：跟随者重新检查缓存，其中一个接任 leader。
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
 
-性能优化 - 缓存系统
-解决卡顿问题
-"""
-import json
-import hashlib
-from typing import Any, Optional
-from datetime import datetime, timedelta
+            with self._lock:
+                future = self._inflight_async.get(key)
+                leader = future is None or future.get_loop() is not loop
+                if leader:
+                    future = loop.create_future()
+                    self._inflight_async[key] = future
+                else:
+                    self._stats["coalesced"] += 1
 
-class SimpleCache:
-    """简单内存缓存（生产环境建议用Redis）"""
-    
-    def __init__(self):
-        self._cache = {}
-        self._expire = {}
-    
-    def get(self, key: str) -> Optional[Any]:
-        """获取缓存"""
-        if key not in self._cache:
-            return None
-        
-        # 检查是否过期
-        if key in self._expire:
-            if datetime.now() > self._expire[key]:
-                del self._cache[key]
-                del self._expire[key]
-                return None
-        
-        return self._cache[key]
-    
-    def set(self, key: str, value: Any, expire_seconds: int = 3600):
-        """设置缓存"""
-        self._cache[key] = value
-        self._expire[key] = datetime.now() + timedelta(seconds=expire_seconds)
-    
-    def delete(self, key: str):
-        """删除缓存"""
-        if key in self._cache:
-            del self._cache[key]
-        if key in self._expire:
-            del self._expire[key]
-    
-    def clear(self):
-        """清空缓存"""
-        self._cache.clear()
-        self._expire.clear()
-    
-    def make_key(self, *args, **kwargs) -> str:
-        """生成缓存键"""
-        data = json.dumps([args, kwargs], sort_keys=True)
-        return hashlib.md5(data.encode()).hexdigest()
+            if leader:
+                return await self._lead_async(key, future, factory, expire_seconds)
 
-# 全局缓存实例
-cache = SimpleCache()
+            result = await asyncio.shield(future)
+            if result is not _LEADER_CANCELLED:
+                return result
 
-def cached(expire_seconds: int = 3600):
-    """缓存装饰器"""
-    def decorator(func):
-        async def wrapper(*args, **kwargs):
-            # 生成缓存键
-            cache_key = f"{func.__name__}:{cache.make_key(*args, **kwargs)}"
-            
-            # 尝试从缓存获取
-            result = cache.get(cache_key)
+    async def _lead_async(
+        self,
+        key: str,
+        future: "asyncio.Future",
+        factory: Callable[[], Awaitable[Any]],
+        expire_seconds: int,
+    ) -> Any:
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有跟随者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
             if result is not None:
-                print(f"✅ 缓存命中: {func.__name__}")
-                return result
-            
-            # 执行函数
-            print(f"🔄 缓存未命中，执行函数: {func.__name__}")
-            result = await func(*args, **kwargs)
-            
-            # 存入缓存
-            cache.set(cache_key, result, expire_seconds)
-            
+                self.set(key, result, expire_seconds)
+            future.set_result(result)
             return result
-        return wrapper
-    return decorator
+        finally:
+            with self._lock:
+                if self._inflight_async.get(key) is future:
+                    del self._inflight_async[key]
 
-# 使用示例
-"""
-from app.core.cache import cached
+    def stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "namespace": self.namespace,
+                "policy": self.policy,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "inflight": len(self._inflight_sync) + len(self._inflight_async),
+                "hit_rate": round(self._stats["hits"] / lookups * 100, 2) if lookups else 0,
+                **self._stats,
+            }
 
-@cached(expire_seconds=1800)  # 缓存30分钟
-async def analyze_resume(resume_text: str):
-    # AI分析逻辑
-    pass
-"""
 
-性能优化 - 缓存系统
-解决卡顿问题
-"""
-import json
-import hashlib
-from typing import Any, Optional
-from datetime import datetime, timedelta
+# 兼容旧名称
+SimpleCache = CacheEngine
+
+_engines: "weakref.WeakSet[CacheEngine]" = weakref.WeakSet()
+_registry: Dict[str, CacheEngine] = {}
+_registry_lock = threading.Lock()
+_sweeper: Optional[threading.Thread] = None
+_sweeper_lock = threading.Lock()
+
+
+def _sweep_loop():
+    while True:
+        time.sleep(SWEEP_INTERVAL_S)
+        for engine in list(_engines):
+            try:
+                engine.purge_expired()
+            except Exception as e:
+                logger.warning(f"缓存过期清理失败 [{engine.namespace}]: {e}")
+
+
+def _ensure_sweeper():
+    """启动后台过期清理线程（进程内只启动一个）"""
+    global _sweeper
+    if _sweeper is not None:
+        return
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_loop, name="cache-sweeper", daemon=True)
+            _sweeper.start()
+
+
+def get_cache(namespace: str = "default", **options) -> CacheEngine:
+    """按命名空间获取缓存实例（首次调用时用 options 创建）"""
+    engine = _registry.get(namespace)
+    if engine is None:
+        with _registry_lock:
+            engine = _registry.get(namespace)
+            if engine is None:
+                engine = CacheEngine(namespace=namespace, **options)
+                _registry[namespace] = engine
+    return engine
+
+
+def get_all_stats() -> Dict[str, Dict[str, Any]]:
+    """所有命名空间的统计信息"""
+    return {name: engine.stats() for name, engine in list(_registry.items())}
 
-class SimpleCache:
-    """简单内存缓存（生产环境建议用Redis）"""
-    
-    def __init__(self):
-        self._cache = {}
-        self._expire = {}
-    
-    def get(self, key: str) -> Optional[Any]:
-        """获取缓存"""
-        if key not in self._cache:
-            return None
-        
-        # 检查是否过期
-        if key in self._expire:
-            if datetime.now() > self._expire[key]:
-                del self._cache[key]
-                del self._expire[key]
-                return None
-        
-        return self._cache[key]
-    
-    def set(self, key: str, value: Any, expire_seconds: int = 3600):
-        """设置缓存"""
-        self._cache[key] = value
-        self._expire[key] = datetime.now() + timedelta(seconds=expire_seconds)
-    
-    def delete(self, key: str):
-        """删除缓存"""
-        if key in self._cache:
-            del self._cache[key]
-        if key in self._expire:
-            del self._expire[key]
-    
-    def clear(self):
-        """清空缓存"""
-        self._cache.clear()
-        self._expire.clear()
-    
-    def make_key(self, *args, **kwargs) -> str:
-        """生成缓存键"""
-        data = json.dumps([args, kwargs], sort_keys=True)
-        return hashlib.md5(data.encode()).hexdigest()
 
 # 全局缓存实例
-cache = SimpleCache()
+cache = get_cache("default")
 
-def cached(expire_seconds: int = 3600):
-    """缓存装饰器"""
+
+def cached(expire_seconds: int = 3600, namespace: str = "default"):
+    """异步缓存装饰器（并发相同请求只执行一次）"""
     def decorator(func):
+        engine = get_cache(namespace)
+
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            # 生成缓存键
-            cache_key = f"{func.__name__}:{cache.make_key(*args, **kwargs)}"
-            
-            # 尝试从缓存获取
-            result = cache.get(cache_key)
-            if result is not None:
-                print(f"✅ 缓存命中: {func.__name__}")
-                return result
-            
-            # 执行函数
-            print(f"🔄 缓存未命中，执行函数: {func.__name__}")
-            result = await func(*args, **kwargs)
-            
-            # 存入缓存
-            cache.set(cache_key, result, expire_seconds)
-            
-            return result
+            cache_key = f"{func.__qualname__}:{engine.make_key(*args, **kwargs)}"
+            return await engine.get_or_compute_async(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                expire_seconds,
+            )
+        return wrapper
+    return decorator
+
+
+def cached_sync(expire_seconds: int = 3600, namespace: str = "default"):
+    """同步缓存装饰器（并发相同请求只执行一次）"""
+    def decorator(func):
+        engine = get_cache(namespace)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = f"{func.__qualname__}:{engine.make_key(*args, **kwargs)}"
+            return engine.get_or_compute(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                expire_seconds,
+            )
         return wrapper
     return decorator
 
 # 使用示例
 """
-from app.core.cache import cached
+from app.core.cache import cached, cached_sync, get_cache
 
-@cached(expire_seconds=1800)  # 缓存30分钟
+@cached(expire_seconds=1800, namespace="analysis")  # 缓存30分钟
 async def analyze_resume(resume_text: str):
     # AI分析逻辑
     pass
-"""
-
-
 
+@cached_sync(expire_seconds=600, namespace="search")
+def search_jobs(keyword: str):
+    pass
+"""
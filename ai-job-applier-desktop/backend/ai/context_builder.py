@@ -0,0 +1,129 @@
+"""
+上下文构建器 - 链式 Agent 的提示词前缀复用 + 上游输出压缩
+
+- 第一条消息（通用说明 + 简历）对所有 Agent 字节级一致，
+  服务端的前缀缓存（DeepSeek 上下文硬盘缓存 / OpenAI prompt caching）可以命中
+- 上游 Agent 的输出按 token 预算截断（保留开头和结尾，按行切分），
+  避免输入 token 沿链条线性增长
+- 记录每个 Agent 的输入/输出/缓存命中 token 数
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from ai.llm_client import estimate_tokens, usage_from_response
+
+SHARED_INSTRUCTIONS = "你是求职助手团队中的一员。以下是候选人的简历，团队所有成员都基于这份简历工作。"
+
+
+def compact_text(text: str, budget_tokens: int) -> str:
+    """把文本压缩到约 budget_tokens 个 token：保留开头约 70% 和结尾约 30%，中间省略"""
+    text = (text or "").strip()
+    total = estimate_tokens(text)
+    if total <= budget_tokens:
+        return text
+
+    lines = text.splitlines()
+    head_budget = int(budget_tokens * 0.7)
+    tail_budget = budget_tokens - head_budget
+
+    head: List[str] = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line)
+        if used + cost > head_budget:
+            break
+        head.append(line)
+        used += cost
+
+    tail: List[str] = []
+    used = 0
+    for line in reversed(lines[len(head):]):
+        cost = estimate_tokens(line)
+        if used + cost > tail_budget:
+            break
+        tail.append(line)
+        used += cost
+    tail.reverse()
+
+    # 单行超长（没有换行的大段文字）时按字符截断
+    if not head and not tail:
+        ratio = budget_tokens / total
+        keep = max(1, int(len(text) * ratio))
+        return f"{text[:int(keep * 0.7)]}\n…（中间省略）…\n{text[-int(keep * 0.3):]}"
+
+    omitted = total - sum(estimate_tokens(line) for line in head + tail)
+    return "\n".join(head + [f"…（中间省略约 {omitted} tokens）…"] + tail)
+
+
+class ContextBuilder:
+    """
+    为同一份简历上的多个 Agent 构建消息
+
+    消息结构：
+        system: 通用说明 + 简历       （所有 Agent 相同，命中服务端前缀缓存）
+        system: 角色提示词
+        user:   压缩后的上游输出 + 任务
+    """
+
+    def __init__(self, resume_text: str, upstream_token_budget: Optional[int] = None):
+        self.resume_text = (resume_text or "").strip()
+        self.upstream_token_budget = upstream_token_budget or int(
+            os.getenv("AI_UPSTREAM_TOKEN_BUDGET", "1500") or "1500"
+        )
+        self._prefix = {"role": "system", "content": f"{SHARED_INSTRUCTIONS}\n\n【简历】\n{self.resume_text}"}
+        self._usage: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def build(
+        self,
+        role_prompt: str,
+        upstream: Optional[Dict[str, str]] = None,
+        task: str = "",
+    ) -> List[Dict[str, str]]:
+        """
+        Args:
+            role_prompt: 角色提示词
+            upstream: {标题: 上游输出}，每段分别压缩到预算内
+            task: 本次任务说明
+        """
+        sections = []
+        upstream = {k: v for k, v in (upstream or {}).items() if v}
+        if upstream:
+            per_section = max(200, self.upstream_token_budget // len(upstream))
+            for title, text in upstream.items():
+                sections.append(f"【{title}】\n{compact_text(text, per_section)}")
+        sections.append(task or "请基于简历完成你的任务。")
+
+        return [
+            dict(self._prefix),
+            {"role": "system", "content": role_prompt},
+            {"role": "user", "content": "\n\n".join(sections)},
+        ]
+
+    def record_usage(self, agent: str, response: Any = None, messages=None, output: str = "") -> Dict[str, int]:
+        """记录一次调用的 token 数；响应没有 usage（流式）时按文本估算"""
+        usage = usage_from_response(response) if response is not None else {}
+        if not usage:
+            usage = {
+                "prompt_tokens": sum(estimate_tokens(m["content"]) for m in messages or []),
+                "completion_tokens": estimate_tokens(output),
+                "cached_tokens": 0,
+            }
+        with self._lock:
+            total = self._usage.setdefault(agent, {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0})
+            for k, v in usage.items():
+                total[k] += v
+        return usage
+
+    def report(self) -> Dict[str, Any]:
+        """每个 Agent 的 token 统计和合计"""
+        with self._lock:
+            agents = {k: dict(v) for k, v in self._usage.items()}
+        total = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        for usage in agents.values():
+            for k in total:
+                total[k] += usage[k]
+        total["cache_hit_rate"] = round(total["cached_tokens"] / total["prompt_tokens"] * 100, 2) if total["prompt_tokens"] else 0
+        return {"agents": agents, "total": total}
@@ -0,0 +1,155 @@
+"""
+DAG 执行器 - 按依赖关系并发调度异步任务
+就绪判断 O(1)：预先计算每个节点的下游和入度，上游完成时只更新它的下游
+"""
+
+import asyncio
+import heapq
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+
+@dataclass
+class DAGNode:
+    """DAG 节点：run 接收 {依赖节点ID: 结果}，返回本节点结果"""
+    id: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    dependencies: List[str] = field(default_factory=list)
+    timeout_s: Optional[float] = None
+    priority: int = 0  # 同时就绪时数值小的先执行
+
+
+@dataclass
+class DAGResult:
+    """执行结果：失败或被取消的节点不会出现在 results 中"""
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    cancelled: List[str] = field(default_factory=list)
+    durations: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and not self.cancelled
+
+
+class DAGExecutor:
+    """
+    异步 DAG 调度器
+
+    - 构造时校验依赖并做拓扑检查（有环或依赖不存在直接报错）
+    - 入度计数：节点完成时只遍历它的下游，入度归零即就绪
+    - max_concurrency 限制同时运行的节点数
+    - 每个节点可单独设置超时，超时按失败处理
+    - 节点失败时取消它的所有下游，其余分支继续执行，返回部分结果
+    """
+
+    def __init__(
+        self,
+        nodes: List[DAGNode],
+        max_concurrency: int = 4,
+        default_timeout_s: Optional[float] = None,
+    ):
+        self.nodes: Dict[str, DAGNode] = {}
+        for node in nodes:
+            if node.id in self.nodes:
+                raise ValueError(f"重复的节点ID: {node.id}")
+            self.nodes[node.id] = node
+
+        self.max_concurrency = max(1, max_concurrency)
+        self.default_timeout_s = default_timeout_s
+
+        self.dependents: Dict[str, List[str]] = {node_id: [] for node_id in self.nodes}
+        self.in_degree: Dict[str, int] = {}
+        for node in self.nodes.values():
+            for dep in node.dependencies:
+                if dep not in self.nodes:
+                    raise ValueError(f"节点 {node.id} 依赖不存在的节点: {dep}")
+                self.dependents[dep].append(node.id)
+            self.in_degree[node.id] = len(node.dependencies)
+
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        """Kahn 算法求拓扑序，同时检测环"""
+        in_degree = dict(self.in_degree)
+        queue = [node_id for node_id, d in in_degree.items() if d == 0]
+        order = []
+        while queue:
+            node_id = queue.pop()
+            order.append(node_id)
+            for child in self.dependents[node_id]:
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    queue.append(child)
+        if len(order) != len(self.nodes):
+            cyclic = sorted(set(self.nodes) - set(order))
+            raise ValueError(f"依赖存在环: {cyclic}")
+        return order
+
+    def _descendants(self, node_id: str) -> Set[str]:
+        found: Set[str] = set()
+        stack = list(self.dependents[node_id])
+        while stack:
+            child = stack.pop()
+            if child not in found:
+                found.add(child)
+                stack.extend(self.dependents[child])
+        return found
+
+    async def _run_node(self, node: DAGNode, inputs: Dict[str, Any]) -> Any:
+        timeout = node.timeout_s if node.timeout_s is not None else self.default_timeout_s
+        if timeout is None:
+            return await node.run(inputs)
+        return await asyncio.wait_for(node.run(inputs), timeout)
+
+    async def run(self) -> DAGResult:
+        """执行整个 DAG，返回（可能是部分的）结果"""
+        result = DAGResult()
+        in_degree = dict(self.in_degree)
+        skipped: Set[str] = set()
+        ready: List[tuple] = []
+        for node_id in self.order:
+            if in_degree[node_id] == 0:
+                heapq.heappush(ready, (self.nodes[node_id].priority, node_id))
+
+        running: Dict[asyncio.Task, str] = {}
+        started: Dict[str, float] = {}
+
+        try:
+            while ready or running:
+                while ready and len(running) < self.max_concurrency:
+                    _, node_id = heapq.heappop(ready)
+                    node = self.nodes[node_id]
+                    inputs = {dep: result.results[dep] for dep in node.dependencies}
+                    started[node_id] = time.monotonic()
+                    running[asyncio.create_task(self._run_node(node, inputs))] = node_id
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node_id = running.pop(task)
+                    result.durations[node_id] = time.monotonic() - started[node_id]
+                    error = task.exception()
+                    if error is None:
+                        result.results[node_id] = task.result()
+                        for child in self.dependents[node_id]:
+                            in_degree[child] -= 1
+                            if in_degree[child] == 0 and child not in skipped:
+                                heapq.heappush(ready, (self.nodes[child].priority, child))
+                        continue
+
+                    if isinstance(error, asyncio.TimeoutError):
+                        result.errors[node_id] = f"超时（{self.nodes[node_id].timeout_s or self.default_timeout_s}秒）"
+                    else:
+                        result.errors[node_id] = str(error) or type(error).__name__
+                    for child in self._descendants(node_id):
+                        if child not in skipped:
+                            skipped.add(child)
+                            result.cancelled.append(child)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return result
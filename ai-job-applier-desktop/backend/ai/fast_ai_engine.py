@@ -5,19 +5,65 @@
 
 import os
 import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Awaitable, Callable, Optional
 from dotenv import load_dotenv
 import time
-from app.core.llm_client import get_async_llm_client, get_llm_settings
+from app.core.llm_client import acreate_chat_completion, astream_chat_completion, get_llm_settings
+from ai.dag_executor import DAGExecutor, DAGNode
+from ai.context_builder import ContextBuilder
+from ai.llm_metrics import metric_labels
 
 load_dotenv()
 
+# 流式回调：(角色显示名, 增量文本, 是否结束)
+StreamCallback = Callable[[str, str, bool], Awaitable[None]]
+
+
+class _DeltaBatcher:
+    """把逐 token 的增量攒成批，每 flush_ms 毫秒最多推送一次，减少 WebSocket 帧数"""
+
+    def __init__(self, callback: StreamCallback, agent: str, flush_ms: int):
+        self.callback = callback
+        self.agent = agent
+        self.flush_s = flush_ms / 1000
+        self.buffer: List[str] = []
+        self.last_flush = 0.0
+
+    async def push(self, delta: str):
+        self.buffer.append(delta)
+        now = time.monotonic()
+        # 首个分片立即推送，保证首字节时间
+        if not self.last_flush or now - self.last_flush >= self.flush_s:
+            await self.flush()
+
+    async def flush(self, done: bool = False):
+        if self.buffer or done:
+            text = "".join(self.buffer)
+            self.buffer.clear()
+            self.last_flush = time.monotonic()
+            await self.callback(self.agent, text, done)
+
+
 class HighPerformanceAIEngine:
     """高性能AI引擎 - 并行处理"""
     
     def __init__(self):
-        self.client = get_async_llm_client()
         self.chat_model = get_llm_settings()["chat_model"]
+
+        # 需要每次都有新输出的角色，跳过响应缓存
+        self.uncached_roles = {"interviewer"}
+
+        # 流式增量的推送间隔（毫秒）
+        self.stream_flush_ms = int(os.getenv("AI_STREAM_FLUSH_MS", "100") or "100")
+
+        self.role_names = {
+            "career_planner": "职业规划师",
+            "recruiter": "招聘专家",
+            "resume_optimizer": "简历优化师",
+            "quality_checker": "质量审核官",
+            "interview_coach": "面试教练",
+            "interviewer": "模拟面试官",
+        }
         
         # 6个AI角色的提示词（专业优化版）
         self.prompts = {
@@ -105,67 +151,152 @@ class HighPerformanceAIEngine:
 - 总字数300-400字"""
         }
     
-    async def ai_think_fast(self, role: str, context: str) -> str:
-        """快速AI思考 - 流式输出"""
+    def _messages(
+        self,
+        role: str,
+        context: str,
+        builder: Optional[ContextBuilder] = None,
+        upstream: Optional[Dict[str, str]] = None,
+    ) -> List[Dict[str, str]]:
+        """有 builder 时简历作为共享前缀、上游输出按预算压缩；否则沿用 system + user 两条消息"""
         prompt = self.prompts.get(role, "")
-        
+        if builder is not None:
+            return builder.build(prompt, upstream=upstream, task=context)
+        return [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": context}
+        ]
+
+    async def ai_think_fast(
+        self,
+        role: str,
+        context: str,
+        builder: Optional[ContextBuilder] = None,
+        upstream: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """快速AI思考 - 一次性返回；调用失败直接抛出，由 DAG 执行器记为失败并跳过下游"""
+        messages = self._messages(role, context, builder, upstream)
+
+        # Key 池调度 + 连接池复用；限流等待用 asyncio.sleep，不阻塞其他角色
+        response = await acreate_chat_completion(
+            use_cache=True,
+            cache=role not in self.uncached_roles,
+            model=self.chat_model,  # 使用环境变量模型
+            messages=messages,
+            temperature=0.7,
+            max_tokens=1200,  # 增加token限制以支持更详细的输出
+            stream=False
+        )
+        if builder is not None:
+            builder.record_usage(self.role_names.get(role, role), response)
+
+        return response.choices[0].message.content.strip()
+    
+    async def ai_think_stream(
+        self,
+        role: str,
+        context: str,
+        stream_callback: StreamCallback,
+        builder: Optional[ContextBuilder] = None,
+        upstream: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """
+        流式AI思考 - 增量按批推送给 stream_callback，返回完整输出
+
+        调用失败时推送已收到的部分后抛出（不发送 done），由调用方结束这一路输出。
+        """
+        messages = self._messages(role, context, builder, upstream)
+        batcher = _DeltaBatcher(stream_callback, self.role_names.get(role, role), self.stream_flush_ms)
+        parts: List[str] = []
+
         try:
-            # 使用流式API，更快
-            response = await self.client.chat.completions.create(
-                model=self.chat_model,  # 使用环境变量模型
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": context}
-                ],
+            async for delta in astream_chat_completion(
+                model=self.chat_model,
+                messages=messages,
                 temperature=0.7,
-                max_tokens=1200,  # 增加token限制以支持更详细的输出
-                stream=False  # 先不用流式，确保稳定
-            )
-            
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return f"AI处理出错: {str(e)}"
-    
-    async def parallel_process(self, resume_text: str, progress_callback=None) -> Dict[str, Any]:
-        """并行处理 - 6个AI同时工作"""
-        
-        # 阶段1: 职业分析（必须先完成）
-        if progress_callback:
-            await progress_callback(1, "AI-1 职业规划师分析中...", "职业规划师")
-        
-        career_analysis = await self.ai_think_fast("career_planner", f"简历：\n{resume_text}")
-        
-        # 阶段2: 并行执行（招聘专家 + 简历优化）
-        if progress_callback:
-            await progress_callback(2, "AI-2/3 并行处理中...", "系统")
-        
-        recruiter_task = self.ai_think_fast("recruiter", f"简历：\n{resume_text}\n\n职业分析：\n{career_analysis}")
-        optimizer_task = self.ai_think_fast("resume_optimizer", f"简历：\n{resume_text}\n\n职业分析：\n{career_analysis}")
-        
-        job_recommendations, optimized_resume = await asyncio.gather(recruiter_task, optimizer_task)
-        
-        # 阶段3: 并行执行（质量检查 + 面试辅导 + 模拟面试）
-        if progress_callback:
-            await progress_callback(4, "AI-4/5/6 并行处理中...", "系统")
-        
-        checker_task = self.ai_think_fast("quality_checker", f"简历：\n{optimized_resume}")
-        coach_task = self.ai_think_fast("interview_coach", f"简历：\n{resume_text}\n\n岗位：\n{job_recommendations}")
-        interviewer_task = self.ai_think_fast("interviewer", f"简历：\n{resume_text}\n\n岗位：\n{job_recommendations}")
-        
-        quality_check, interview_prep, mock_interview = await asyncio.gather(
-            checker_task, coach_task, interviewer_task
-        )
-        
+                max_tokens=1200
+            ):
+                parts.append(delta)
+                await batcher.push(delta)
+        except Exception:
+            await batcher.flush()
+            raise
+
+        await batcher.flush(done=True)
+        output = "".join(parts).strip()
+        if builder is not None:
+            # 流式响应没有 usage，按文本估算
+            builder.record_usage(self.role_names.get(role, role), messages=messages, output=output)
+        return output
+
+    async def parallel_process(
+        self,
+        resume_text: str,
+        progress_callback=None,
+        stream_callback: Optional[StreamCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        并行处理 - 6个AI按依赖关系调度
+
+        每个角色只等待自己依赖的角色：质量审核在简历优化完成后立即开始，
+        面试相关角色在岗位推荐完成后立即开始，互不等待。
+        传入 stream_callback 时各角色以流式输出，增量实时推送。
+        """
+        step_of = {
+            "career_planner": 1,
+            "recruiter": 2,
+            "resume_optimizer": 2,
+            "quality_checker": 4,
+            "interview_coach": 4,
+            "interviewer": 4,
+        }
+
+        # 简历作为所有角色共享的消息前缀，上游输出按 token 预算压缩
+        builder = ContextBuilder(resume_text)
+
+        def node(role: str, dependencies: List[str], task: str, titles: Dict[str, str]) -> DAGNode:
+            async def run(inputs: Dict[str, str]) -> str:
+                name = self.role_names[role]
+                if progress_callback:
+                    await progress_callback(step_of[role], f"{name}分析中...", name)
+                upstream = {title: inputs[dep] for dep, title in titles.items()}
+                with metric_labels(role=role, pipeline="fast"):
+                    if not stream_callback:
+                        return await self.ai_think_fast(role, task, builder, upstream)
+                    try:
+                        return await self.ai_think_stream(role, task, stream_callback, builder, upstream)
+                    except Exception as e:
+                        # 结束这一路流式输出；异常继续抛给 DAG 执行器
+                        await stream_callback(name, f"AI处理出错: {e}", True)
+                        raise
+            return DAGNode(id=role, run=run, dependencies=dependencies, priority=step_of[role])
+
+        executor = DAGExecutor([
+            node("career_planner", [], "请分析这份简历。", {}),
+            node("recruiter", ["career_planner"], "请推荐匹配的岗位。", {"career_planner": "职业分析"}),
+            node("resume_optimizer", ["career_planner"], "请优化这份简历。", {"career_planner": "职业分析"}),
+            node("quality_checker", ["resume_optimizer"], "请审核优化后的简历。", {"resume_optimizer": "优化后的简历"}),
+            node("interview_coach", ["recruiter"], "请针对推荐岗位做面试辅导。", {"recruiter": "岗位"}),
+            node("interviewer", ["recruiter"], "请针对推荐岗位进行模拟面试。", {"recruiter": "岗位"}),
+        ], max_concurrency=len(self.prompts))
+        dag_result = await executor.run()
+
+        def output(role: str) -> str:
+            if role in dag_result.results:
+                return dag_result.results[role]
+            return f"AI处理出错: {dag_result.errors.get(role, '上游任务失败，已跳过')}"
+
         if progress_callback:
             await progress_callback(5, "✓ 所有AI处理完成！", "系统")
-        
+
         return {
-            "career_analysis": career_analysis,
-            "job_recommendations": job_recommendations,
-            "optimized_resume": optimized_resume,
-            "quality_check": quality_check,
-            "interview_prep": interview_prep,
-            "mock_interview": mock_interview
+            "career_analysis": output("career_planner"),
+            "job_recommendations": output("recruiter"),
+            "optimized_resume": output("resume_optimizer"),
+            "quality_check": output("quality_checker"),
+            "interview_prep": output("interview_coach"),
+            "mock_interview": output("interviewer"),
+            "token_usage": builder.report()
         }
 
 
@@ -175,12 +306,17 @@ class FastJobApplicationPipeline:
     def __init__(self):
         self.engine = HighPerformanceAIEngine()
     
-    async def process_resume_fast(self, resume_text: str, progress_callback=None) -> Dict[str, Any]:
-        """快速处理简历 - 异步并行"""
+    async def process_resume_fast(
+        self,
+        resume_text: str,
+        progress_callback=None,
+        stream_callback: Optional[StreamCallback] = None,
+    ) -> Dict[str, Any]:
+        """快速处理简历 - 异步并行（可选流式输出）"""
         start_time = time.time()
         
         # 并行处理
-        results = await self.engine.parallel_process(resume_text, progress_callback)
+        results = await self.engine.parallel_process(resume_text, progress_callback, stream_callback)
         
         end_time = time.time()
         processing_time = end_time - start_time
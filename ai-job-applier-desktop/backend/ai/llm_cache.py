@@ -0,0 +1,263 @@
+"""
+LLM 响应缓存 - 持久化、内容寻址、按字节预算淘汰
+同一份系统提示词 + 简历重复分析时直接命中，不再调用模型
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from data.sqlite_util import ThreadLocalConnections, lazy_singleton
+
+
+class LLMResponseCache:
+    """
+    基于 SQLite（WAL 模式）的 LLM 响应缓存
+
+    - 键：(model, messages, temperature, max_tokens) 的 SHA-256
+    - 容量：按响应字节数做 LRU 淘汰
+    - 过期：写入时记录 expires_at，读取时惰性清理，淘汰时批量清理
+    - 多进程共享：所有 worker 指向同一个数据库文件，计数器也存在库里
+    - 读路径只做普通读事务；命中的访问时间和计数攒在内存里，
+      满 FLUSH_BATCH 条或随下一次 set 一起写回，读者之间不抢写锁
+    """
+
+    FLUSH_BATCH = 64
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        ttl_s: Optional[int] = None,
+    ):
+        self.db_path = db_path or os.getenv("LLM_CACHE_PATH", "data/llm_cache.db")
+        self.max_bytes = int(max_bytes or os.getenv("LLM_CACHE_MAX_BYTES", "") or 256 * 1024 * 1024)
+        self.ttl_s = int(ttl_s or os.getenv("LLM_CACHE_TTL_S", "") or 7 * 24 * 3600)
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = ThreadLocalConnections(self.db_path)
+        self._pending_lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._pending_counts: Dict[str, int] = {}
+        self._init_db()
+
+    def _init_db(self) -> None:
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires ON responses(expires_at)")
+        for name in ("hits", "misses", "bytes_saved", "evictions", "total_bytes"):
+            conn.execute("INSERT OR IGNORE INTO counters(name, value) VALUES(?, 0)", (name,))
+
+    @staticmethod
+    def make_key(
+        model: Optional[str],
+        messages: List[Dict[str, Any]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        """生成内容寻址的缓存键"""
+        raw = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _bump(self, conn: sqlite3.Connection, name: str, delta: int) -> None:
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (delta, name))
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，返回序列化的响应；未命中或已过期返回 None（过期条目在 set 淘汰时清理）"""
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT payload, size FROM responses WHERE key = ? AND expires_at > ?",
+            (key, now),
+        ).fetchone()
+        with self._pending_lock:
+            if row is None:
+                self._count("misses", 1)
+            else:
+                self._touched[key] = now
+                self._count("hits", 1)
+                self._count("bytes_saved", int(row[1]))
+            due = len(self._touched) >= self.FLUSH_BATCH
+        if due:
+            self.flush()
+        return row[0] if row is not None else None
+
+    def _count(self, name: str, delta: int) -> None:
+        self._pending_counts[name] = self._pending_counts.get(name, 0) + delta
+
+    def _take_pending(self) -> Tuple[Dict[str, float], Dict[str, int]]:
+        with self._pending_lock:
+            touched, counts = self._touched, self._pending_counts
+            self._touched, self._pending_counts = {}, {}
+        return touched, counts
+
+    def _restore_pending(self, touched: Dict[str, float], counts: Dict[str, int]) -> None:
+        """写回失败时放回内存，下次再写"""
+        with self._pending_lock:
+            for key, ts in touched.items():
+                self._touched[key] = max(ts, self._touched.get(key, 0))
+            for name, delta in counts.items():
+                self._count(name, delta)
+
+    def _apply_pending(self, conn: sqlite3.Connection, touched: Dict[str, float], counts: Dict[str, int]) -> None:
+        if touched:
+            conn.executemany(
+                "UPDATE responses SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                [(ts, key) for key, ts in touched.items()],
+            )
+        for name, delta in counts.items():
+            self._bump(conn, name, delta)
+
+    def flush(self) -> None:
+        """把攒下的访问时间和命中计数写回数据库（尽力而为，失败时留到下次）"""
+        touched, counts = self._take_pending()
+        if not touched and not counts:
+            return
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._apply_pending(conn, touched, counts)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._restore_pending(touched, counts)
+
+    def set(self, key: str, payload: str, model: Optional[str] = None, ttl_s: Optional[int] = None) -> None:
+        """写入缓存，并在超出字节预算时按 LRU 淘汰"""
+        now = time.time()
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        conn = self._conn()
+        # 顺带写回攒下的访问时间，淘汰时 LRU 顺序才准确
+        touched, counts = self._take_pending()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._apply_pending(conn, touched, counts)
+            old = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO responses(key, model, payload, size, created_at, accessed_at, expires_at)
+                VALUES(?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, model, payload, size, now, now, now + (ttl_s or self.ttl_s)),
+            )
+            self._bump(conn, "total_bytes", size - (int(old[0]) if old else 0))
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._restore_pending(touched, counts)
+            raise
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """先清理过期条目，再按最近访问时间淘汰直到回到预算内"""
+        expired = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE expires_at <= ?",
+            (now,),
+        ).fetchone()
+        if expired[0]:
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            self._bump(conn, "total_bytes", -int(expired[1]))
+            self._bump(conn, "evictions", int(expired[0]))
+
+        total = conn.execute("SELECT value FROM counters WHERE name = 'total_bytes'").fetchone()[0]
+        while total > self.max_bytes:
+            victims = conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not victims:
+                break
+            freed = 0
+            deleted = 0
+            for victim_key, victim_size in victims:
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM responses WHERE key = ?", (victim_key,))
+                freed += int(victim_size)
+                total -= int(victim_size)
+                deleted += 1
+            self._bump(conn, "total_bytes", -freed)
+            self._bump(conn, "evictions", deleted)
+
+    def clear(self) -> None:
+        """清空缓存（保留命中计数）"""
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM responses")
+            conn.execute("UPDATE counters SET value = 0 WHERE name = 'total_bytes'")
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        with self._pending_lock:
+            self._touched.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        self.flush()
+        conn = self._conn()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "total_bytes": counters.get("total_bytes", 0),
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl_s,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "hit_rate": round(counters.get("hits", 0) / lookups * 100, 2) if lookups else 0,
+            "bytes_saved": counters.get("bytes_saved", 0),
+            "evictions": counters.get("evictions", 0),
+        }
+
+
+@lazy_singleton
+def _shared_response_cache() -> LLMResponseCache:
+    return LLMResponseCache()
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """获取全局响应缓存；LLM_CACHE_ENABLED=0 时返回 None"""
+    if os.getenv("LLM_CACHE_ENABLED", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+    return _shared_response_cache()
@@ -1,8 +1,19 @@
+import asyncio
+import importlib.util
+import json
 import os
-import random
-from typing import Dict
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 
-from openai import AsyncOpenAI, OpenAI
+import httpx
+from openai import AsyncOpenAI, OpenAI, RateLimitError
+from openai.types.chat import ChatCompletion
+
+from ai.llm_cache import LLMResponseCache, get_response_cache
+from ai.llm_key_pool import KeyPool
+from ai.llm_metrics import llm_metrics
 
 
 def _first_non_empty(*keys: str) -> str:
@@ -13,22 +24,48 @@ def _first_non_empty(*keys: str) -> str:
     return ""
 
 
-def _get_api_key() -> str:
-    """获取 API Key，支持多 Key 轮换"""
-    # 检查是否有多个 Key
+def _get_api_keys() -> List[str]:
+    """所有可用的 API Key（DEEPSEEK_API_KEYS 逗号分隔，否则单个 Key）"""
     keys_str = os.getenv("DEEPSEEK_API_KEYS", "").strip()
     if keys_str:
         keys = [k.strip() for k in keys_str.split(",") if k.strip()]
         if keys:
-            return random.choice(keys)
+            return keys
 
     # 单个 Key
-    return _first_non_empty(
+    key = _first_non_empty(
         "OPENAI_COMPAT_API_KEY",
         "LLM_API_KEY",
         "DEEPSEEK_API_KEY",
         "OPENAI_API_KEY",
     )
+    return [key] if key else []
+
+
+_key_pool: Optional[KeyPool] = None
+_key_pool_lock = threading.Lock()
+
+
+def get_key_pool() -> KeyPool:
+    """全局 Key 池；Key 列表变化（例如重新加载 .env）时重建"""
+    global _key_pool
+    keys = _get_api_keys()
+    pool = _key_pool
+    if pool is None or pool.keys != keys:
+        with _key_pool_lock:
+            if _key_pool is None or _key_pool.keys != keys:
+                _key_pool = KeyPool(
+                    keys,
+                    rpm=int(os.getenv("LLM_KEY_RPM", "60") or "60"),
+                    tpm=int(os.getenv("LLM_KEY_TPM", "1000000") or "1000000"),
+                )
+            pool = _key_pool
+    return pool
+
+
+def _get_api_key() -> str:
+    """获取 API Key，多 Key 时选择当前余量最大的一个"""
+    return get_key_pool().peek()
 
 
 def _infer_provider(base_url: str) -> str:
@@ -42,8 +79,8 @@ def _infer_provider(base_url: str) -> str:
     return "custom"
 
 
-def get_llm_settings() -> Dict[str, str]:
-    api_key = _get_api_key()
+def get_llm_settings(api_key: Optional[str] = None) -> Dict[str, str]:
+    api_key = api_key or _get_api_key()
     base_url = _first_non_empty(
         "OPENAI_COMPAT_BASE_URL",
         "LLM_BASE_URL",
@@ -78,14 +115,492 @@ def get_llm_settings() -> Dict[str, str]:
     }
 
 
-def get_async_llm_client() -> AsyncOpenAI:
-    s = get_llm_settings()
-    return AsyncOpenAI(api_key=s["api_key"], base_url=s["base_url"], timeout=s["timeout_s"])
+def _is_cacheable(response: ChatCompletion) -> bool:
+    """只缓存有正文的完整响应"""
+    if not response.choices:
+        return False
+    choice = response.choices[0]
+    return bool(choice.message and choice.message.content) and choice.finish_reason in (None, "stop")
 
 
-def get_sync_llm_client() -> OpenAI:
-    s = get_llm_settings()
-    return OpenAI(api_key=s["api_key"], base_url=s["base_url"], timeout=s["timeout_s"])
+def _cache_key(cache: LLMResponseCache, kwargs: Dict[str, Any]) -> str:
+    return cache.make_key(
+        kwargs.get("model"),
+        kwargs.get("messages") or [],
+        kwargs.get("temperature"),
+        kwargs.get("max_tokens"),
+    )
+
+
+def _cache_lookup(cache: LLMResponseCache, kwargs: Dict[str, Any]) -> Tuple[str, Optional[ChatCompletion]]:
+    key = _cache_key(cache, kwargs)
+    payload = cache.get(key)
+    return key, (ChatCompletion.model_validate_json(payload) if payload is not None else None)
+
+
+def _cache_store(cache: LLMResponseCache, key: str, response: ChatCompletion, model: Optional[str]) -> None:
+    if _is_cacheable(response):
+        cache.set(key, response.model_dump_json(), model=model)
+
+
+class _CachedCompletions:
+    """chat.completions 的同步缓存代理；调用方可通过 cache=False 跳过缓存"""
+
+    def __init__(self, completions: Any, cache: Optional[LLMResponseCache]):
+        self._completions = completions
+        self._cache = cache
+
+    def create(self, *, cache: bool = True, **kwargs: Any) -> Any:
+        if not cache or self._cache is None or kwargs.get("stream"):
+            return self._completions.create(**kwargs)
+
+        key, hit = _cache_lookup(self._cache, kwargs)
+        if hit is not None:
+            return hit
+
+        response = self._completions.create(**kwargs)
+        _cache_store(self._cache, key, response, kwargs.get("model"))
+        return response
+
+
+class _AsyncCachedCompletions(_CachedCompletions):
+    """chat.completions 的异步缓存代理，SQLite 读写放到线程里避免阻塞事件循环"""
+
+    async def create(self, *, cache: bool = True, **kwargs: Any) -> Any:
+        if not cache or self._cache is None or kwargs.get("stream"):
+            return await self._completions.create(**kwargs)
+
+        key, hit = await asyncio.to_thread(_cache_lookup, self._cache, kwargs)
+        if hit is not None:
+            return hit
+
+        response = await self._completions.create(**kwargs)
+        await asyncio.to_thread(_cache_store, self._cache, key, response, kwargs.get("model"))
+        return response
+
+
+class _CachedChat:
+    def __init__(self, completions: _CachedCompletions):
+        self.completions = completions
+
+
+class CachedLLMClient:
+    """
+    带响应缓存的 LLM 客户端包装
+
+    只替换 chat.completions.create，其余属性透传给原始客户端。
+    cache 为 None（LLM_CACHE_ENABLED=0）时所有调用直接透传。
+    """
+
+    def __init__(self, client: Union[OpenAI, AsyncOpenAI], cache: Optional[LLMResponseCache]):
+        self._client = client
+        completions_cls = _AsyncCachedCompletions if isinstance(client, AsyncOpenAI) else _CachedCompletions
+        self.chat = _CachedChat(completions_cls(client.chat.completions, cache))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+def _http_options() -> Dict[str, Any]:
+    """连接池配置（可通过环境变量调整）"""
+    max_connections = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20") or "20")
+    http2_env = os.getenv("LLM_HTTP2", "auto").strip().lower()
+    http2_available = importlib.util.find_spec("h2") is not None
+    return {
+        "max_connections": max_connections,
+        "max_keepalive_connections": int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", str(max_connections)) or max_connections),
+        "keepalive_expiry": float(os.getenv("LLM_HTTP_KEEPALIVE_S", "60") or "60"),
+        "http2": http2_available and http2_env not in {"0", "false", "no", "off"},
+    }
+
+
+def _build_http_client(is_async: bool, timeout_s: int) -> Union[httpx.Client, httpx.AsyncClient]:
+    opts = _http_options()
+    limits = httpx.Limits(
+        max_connections=opts["max_connections"],
+        max_keepalive_connections=opts["max_keepalive_connections"],
+        keepalive_expiry=opts["keepalive_expiry"],
+    )
+    client_cls = httpx.AsyncClient if is_async else httpx.Client
+    return client_cls(limits=limits, http2=opts["http2"], timeout=timeout_s, follow_redirects=True)
+
+
+# 进程级客户端注册表：每个 (base_url, api_key) 只建一个带连接池的客户端，
+# 轮换 Key 只是在已建好的客户端之间选择，不会重新握手 TLS。
+# httpx.AsyncClient 的连接绑定在创建它的事件循环上，所以异步客户端再按事件循环分组。
+_sync_clients: Dict[Tuple[str, str], OpenAI] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_async_clients_no_loop: Dict[Tuple[str, str], AsyncOpenAI] = {}
+_client_lock = threading.Lock()
+
+
+def _pooled_sync_client(s: Dict[str, Any]) -> OpenAI:
+    key = (s["base_url"], s["api_key"])
+    client = _sync_clients.get(key)
+    if client is None:
+        with _client_lock:
+            client = _sync_clients.get(key)
+            if client is None:
+                client = OpenAI(
+                    api_key=s["api_key"],
+                    base_url=s["base_url"],
+                    timeout=s["timeout_s"],
+                    http_client=_build_http_client(False, s["timeout_s"]),
+                )
+                _sync_clients[key] = client
+    return client
+
+
+def _pooled_async_client(s: Dict[str, Any]) -> AsyncOpenAI:
+    key = (s["base_url"], s["api_key"])
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    with _client_lock:
+        if loop is None:
+            clients = _async_clients_no_loop
+        else:
+            clients = _async_clients.get(loop)
+            if clients is None:
+                clients = {}
+                _async_clients[loop] = clients
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=s["api_key"],
+                base_url=s["base_url"],
+                timeout=s["timeout_s"],
+                http_client=_build_http_client(True, s["timeout_s"]),
+            )
+            clients[key] = client
+    return client
+
+
+def get_async_llm_client(use_cache: bool = False, api_key: Optional[str] = None) -> Union[AsyncOpenAI, CachedLLMClient]:
+    """
+    获取异步客户端（复用进程内连接池）
+
+    use_cache=True 时返回带持久化响应缓存的包装客户端，
+    create() 额外接受 cache=False 以便个别调用绕过缓存。
+    建议在协程内部调用，这样拿到的是绑定当前事件循环的客户端。
+    api_key 为空时由 Key 池挑选余量最大的 Key。
+    """
+    client = _pooled_async_client(get_llm_settings(api_key))
+    return CachedLLMClient(client, get_response_cache()) if use_cache else client
+
+
+def get_sync_llm_client(use_cache: bool = False, api_key: Optional[str] = None) -> Union[OpenAI, CachedLLMClient]:
+    """获取同步客户端（复用进程内连接池），参数含义同 get_async_llm_client"""
+    client = _pooled_sync_client(get_llm_settings(api_key))
+    return CachedLLMClient(client, get_response_cache()) if use_cache else client
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """是否为限流错误（429 / 各家网关的限流提示）"""
+    if isinstance(error, RateLimitError):
+        return True
+    if getattr(error, "status_code", None) == 429:
+        return True
+    msg = str(error).lower()
+    return "429" in msg or "rate limit" in msg or "rate_limit" in msg or "governor" in msg
+
+
+def _error_headers(error: BaseException) -> Optional[Any]:
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文约 1 字 1 token，其余约 4 字符 1 token"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def _estimate_request_tokens(kwargs: Dict[str, Any]) -> int:
+    prompt = json.dumps(kwargs.get("messages") or [], ensure_ascii=False)
+    return estimate_tokens(prompt) + int(kwargs.get("max_tokens") or 1000)
+
+
+def usage_from_response(response: Any) -> Dict[str, int]:
+    """从响应里取 token 用量（兼容 DeepSeek 的 prompt_cache_hit_tokens 和 OpenAI 的 cached_tokens）"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": cached or 0,
+    }
+
+
+def _total_tokens(usage: Dict[str, int]) -> Optional[int]:
+    """本次实际消耗的 token 数；响应不带 usage 时返回 None（保留预占额度）"""
+    return (usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)) or None
+
+
+RetryCallback = Callable[[int, float], None]
+
+
+class _CallTracker:
+    """一次逻辑调用（含重试）的计量：耗时、首 token 时间、重试次数、最终使用的 Key"""
+
+    def __init__(self, kwargs: Dict[str, Any]):
+        self.model = kwargs.get("model") or ""
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.retries = 0
+        self.api_key = ""
+
+    def first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def finish(self, status: str, usage: Optional[Dict[str, int]] = None) -> None:
+        now = time.perf_counter()
+        usage = usage or {}
+        llm_metrics.record(
+            model=self.model,
+            status=status,
+            duration_s=now - self.started,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            cached_tokens=usage.get("cached_tokens", 0),
+            ttft_s=(self.first_token_at - self.started) if self.first_token_at else None,
+            retries=self.retries,
+            api_key=self.api_key,
+        )
+
+    def fail(self, error: BaseException) -> None:
+        self.finish("rate_limited" if is_rate_limit_error(error) else "error")
+
+
+class _KeyLease:
+    """
+    一次尝试占用的 Key 和预占额度，退出 with 时一定 release（含超时取消、客户端断开）
+
+    used_tokens 决定退还多少：默认 0（没拿到响应，全额退还）；
+    429 时为 None（保留预占，让该 Key 在冷却期间继续显得更满）；成功时为实际用量。
+    """
+
+    def __init__(self, pool: KeyPool, estimated: int, tracker: _CallTracker):
+        self.pool = pool
+        self.estimated = estimated
+        self.api_key, self.wait_s = pool.acquire(estimated)
+        tracker.api_key = self.api_key
+        self.used_tokens: Optional[int] = 0
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.pool.release(self.api_key, self.estimated, self.used_tokens)
+
+    def __enter__(self) -> "_KeyLease":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
+
+
+def _retry_or_raise(
+    lease: _KeyLease,
+    error: Exception,
+    attempt: int,
+    max_retries: int,
+    tracker: _CallTracker,
+    on_retry: Optional[RetryCallback],
+) -> None:
+    """请求失败：429 且还有重试次数时换 Key 重试（返回），否则记录失败并重新抛出"""
+    rate_limited = is_rate_limit_error(error)
+    if rate_limited:
+        lease.used_tokens = None
+        lease.pool.report_rate_limited(lease.api_key, _error_headers(error))
+    lease.release()
+    if not rate_limited or attempt >= max_retries - 1:
+        tracker.fail(error)
+        raise error
+    tracker.retries += 1
+    if on_retry:
+        on_retry(attempt + 1, lease.pool.next_available_in(lease.estimated))
+
+
+def create_chat_completion(
+    *,
+    use_cache: bool = False,
+    cache: bool = True,
+    max_retries: int = 3,
+    on_retry: Optional[RetryCallback] = None,
+    **kwargs: Any,
+) -> ChatCompletion:
+    """
+    同步调用 chat.completions.create，由 Key 池调度
+
+    - 每次尝试选择余量最大的 Key，并按估算 token 预占额度
+    - 429 时把该 Key 停放到冷却期（优先使用 Retry-After），立即换 Key 重试
+    - 只有所有 Key 都在冷却时才等待，等待时长为最早恢复的那个 Key
+    - on_retry(attempt, wait_s) 在每次重试前回调，便于打印进度
+    - 每次调用的 token、耗时、重试次数写入 llm_metrics
+    """
+    tracker = _CallTracker(kwargs)
+    response_cache = get_response_cache() if use_cache and cache and not kwargs.get("stream") else None
+    if response_cache is not None:
+        cache_key, hit = _cache_lookup(response_cache, kwargs)
+        if hit is not None:
+            tracker.finish("cache_hit")
+            return hit
+
+    pool = get_key_pool()
+    estimated = _estimate_request_tokens(kwargs)
+    for attempt in range(max_retries):
+        with _KeyLease(pool, estimated, tracker) as lease:
+            if lease.wait_s > 0:
+                time.sleep(lease.wait_s)
+            client = _pooled_sync_client(get_llm_settings(lease.api_key))
+            try:
+                raw = client.chat.completions.with_raw_response.create(**kwargs)
+            except Exception as e:
+                _retry_or_raise(lease, e, attempt, max_retries, tracker, on_retry)
+                continue
+
+            pool.update_from_headers(lease.api_key, raw.headers)
+            response = raw.parse()
+            usage = usage_from_response(response)
+            lease.used_tokens = _total_tokens(usage)
+        tracker.finish("ok", usage)
+        if response_cache is not None:
+            _cache_store(response_cache, cache_key, response, kwargs.get("model"))
+        return response
+
+    raise RuntimeError("LLM 调用重试次数耗尽")
+
+
+async def acreate_chat_completion(
+    *,
+    use_cache: bool = False,
+    cache: bool = True,
+    max_retries: int = 3,
+    on_retry: Optional[RetryCallback] = None,
+    **kwargs: Any,
+) -> ChatCompletion:
+    """create_chat_completion 的异步版本，等待冷却时不阻塞事件循环"""
+    tracker = _CallTracker(kwargs)
+    response_cache = get_response_cache() if use_cache and cache and not kwargs.get("stream") else None
+    if response_cache is not None:
+        cache_key, hit = await asyncio.to_thread(_cache_lookup, response_cache, kwargs)
+        if hit is not None:
+            tracker.finish("cache_hit")
+            return hit
+
+    pool = get_key_pool()
+    estimated = _estimate_request_tokens(kwargs)
+    for attempt in range(max_retries):
+        with _KeyLease(pool, estimated, tracker) as lease:
+            if lease.wait_s > 0:
+                await asyncio.sleep(lease.wait_s)
+            client = _pooled_async_client(get_llm_settings(lease.api_key))
+            try:
+                raw = await client.chat.completions.with_raw_response.create(**kwargs)
+            except Exception as e:
+                _retry_or_raise(lease, e, attempt, max_retries, tracker, on_retry)
+                continue
+
+            pool.update_from_headers(lease.api_key, raw.headers)
+            response = raw.parse()
+            usage = usage_from_response(response)
+            lease.used_tokens = _total_tokens(usage)
+        tracker.finish("ok", usage)
+        if response_cache is not None:
+            await asyncio.to_thread(_cache_store, response_cache, cache_key, response, kwargs.get("model"))
+        return response
+
+    raise RuntimeError("LLM 调用重试次数耗尽")
+
+
+async def astream_chat_completion(
+    *,
+    max_retries: int = 3,
+    on_retry: Optional[RetryCallback] = None,
+    **kwargs: Any,
+) -> AsyncIterator[str]:
+    """
+    流式调用 chat.completions.create，逐段产出正文增量
+
+    Key 调度与 acreate_chat_completion 相同。429 只会在建立流时出现，
+    还没有产出任何内容，所以可以安全地换 Key 重试。流式输出不走响应缓存。
+    流式响应不带 usage，token 数按文本估算；同时记录首 token 时间。
+    """
+    kwargs.pop("stream", None)
+    tracker = _CallTracker(kwargs)
+    pool = get_key_pool()
+    estimated = _estimate_request_tokens(kwargs)
+    for attempt in range(max_retries):
+        with _KeyLease(pool, estimated, tracker) as lease:
+            if lease.wait_s > 0:
+                await asyncio.sleep(lease.wait_s)
+            client = _pooled_async_client(get_llm_settings(lease.api_key))
+            try:
+                stream = await client.chat.completions.create(stream=True, **kwargs)
+            except Exception as e:
+                _retry_or_raise(lease, e, attempt, max_retries, tracker, on_retry)
+                continue
+
+            parts: List[str] = []
+            status = "error"
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        tracker.first_token()
+                        parts.append(delta)
+                        yield delta
+                status = "ok"
+            finally:
+                prompt_tokens = estimate_tokens(json.dumps(kwargs.get("messages") or [], ensure_ascii=False))
+                completion_tokens = estimate_tokens("".join(parts))
+                lease.used_tokens = prompt_tokens + completion_tokens
+                tracker.finish(status, {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+        return
+
+
+def close_llm_clients() -> None:
+    """关闭所有同步客户端的连接池（进程退出前调用）"""
+    with _client_lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in clients:
+        client.close()
+
+
+def get_llm_pool_stats() -> Dict[str, Any]:
+    """连接池概况"""
+    with _client_lock:
+        async_count = len(_async_clients_no_loop) + sum(len(c) for c in _async_clients.values())
+        return {
+            "sync_clients": len(_sync_clients),
+            "async_clients": async_count,
+            **_http_options(),
+        }
+
+
+def get_llm_cache_stats() -> Optional[Dict[str, Any]]:
+    """LLM 响应缓存统计（未启用时返回 None）"""
+    cache = get_response_cache()
+    return cache.stats() if cache else None
+
+
+def get_llm_key_stats() -> Dict[str, Any]:
+    """Key 池饱和度（Key 已脱敏）"""
+    return get_key_pool().stats()
 
 
 def get_public_llm_config() -> Dict[str, str]:
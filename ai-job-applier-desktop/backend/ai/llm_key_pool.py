@@ -0,0 +1,250 @@
+"""
+多 Key 调度器 - 每个 Key 独立的 RPM/TPM 令牌桶 + 429 冷却
+每次调用选择余量最大的 Key，而不是随机挑一个
+"""
+
+import email.utils
+import re
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# 429 没有 Retry-After 时的退避：2, 4, 8 ... 最多 60 秒
+_BASE_COOLDOWN_S = 2.0
+_MAX_COOLDOWN_S = 60.0
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """解析 '20', '1.5s', '6m0s', '120ms' 这类时长，返回秒"""
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    factors = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(n) * factors[unit] for n, unit in parts)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """从响应头解析需要等待的秒数（Retry-After / retry-after-ms / x-ratelimit-reset-*）"""
+    if not headers:
+        return None
+    h = {str(k).lower(): v for k, v in headers.items()}
+
+    if h.get("retry-after-ms"):
+        try:
+            return max(0.0, float(h["retry-after-ms"]) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = h.get("retry-after")
+    if retry_after:
+        seconds = parse_duration(retry_after)
+        if seconds is not None:
+            return seconds
+        try:
+            when = email.utils.parsedate_to_datetime(retry_after)
+            return max(0.0, when.timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+
+    resets = [
+        parse_duration(h.get("x-ratelimit-reset-requests")),
+        parse_duration(h.get("x-ratelimit-reset-tokens")),
+    ]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+def mask_key(key: str) -> str:
+    return f"{key[:6]}...{key[-4:]}" if len(key) > 12 else "***"
+
+
+class _KeyState:
+    __slots__ = (
+        "key", "request_tokens", "token_tokens", "last_refill", "cooldown_until",
+        "consecutive_429", "inflight", "requests", "rate_limited", "tokens_used",
+    )
+
+    def __init__(self, key: str, rpm: int, tpm: int):
+        self.key = key
+        self.request_tokens = float(rpm)
+        self.token_tokens = float(tpm)
+        self.last_refill = time.monotonic()
+        self.cooldown_until = 0.0
+        self.consecutive_429 = 0
+        self.inflight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.tokens_used = 0
+
+
+class KeyPool:
+    """
+    API Key 池
+
+    - 每个 Key 维护请求数（RPM）和 token 数（TPM）两个令牌桶
+    - acquire() 选择当前余量最大、且不在冷却期的 Key
+    - 收到 429 后按 Retry-After（没有则指数退避）把 Key 停放到冷却期
+    """
+
+    def __init__(self, keys: List[str], rpm: int = 60, tpm: int = 1_000_000):
+        self.rpm = max(1, int(rpm))
+        self.tpm = max(1, int(tpm))
+        self._states: Dict[str, _KeyState] = {k: _KeyState(k, self.rpm, self.tpm) for k in keys}
+        self._lock = threading.Lock()
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._states)
+
+    def _refill(self, state: _KeyState, now: float) -> None:
+        elapsed = now - state.last_refill
+        if elapsed <= 0:
+            return
+        state.request_tokens = min(float(self.rpm), state.request_tokens + elapsed * self.rpm / 60)
+        state.token_tokens = min(float(self.tpm), state.token_tokens + elapsed * self.tpm / 60)
+        state.last_refill = now
+
+    def _headroom(self, state: _KeyState) -> float:
+        return min(state.request_tokens / self.rpm, state.token_tokens / self.tpm)
+
+    def _wait_time(self, state: _KeyState, now: float, estimated_tokens: int) -> float:
+        """该 Key 还要等多久才能发起一次请求"""
+        wait = max(0.0, state.cooldown_until - now)
+        if state.request_tokens < 1:
+            wait = max(wait, (1 - state.request_tokens) * 60 / self.rpm)
+        need = min(estimated_tokens, self.tpm)
+        if state.token_tokens < need:
+            wait = max(wait, (need - state.token_tokens) * 60 / self.tpm)
+        return wait
+
+    def peek(self) -> str:
+        """返回当前最优的 Key，不占用额度"""
+        with self._lock:
+            now = time.monotonic()
+            best = None
+            for state in self._states.values():
+                self._refill(state, now)
+                rank = (self._wait_time(state, now, 0), -self._headroom(state), state.inflight)
+                if best is None or rank < best[0]:
+                    best = (rank, state.key)
+            return best[1] if best else ""
+
+    def next_available_in(self, estimated_tokens: int = 1000) -> float:
+        """最早可用的 Key 还需等待多少秒（0 表示现在就有可用 Key）"""
+        with self._lock:
+            now = time.monotonic()
+            waits = []
+            for state in self._states.values():
+                self._refill(state, now)
+                waits.append(self._wait_time(state, now, estimated_tokens))
+            return min(waits) if waits else 0.0
+
+    def acquire(self, estimated_tokens: int = 1000) -> Tuple[str, float]:
+        """
+        选择一个 Key 并预占额度
+
+        Returns:
+            (key, wait_s)：wait_s > 0 表示所有 Key 都在冷却/耗尽，调用方需要先等待
+        """
+        with self._lock:
+            if not self._states:
+                return "", 0.0
+            now = time.monotonic()
+            best = None
+            for state in self._states.values():
+                self._refill(state, now)
+                wait = self._wait_time(state, now, estimated_tokens)
+                rank = (wait, -self._headroom(state), state.inflight)
+                if best is None or rank < best[0]:
+                    best = (rank, state)
+
+            (wait, _, _), state = best
+            state.request_tokens -= 1
+            state.token_tokens -= estimated_tokens
+            state.inflight += 1
+            state.requests += 1
+            return state.key, wait
+
+    def release(self, key: str, estimated_tokens: int = 1000, used_tokens: Optional[int] = None) -> None:
+        """
+        请求结束：用实际 token 数修正预占额度
+
+        used_tokens 为 None 时保留预占（用量未知）；为 0 表示请求失败、没有消耗 token，全额退还。
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            state.inflight = max(0, state.inflight - 1)
+            if used_tokens is not None:
+                state.token_tokens = min(float(self.tpm), state.token_tokens + estimated_tokens - used_tokens)
+                state.tokens_used += used_tokens
+                if used_tokens:
+                    state.consecutive_429 = 0
+
+    def report_rate_limited(self, key: str, headers: Optional[Mapping[str, str]] = None) -> float:
+        """记录 429，把 Key 停放到冷却期，返回冷却秒数"""
+        retry_after = parse_retry_after(headers)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return 0.0
+            state.rate_limited += 1
+            state.consecutive_429 += 1
+            if retry_after is None:
+                retry_after = min(_MAX_COOLDOWN_S, _BASE_COOLDOWN_S * (2 ** (state.consecutive_429 - 1)))
+            state.cooldown_until = max(state.cooldown_until, time.monotonic() + retry_after)
+            state.request_tokens = min(state.request_tokens, 0.0)
+            return retry_after
+
+    def update_from_headers(self, key: str, headers: Optional[Mapping[str, str]]) -> None:
+        """根据 x-ratelimit-remaining-* 同步服务端看到的剩余额度"""
+        if not headers:
+            return
+        h = {str(k).lower(): v for k, v in headers.items()}
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            try:
+                if h.get("x-ratelimit-remaining-requests") is not None:
+                    state.request_tokens = min(state.request_tokens, float(h["x-ratelimit-remaining-requests"]))
+                if h.get("x-ratelimit-remaining-tokens") is not None:
+                    state.token_tokens = min(state.token_tokens, float(h["x-ratelimit-remaining-tokens"]))
+            except ValueError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """每个 Key 的饱和度"""
+        with self._lock:
+            now = time.monotonic()
+            keys = []
+            for state in self._states.values():
+                self._refill(state, now)
+                keys.append({
+                    "key": mask_key(state.key),
+                    "rpm_saturation_pct": round((1 - max(0.0, state.request_tokens) / self.rpm) * 100, 2),
+                    "tpm_saturation_pct": round((1 - max(0.0, state.token_tokens) / self.tpm) * 100, 2),
+                    "cooldown_remaining_s": round(max(0.0, state.cooldown_until - now), 2),
+                    "inflight": state.inflight,
+                    "requests": state.requests,
+                    "rate_limited": state.rate_limited,
+                    "tokens_used": state.tokens_used,
+                })
+            return {
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "available_keys": sum(1 for k in keys if k["cooldown_remaining_s"] == 0),
+                "keys": keys,
+            }
@@ -0,0 +1,188 @@
+"""
+LLM 调用计量 - token 用量、耗时、首 token 时间、重试次数、使用的 Key
+按 角色 / 流水线 聚合，通过 /metrics 以 Prometheus 格式导出
+"""
+
+import contextlib
+import contextvars
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from ai.llm_key_pool import mask_key
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:  # prometheus-client 未安装时退化为内置的文本导出
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+_labels: contextvars.ContextVar = contextvars.ContextVar("llm_metric_labels", default={})
+
+DURATION_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+TTFT_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 60)
+
+
+@contextlib.contextmanager
+def metric_labels(role: Optional[str] = None, pipeline: Optional[str] = None) -> Iterator[None]:
+    """
+    设置当前上下文里 LLM 调用的归属（角色 / 流水线）
+
+    基于 contextvars，协程和 asyncio.to_thread 启动的线程都会继承；未指定的字段沿用外层的值。
+    """
+    current = dict(_labels.get())
+    for name, value in (("role", role), ("pipeline", pipeline)):
+        if value:
+            current[name] = value
+    token = _labels.set(current)
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def current_labels() -> Dict[str, str]:
+    labels = _labels.get()
+    return {
+        "role": labels.get("role", "-"),
+        "pipeline": labels.get("pipeline", "-"),
+    }
+
+
+def estimate_cost(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """按每百万 token 单价估算费用（LLM_PRICE_* 未配置时为 0）"""
+    price_in = float(os.getenv("LLM_PRICE_INPUT_PER_M", "0") or 0)
+    price_cached = float(os.getenv("LLM_PRICE_CACHED_INPUT_PER_M", "") or price_in)
+    price_out = float(os.getenv("LLM_PRICE_OUTPUT_PER_M", "0") or 0)
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * price_in + cached_tokens * price_cached + completion_tokens * price_out) / 1_000_000
+
+
+class LLMMetrics:
+    """
+    LLM 调用指标
+
+    Prometheus 指标（安装了 prometheus-client 时）：
+        llm_requests_total{model,role,pipeline,status}
+        llm_tokens_total{model,role,pipeline,kind}      kind = prompt / completion / cached
+        llm_cost_total{model,role,pipeline}
+        llm_retries_total{model,role,pipeline}
+        llm_key_requests_total{key}
+        llm_request_duration_seconds{model,role,pipeline}    直方图
+        llm_time_to_first_token_seconds{model,role,pipeline} 直方图
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._summary: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self.registry = None
+        if PROMETHEUS_AVAILABLE:
+            self.registry = CollectorRegistry(auto_describe=True)
+            labels = ["model", "role", "pipeline"]
+            self.requests = Counter("llm_requests_total", "LLM 调用次数", labels + ["status"], registry=self.registry)
+            self.tokens = Counter("llm_tokens_total", "LLM token 用量", labels + ["kind"], registry=self.registry)
+            self.cost = Counter("llm_cost_total", "LLM 估算费用", labels, registry=self.registry)
+            self.retries = Counter("llm_retries_total", "LLM 限流重试次数", labels, registry=self.registry)
+            self.key_requests = Counter("llm_key_requests_total", "各 Key 的调用次数", ["key"], registry=self.registry)
+            self.duration = Histogram(
+                "llm_request_duration_seconds", "LLM 调用耗时", labels,
+                buckets=DURATION_BUCKETS, registry=self.registry,
+            )
+            self.ttft = Histogram(
+                "llm_time_to_first_token_seconds", "LLM 首 token 时间", labels,
+                buckets=TTFT_BUCKETS, registry=self.registry,
+            )
+
+    def record(
+        self,
+        *,
+        model: str,
+        status: str,
+        duration_s: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached_tokens: int = 0,
+        ttft_s: Optional[float] = None,
+        retries: int = 0,
+        api_key: str = "",
+    ) -> Dict[str, Any]:
+        """记录一次调用，status 取值：ok / cache_hit / rate_limited / error"""
+        labels = current_labels()
+        model = model or "-"
+        cost = estimate_cost(prompt_tokens, completion_tokens, cached_tokens) if status == "ok" else 0.0
+
+        with self._lock:
+            key = (labels["role"], labels["pipeline"])
+            summary = self._summary.setdefault(key, {
+                "requests": 0, "errors": 0, "cache_hits": 0, "retries": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+                "cost": 0.0, "duration_s": 0.0,
+            })
+            summary["requests"] += 1
+            summary["errors"] += status in ("error", "rate_limited")
+            summary["cache_hits"] += status == "cache_hit"
+            summary["retries"] += retries
+            summary["prompt_tokens"] += prompt_tokens
+            summary["completion_tokens"] += completion_tokens
+            summary["cached_tokens"] += cached_tokens
+            summary["cost"] += cost
+            summary["duration_s"] += duration_s
+
+        if self.registry is not None:
+            c = {"model": model, **labels}
+            self.requests.labels(status=status, **c).inc()
+            if prompt_tokens:
+                self.tokens.labels(kind="prompt", **c).inc(prompt_tokens)
+            if completion_tokens:
+                self.tokens.labels(kind="completion", **c).inc(completion_tokens)
+            if cached_tokens:
+                self.tokens.labels(kind="cached", **c).inc(cached_tokens)
+            if cost:
+                self.cost.labels(**c).inc(cost)
+            if retries:
+                self.retries.labels(**c).inc(retries)
+            if api_key:
+                self.key_requests.labels(key=mask_key(api_key)).inc()
+            if status != "cache_hit":
+                self.duration.labels(**c).observe(duration_s)
+                if ttft_s is not None:
+                    self.ttft.labels(**c).observe(ttft_s)
+
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cost": cost,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """按 角色/流水线 聚合的 JSON 摘要"""
+        with self._lock:
+            rows = [
+                {"role": role, "pipeline": pipeline, **dict(values)}
+                for (role, pipeline), values in self._summary.items()
+            ]
+        for row in rows:
+            row["avg_duration_s"] = round(row["duration_s"] / row["requests"], 3) if row["requests"] else 0
+            row["cost"] = round(row["cost"], 6)
+        return {"prometheus": PROMETHEUS_AVAILABLE, "groups": rows}
+
+    def render(self) -> Tuple[bytes, str]:
+        """导出 Prometheus 文本格式"""
+        if self.registry is not None:
+            return generate_latest(self.registry), CONTENT_TYPE_LATEST
+
+        # 未安装 prometheus-client：只导出计数器
+        lines = []
+        rows = self.summary()["groups"]
+        for name in ("requests", "errors", "cache_hits", "retries", "prompt_tokens", "completion_tokens", "cached_tokens", "cost"):
+            lines.append(f"# TYPE llm_{name}_total counter")
+            for row in rows:
+                label = f'role="{row["role"]}",pipeline="{row["pipeline"]}"'
+                lines.append(f"llm_{name}_total{{{label}}} {row[name]}")
+        return ("\n".join(lines) + "\n").encode("utf-8"), CONTENT_TYPE_LATEST
+
+
+llm_metrics = LLMMetrics()
@@ -5,10 +5,12 @@
 
 import os
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from openai import OpenAI
 from dotenv import load_dotenv
-from app.core.llm_client import get_sync_llm_client, get_llm_settings
+from app.core.llm_client import create_chat_completion, get_llm_settings, is_rate_limit_error
+from ai.context_builder import ContextBuilder
+from ai.llm_metrics import metric_labels
 
 # 加载.env文件
 load_dotenv()
@@ -17,11 +19,10 @@ class MultiAIDebateEngine:
     """多AI辩论引擎 - 让AI互相辩论、改进、检查"""
     
     def __init__(self):
-        self.llm_client = get_sync_llm_client()
         settings = get_llm_settings()
         self.reasoning_model = settings["reasoning_model"]
         
-        # 定义6个AI角色 - 使用专业框架和方法论
+        # 定义6个AI角色 - 使用专业框架和方法论（cacheable=False 的角色跳过响应缓存）
         self.ai_roles = {
             "career_planner": {
                 "name": "职业规划师",
@@ -146,6 +147,7 @@ class MultiAIDebateEngine:
             },
             "interviewer": {
                 "name": "模拟面试官",
+                "cacheable": False,  # 模拟面试每次应给出不同的追问
                 "prompt": """你是严格的面试官，拥有12年面试经验，精通行为面试、技术面试、压力面试。
 
 面试风格：
@@ -182,115 +184,108 @@ class MultiAIDebateEngine:
         text = re.sub(r'#\s+', '', text)                  # # 标题 -> 标题
         return text.strip()
     
-    def ai_think(self, role: str, context: str, previous_output: str = "") -> Dict[str, Any]:
+    def ai_think(
+        self,
+        role: str,
+        context: str,
+        previous_output: str = "",
+        builder: Optional[ContextBuilder] = None,
+    ) -> Dict[str, Any]:
         """
         让指定AI角色思考并输出
         
         Args:
             role: AI角色 (career_planner, recruiter, etc.)
-            context: 上下文信息（简历、岗位等）
+            context: 上下文信息（简历、岗位等）；传入 builder 时只需要简历以外的部分
             previous_output: 上一个AI的输出（用于辩论改进）
+            builder: 同一份简历共享的上下文构建器，保证各角色的消息前缀一致
         
         Returns:
             {
                 "role": "角色名",
                 "output": "AI输出内容",
-                "reasoning": "推理过程"
+                "reasoning": "推理过程",
+                "tokens": {"prompt_tokens": ..., "completion_tokens": ..., "cached_tokens": ...}
             }
         """
         role_info = self.ai_roles[role]
         
-        # 构建提示词
+        # 构建提示词：简历作为共享前缀，上游输出按预算压缩
+        upstream = {}
+        if builder is None:
+            builder = ContextBuilder(context)
+        elif context:
+            upstream["上下文信息"] = context
         if previous_output:
-            prompt = f"""
-{role_info['prompt']}
-
-你的任务：{role_info['task']}
-
-上下文信息：
-{context}
-
-上一个AI的输出：
-{previous_output}
-
-请基于上一个AI的输出，进行改进、补充或审核。如果发现问题，请明确指出并给出改进建议。
-"""
+            upstream["上一个AI的输出"] = previous_output
+            instruction = "请基于上一个AI的输出，进行改进、补充或审核。如果发现问题，请明确指出并给出改进建议。"
         else:
-            prompt = f"""
-{role_info['prompt']}
-
-你的任务：{role_info['task']}
-
-上下文信息：
-{context}
-
-请完成你的任务，给出详细的分析和建议。
-"""
+            instruction = "请完成你的任务，给出详细的分析和建议。"
+        messages = builder.build(
+            role_info['prompt'],
+            upstream=upstream,
+            task=f"你的任务：{role_info['task']}\n\n{instruction}"
+        )
         
         # 调用DeepSeek推理模式
+        def on_retry(attempt: int, wait_s: float):
+            wait_hint = f"{wait_s:.1f}秒后" if wait_s > 0 else "切换 Key "
+            print(f"限流错误，{wait_hint}重试... (尝试 {attempt + 1}/3)")
+
         try:
-            import time
-            max_retries = 3
-            retry_delay = 3
-
-            for attempt in range(max_retries):
-                try:
-                    # 每次重试重新获取 client（可能会轮换到不同的 Key）
-                    if attempt > 0:
-                        self.llm_client = get_sync_llm_client()
-                        settings = get_llm_settings()
-                        self.reasoning_model = settings["reasoning_model"]
-                        print(f"重试 {attempt + 1}/{max_retries}，使用新的 API Key...")
-
-                    response = self.llm_client.chat.completions.create(
-                        model=self.reasoning_model,
-                        messages=[{"role": "user", "content": prompt}],
-                        temperature=0.7
-                    )
-
-                    message = response.choices[0].message
-                    reasoning = getattr(message, "reasoning_content", "") or ""
-                    output = message.content or ""
-
-                    # 清理Markdown格式
-                    output = self._clean_markdown(output)
-                    reasoning = self._clean_markdown(reasoning)
-
-                    return {
-                        "role": role_info['name'],
-                        "output": output,
-                        "reasoning": reasoning
-                    }
-                except Exception as e:
-                    error_msg = str(e)
-                    if "governor" in error_msg.lower() or "rate" in error_msg.lower() or "429" in error_msg:
-                        if attempt < max_retries - 1:
-                            print(f"限流错误，{retry_delay}秒后重试... (尝试 {attempt + 1}/{max_retries})")
-                            time.sleep(retry_delay)
-                            retry_delay += 2  # 递增延迟
-                            continue
-                    raise
-
-            # 所有重试都失败
+            # Key 池按余量选 Key；429 时冷却该 Key 并立即换 Key 重试，全部冷却才等待
+            with metric_labels(role=role, pipeline="debate"):
+                response = create_chat_completion(
+                    use_cache=True,
+                    cache=role_info.get("cacheable", True),
+                    max_retries=3,
+                    on_retry=on_retry,
+                    model=self.reasoning_model,
+                    messages=messages,
+                    temperature=0.7
+                )
+            tokens = builder.record_usage(role_info['name'], response)
+
+            message = response.choices[0].message
+            reasoning = getattr(message, "reasoning_content", "") or ""
+            output = message.content or ""
+
+            # 清理Markdown格式
+            output = self._clean_markdown(output)
+            reasoning = self._clean_markdown(reasoning)
+
             return {
                 "role": role_info['name'],
-                "output": f"AI思考出错: 所有 API Key 都达到限流，请稍后再试",
-                "reasoning": ""
+                "output": output,
+                "reasoning": reasoning,
+                "tokens": tokens
             }
         except Exception as e:
+            if is_rate_limit_error(e):
+                return {
+                    "role": role_info['name'],
+                    "output": f"AI思考出错: 所有 API Key 都达到限流，请稍后再试",
+                    "reasoning": ""
+                }
             return {
                 "role": role_info['name'],
                 "output": f"AI思考出错: {str(e)}",
                 "reasoning": ""
             }
     
-    def debate_chain(self, initial_context: str, roles: List[str]) -> List[Dict[str, Any]]:
+    def debate_chain(
+        self,
+        initial_context: str,
+        roles: List[str],
+        builder: Optional[ContextBuilder] = None,
+    ) -> List[Dict[str, Any]]:
         """
         AI辩论链：让多个AI依次处理，后面的AI基于前面的输出改进
         
         Args:
-            initial_context: 初始上下文（如简历内容）
+            initial_context: 初始上下文（如简历内容；传入 builder 时为简历以外的部分）
             roles: AI角色列表，按顺序执行
+            builder: 共享的上下文构建器
         
         Returns:
             所有AI的输出列表
@@ -306,7 +301,7 @@ class MultiAIDebateEngine:
             role_name = self.ai_roles[role]['name']
             print(f"[{i}/{len(roles)}] {role_name} 正在思考...")
             
-            result = self.ai_think(role, initial_context, previous_output)
+            result = self.ai_think(role, initial_context, previous_output, builder)
             results.append(result)
             
             print(f"✓ {role_name} 完成\n")
@@ -352,42 +347,50 @@ class JobApplicationPipeline:
         print("开始完整求职流程...")
         print("🚀"*30 + "\n")
         
+        # 所有阶段共享同一个简历前缀
+        builder = ContextBuilder(resume_text)
+        
         # 阶段1：职业分析
         print("\n【阶段1】职业分析")
-        career_result = self.debate_engine.ai_think(
-            "career_planner", 
-            f"简历内容：\n{resume_text}"
-        )
+        career_result = self.debate_engine.ai_think("career_planner", "", builder=builder)
         
         # 阶段2：岗位搜索
         print("\n【阶段2】岗位搜索")
         job_result = self.debate_engine.ai_think(
             "recruiter",
-            f"简历内容：\n{resume_text}",
-            career_result['output']
+            "",
+            career_result['output'],
+            builder
         )
         
         # 阶段3：简历优化（辩论模式：优化师 → 检查官 → 再优化）
         print("\n【阶段3】简历优化（多轮辩论）")
         resume_debates = self.debate_engine.debate_chain(
-            f"简历内容：\n{resume_text}\n\n目标岗位：\n{job_result['output']}",
-            ["resume_optimizer", "quality_checker", "resume_optimizer"]
+            f"目标岗位：\n{job_result['output']}",
+            ["resume_optimizer", "quality_checker", "resume_optimizer"],
+            builder
         )
         
         # 阶段4：面试准备（辩论模式：教练 → 面试官）
         print("\n【阶段4】面试准备")
         interview_debates = self.debate_engine.debate_chain(
-            f"简历内容：\n{resume_text}\n\n目标岗位：\n{job_result['output']}\n\n优化后简历：\n{resume_debates[-1]['output']}",
-            ["interview_coach", "interviewer"]
+            f"目标岗位：\n{job_result['output']}\n\n优化后简历：\n{resume_debates[-1]['output']}",
+            ["interview_coach", "interviewer"],
+            builder
         )
         
+        token_usage = builder.report()
+        total = token_usage["total"]
+        print(f"\n📊 Token 统计：输入 {total['prompt_tokens']}（前缀缓存命中 {total['cached_tokens']}），输出 {total['completion_tokens']}")
+        
         return {
             "career_analysis": career_result['output'],
             "job_recommendations": job_result['output'],
             "optimized_resume": resume_debates[-1]['output'],
             "interview_prep": interview_debates[0]['output'],
             "mock_interview": interview_debates[1]['output'],
-            "all_debates": [career_result, job_result] + resume_debates + interview_debates
+            "all_debates": [career_result, job_result] + resume_debates + interview_debates,
+            "token_usage": token_usage
         }
     
     def save_results(self, results: Dict[str, Any], output_dir: str = "output"):
@@ -6,14 +6,14 @@
 import os
 import time
 from typing import Dict, Any
-from app.core.llm_client import get_sync_llm_client, get_llm_settings
+from app.core.llm_client import create_chat_completion, get_llm_settings, is_rate_limit_error
+from ai.llm_metrics import metric_labels
 
 
 class OptimizedJobPipeline:
     """优化的求职流程 - 4个核心Agent"""
 
     def __init__(self):
-        self.llm_client = get_sync_llm_client()
         settings = get_llm_settings()
         self.reasoning_model = settings["reasoning_model"]
 
@@ -166,9 +166,7 @@ class OptimizedJobPipeline:
             print(f"\n🤖 {agent['name']} 正在深度思考...")
 
         try:
-            import random
             max_retries = 3
-            retry_delay = 3
 
             # 如果是岗位匹配专家，先进行实时搜索
             search_results = ""
@@ -188,17 +186,19 @@ class OptimizedJobPipeline:
                 # 将搜索结果添加到上下文
                 context = f"{context}\n\n【实时岗位搜索结果】\n{search_results}\n\n请基于以上真实岗位信息进行推荐。"
 
-            for attempt in range(max_retries):
-                try:
-                    # 每次重试重新获取 client（轮换 Key）
-                    if attempt > 0:
-                        self.llm_client = get_sync_llm_client()
-                        settings = get_llm_settings()
-                        self.reasoning_model = settings["reasoning_model"]
-                        if show_progress:
-                            print(f"   ↻ 重试 {attempt + 1}/{max_retries}...")
-
-                    response = self.llm_client.chat.completions.create(
+            def on_retry(attempt: int, wait_s: float):
+                if show_progress:
+                    wait_hint = f"，{wait_s:.1f}秒后" if wait_s > 0 else "，切换 Key "
+                    print(f"   ⚠ 限流{wait_hint}重试 {attempt + 1}/{max_retries}...")
+
+            # Key 池按余量选 Key；429 时冷却该 Key 并立即换 Key 重试
+            try:
+                with metric_labels(role=role, pipeline="optimized"):
+                    response = create_chat_completion(
+                        use_cache=True,
+                        cache=agent.get("cacheable", True),
+                        max_retries=max_retries,
+                        on_retry=on_retry,
                         model=self.reasoning_model,
                         messages=[
                             {"role": "system", "content": agent['prompt']},
@@ -206,27 +206,18 @@ class OptimizedJobPipeline:
                         ],
                         temperature=0.7
                     )
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    return f"❌ {agent['name']} 处理失败：所有API Key都达到限流"
+                raise
 
-                    message = response.choices[0].message
-                    output = message.content or ""
-
-                    if show_progress:
-                        print(f"   ✓ {agent['name']} 完成")
-
-                    return output.strip()
+            message = response.choices[0].message
+            output = message.content or ""
 
-                except Exception as e:
-                    error_msg = str(e)
-                    if "governor" in error_msg.lower() or "rate" in error_msg.lower() or "429" in error_msg:
-                        if attempt < max_retries - 1:
-                            if show_progress:
-                                print(f"   ⚠ 限流，{retry_delay}秒后重试...")
-                            time.sleep(retry_delay)
-                            retry_delay += 2
-                            continue
-                    raise
+            if show_progress:
+                print(f"   ✓ {agent['name']} 完成")
 
-            return f"❌ {agent['name']} 处理失败：所有API Key都达到限流"
+            return output.strip()
 
         except Exception as e:
             return f"❌ {agent['name']} 处理失败: {str(e)}"
@@ -1,255 +1,312 @@
 """
 性能监控 - 实时监控系统性能
+按路由 / 函数统计延迟直方图（p50/p90/p99/max）、1m/5m/1h 滑动窗口、并发中的请求数
 """
+import functools
+import inspect
+import math
+import threading
 import time
-import psutil
 from datetime import datetime
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Optional
 
-class PerformanceMonitor:
-    """性能监控器"""
-    
-    def __init__(self):
-        self.start_time = time.time()
-        self.request_count = 0
-        self.error_count = 0
-        self.total_response_time = 0
-    
-    def record_request(self, response_time: float, is_error: bool = False):
-        """记录请求"""
-        self.request_count += 1
-        self.total_response_time += response_time
-        if is_error:
-            self.error_count += 1
-    
-    def get_stats(self) -> Dict[str, Any]:
-        """获取统计信息"""
-        uptime = time.time() - self.start_time
-        avg_response_time = (
-            self.total_response_time / self.request_count 
-            if self.request_count > 0 else 0
-        )
-        
-        return {
-            "uptime_seconds": round(uptime, 2),
-            "uptime_hours": round(uptime / 3600, 2),
-            "total_requests": self.request_count,
-            "error_count": self.error_count,
-            "error_rate": round(self.error_count / self.request_count * 100, 2) if self.request_count > 0 else 0,
-            "avg_response_time_ms": round(avg_response_time * 1000, 2),
-            "requests_per_second": round(self.request_count / uptime, 2) if uptime > 0 else 0,
-            "cpu_percent": psutil.cpu_percent(),
-            "memory_percent": psutil.virtual_memory().percent,
-            "timestamp": datetime.now().isoformat()
-        }
+import psutil
 
-# 全局监控实例
-monitor = PerformanceMonitor()
+# 直方图精度：每个 2 的幂区间再分 32 个子桶，相对误差约 1.6%
+SUB_BUCKETS = 32
 
-def track_performance(func):
-    """性能追踪装饰器"""
-    async def wrapper(*args, **kwargs):
-        start = time.time()
-        error = False
-        try:
-            result = await func(*args, **kwargs)
-            return result
-        except Exception as e:
-            error = True
-            raise e
-        finally:
-            response_time = time.time() - start
-            monitor.record_request(response_time, error)
-    return wrapper
+# 滑动窗口：10 秒一个时间片，保留 1 小时
+SLOT_SECONDS = 10
+SLOT_COUNT = 360
+WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
 
-性能监控 - 实时监控系统性能
-"""
-import time
-import psutil
-from datetime import datetime
-from typing import Dict, Any
+PERCENTILES = (50, 90, 99)
+
+
+def _bucket_of(value_us: float) -> int:
+    """HDR 风格的对数-线性分桶（微秒）"""
+    if value_us < 1:
+        return 0
+    mantissa, exponent = math.frexp(value_us)  # value = mantissa * 2**exponent, 0.5 <= mantissa < 1
+    return exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+
+
+def _bucket_upper(bucket: int) -> float:
+    """桶的上界（微秒）"""
+    if bucket == 0:
+        return 1.0
+    exponent, sub = divmod(bucket, SUB_BUCKETS)
+    return math.ldexp(0.5 + (sub + 1) / (2 * SUB_BUCKETS), exponent)
+
+
+class LatencyHistogram:
+    """稀疏的延迟直方图：只记录出现过的桶，合并和求分位数都只遍历非空桶"""
+
+    __slots__ = ("counts", "count", "errors", "total_us", "max_us")
 
-class PerformanceMonitor:
-    """性能监控器"""
-    
     def __init__(self):
-        self.start_time = time.time()
-        self.request_count = 0
-        self.error_count = 0
-        self.total_response_time = 0
-    
-    def record_request(self, response_time: float, is_error: bool = False):
-        """记录请求"""
-        self.request_count += 1
-        self.total_response_time += response_time
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.errors = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def record(self, value_us: float, is_error: bool = False) -> None:
+        bucket = _bucket_of(value_us)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
         if is_error:
-            self.error_count += 1
-    
-    def get_stats(self) -> Dict[str, Any]:
-        """获取统计信息"""
-        uptime = time.time() - self.start_time
-        avg_response_time = (
-            self.total_response_time / self.request_count 
-            if self.request_count > 0 else 0
-        )
-        
+            self.errors += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for bucket, n in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + n
+        self.count += other.count
+        self.errors += other.errors
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentiles(self, points=PERCENTILES) -> Dict[str, float]:
+        """返回各分位数（毫秒）；桶上界不超过真实最大值"""
+        if not self.count:
+            return {f"p{p}": 0.0 for p in points}
+        result = {}
+        ordered = sorted(self.counts.items())
+        targets = sorted((max(1, math.ceil(self.count * p / 100)), p) for p in points)
+        seen = 0
+        i = 0
+        for bucket, n in ordered:
+            seen += n
+            while i < len(targets) and seen >= targets[i][0]:
+                result[f"p{targets[i][1]}"] = round(min(_bucket_upper(bucket), self.max_us) / 1000, 2)
+                i += 1
+            if i == len(targets):
+                break
+        return result
+
+    def summary(self) -> Dict[str, Any]:
         return {
-            "uptime_seconds": round(uptime, 2),
-            "uptime_hours": round(uptime / 3600, 2),
-            "total_requests": self.request_count,
-            "error_count": self.error_count,
-            "error_rate": round(self.error_count / self.request_count * 100, 2) if self.request_count > 0 else 0,
-            "avg_response_time_ms": round(avg_response_time * 1000, 2),
-            "requests_per_second": round(self.request_count / uptime, 2) if uptime > 0 else 0,
-            "cpu_percent": psutil.cpu_percent(),
-            "memory_percent": psutil.virtual_memory().percent,
-            "timestamp": datetime.now().isoformat()
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_us / self.count / 1000, 2) if self.count else 0,
+            "max_ms": round(self.max_us / 1000, 2),
+            **self.percentiles(),
         }
 
-# 全局监控实例
-monitor = PerformanceMonitor()
 
-def track_performance(func):
-    """性能追踪装饰器"""
-    async def wrapper(*args, **kwargs):
-        start = time.time()
-        error = False
-        try:
-            result = await func(*args, **kwargs)
-            return result
-        except Exception as e:
-            error = True
-            raise e
-        finally:
-            response_time = time.time() - start
-            monitor.record_request(response_time, error)
-    return wrapper
+class _Series:
+    """一个路由 / 函数的统计：累计直方图 + 按时间片滚动的直方图 + 并发数"""
 
-性能监控 - 实时监控系统性能
-"""
-import time
-import psutil
-from datetime import datetime
-from typing import Dict, Any
+    __slots__ = ("lock", "total", "slots", "slot_ids", "inflight")
 
-class PerformanceMonitor:
-    """性能监控器"""
-    
     def __init__(self):
-        self.start_time = time.time()
-        self.request_count = 0
-        self.error_count = 0
-        self.total_response_time = 0
-    
-    def record_request(self, response_time: float, is_error: bool = False):
-        """记录请求"""
-        self.request_count += 1
-        self.total_response_time += response_time
-        if is_error:
-            self.error_count += 1
-    
-    def get_stats(self) -> Dict[str, Any]:
-        """获取统计信息"""
-        uptime = time.time() - self.start_time
-        avg_response_time = (
-            self.total_response_time / self.request_count 
-            if self.request_count > 0 else 0
-        )
-        
-        return {
-            "uptime_seconds": round(uptime, 2),
-            "uptime_hours": round(uptime / 3600, 2),
-            "total_requests": self.request_count,
-            "error_count": self.error_count,
-            "error_rate": round(self.error_count / self.request_count * 100, 2) if self.request_count > 0 else 0,
-            "avg_response_time_ms": round(avg_response_time * 1000, 2),
-            "requests_per_second": round(self.request_count / uptime, 2) if uptime > 0 else 0,
-            "cpu_percent": psutil.cpu_percent(),
-            "memory_percent": psutil.virtual_memory().percent,
-            "timestamp": datetime.now().isoformat()
-        }
+        self.lock = threading.Lock()
+        self.total = LatencyHistogram()
+        self.slots: List[Optional[LatencyHistogram]] = [None] * SLOT_COUNT
+        self.slot_ids: List[int] = [-1] * SLOT_COUNT
+        self.inflight = 0
 
-# 全局监控实例
-monitor = PerformanceMonitor()
+    def record(self, duration_s: float, is_error: bool, now: float) -> None:
+        value_us = duration_s * 1_000_000
+        slot_id = int(now // SLOT_SECONDS)
+        index = slot_id % SLOT_COUNT
+        with self.lock:
+            if self.slot_ids[index] != slot_id:
+                self.slots[index] = LatencyHistogram()
+                self.slot_ids[index] = slot_id
+            self.slots[index].record(value_us, is_error)
+            self.total.record(value_us, is_error)
 
-def track_performance(func):
-    """性能追踪装饰器"""
-    async def wrapper(*args, **kwargs):
-        start = time.time()
-        error = False
-        try:
-            result = await func(*args, **kwargs)
-            return result
-        except Exception as e:
-            error = True
-            raise e
-        finally:
-            response_time = time.time() - start
-            monitor.record_request(response_time, error)
-    return wrapper
+    def window(self, seconds: int, now: float) -> LatencyHistogram:
+        """合并最近 seconds 秒内的时间片"""
+        current = int(now // SLOT_SECONDS)
+        oldest = current - seconds // SLOT_SECONDS + 1
+        merged = LatencyHistogram()
+        with self.lock:
+            for slot_id, hist in zip(self.slot_ids, self.slots):
+                if hist is not None and oldest <= slot_id <= current:
+                    merged.merge(hist)
+        return merged
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        with self.lock:
+            total = self.total.summary()
+            inflight = self.inflight
+        windows = {}
+        for name, seconds in WINDOWS.items():
+            hist = self.window(seconds, now)
+            windows[name] = {**hist.summary(), "rps": round(hist.count / seconds, 3)}
+        return {"inflight": inflight, "total": total, "windows": windows}
 
-性能监控 - 实时监控系统性能
-"""
-import time
-import psutil
-from datetime import datetime
-from typing import Dict, Any
 
 class PerformanceMonitor:
-    """性能监控器"""
-    
+    """
+    性能监控器
+
+    - record(name, duration_s, is_error)：记录一次调用
+    - begin(name) / end(name, duration_s, is_error)：同时维护并发数
+    每个名称一把锁，临界区只有几次字典自增，适合每个请求都调用。
+    """
+
     def __init__(self):
         self.start_time = time.time()
-        self.request_count = 0
-        self.error_count = 0
-        self.total_response_time = 0
-    
+        self._series: Dict[str, _Series] = {}
+        self._series_lock = threading.Lock()
+        # 第一次调用 cpu_percent(None) 只建立基线，之后的调用不会阻塞采样
+        psutil.cpu_percent(interval=None)
+
+    def _get(self, name: str) -> _Series:
+        series = self._series.get(name)
+        if series is None:
+            with self._series_lock:
+                series = self._series.setdefault(name, _Series())
+        return series
+
+    def begin(self, name: str) -> None:
+        series = self._get(name)
+        with series.lock:
+            series.inflight += 1
+
+    def end(self, name: str, duration_s: float, is_error: bool = False) -> None:
+        series = self._get(name)
+        with series.lock:
+            series.inflight -= 1
+        series.record(duration_s, is_error, time.time())
+
+    def record(self, name: str, duration_s: float, is_error: bool = False) -> None:
+        self._get(name).record(duration_s, is_error, time.time())
+
     def record_request(self, response_time: float, is_error: bool = False):
-        """记录请求"""
-        self.request_count += 1
-        self.total_response_time += response_time
-        if is_error:
-            self.error_count += 1
-    
+        """记录请求（兼容旧接口，计入 "request" 序列）"""
+        self.record("request", response_time, is_error)
+
+    def get_series(self, prefix: str = "") -> Dict[str, Any]:
+        """按名称前缀获取各序列的快照"""
+        now = time.time()
+        return {
+            name: series.snapshot(now)
+            for name, series in sorted(list(self._series.items()))
+            if name.startswith(prefix)
+        }
+
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
         uptime = time.time() - self.start_time
-        avg_response_time = (
-            self.total_response_time / self.request_count 
-            if self.request_count > 0 else 0
-        )
-        
+        series = self.get_series()
+
+        overall = LatencyHistogram()
+        for name in ("http", "request"):
+            s = self._series.get(name)
+            if s is not None:
+                with s.lock:
+                    overall.merge(s.total)
+        summary = overall.summary()
+
         return {
             "uptime_seconds": round(uptime, 2),
             "uptime_hours": round(uptime / 3600, 2),
-            "total_requests": self.request_count,
-            "error_count": self.error_count,
-            "error_rate": round(self.error_count / self.request_count * 100, 2) if self.request_count > 0 else 0,
-            "avg_response_time_ms": round(avg_response_time * 1000, 2),
-            "requests_per_second": round(self.request_count / uptime, 2) if uptime > 0 else 0,
-            "cpu_percent": psutil.cpu_percent(),
+            "total_requests": summary["count"],
+            "error_count": summary["errors"],
+            "error_rate": round(summary["errors"] / summary["count"] * 100, 2) if summary["count"] > 0 else 0,
+            "avg_response_time_ms": summary["avg_ms"],
+            "p50_ms": summary["p50"],
+            "p90_ms": summary["p90"],
+            "p99_ms": summary["p99"],
+            "max_ms": summary["max_ms"],
+            "requests_per_second": round(summary["count"] / uptime, 2) if uptime > 0 else 0,
+            "inflight": series.get("http", {}).get("inflight", 0),
+            "cpu_percent": psutil.cpu_percent(interval=None),
             "memory_percent": psutil.virtual_memory().percent,
+            "routes": {k[len("route:"):]: v for k, v in series.items() if k.startswith("route:")},
+            "functions": {k[len("func:"):]: v for k, v in series.items() if k.startswith("func:")},
             "timestamp": datetime.now().isoformat()
         }
 
 # 全局监控实例
 monitor = PerformanceMonitor()
 
-def track_performance(func):
-    """性能追踪装饰器"""
-    async def wrapper(*args, **kwargs):
-        start = time.time()
+def track_performance(func: Optional[Callable] = None, *, name: Optional[str] = None):
+    """
+    性能追踪装饰器（同步 / 异步函数都适用）
+
+    用法：@track_performance 或 @track_performance(name="resume.parse")
+    """
+    def decorator(fn: Callable):
+        series = f"func:{name or fn.__qualname__}"
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                monitor.begin(series)
+                start = time.perf_counter()
+                error = False
+                try:
+                    return await fn(*args, **kwargs)
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    monitor.end(series, time.perf_counter() - start, error)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            monitor.begin(series)
+            start = time.perf_counter()
+            error = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                monitor.end(series, time.perf_counter() - start, error)
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
+
+
+class PerformanceMiddleware:
+    """
+    ASGI 中间件：自动统计每个 HTTP 路由
+
+    序列名使用路由模板（如 "GET /api/records/{record_id}"），不会因路径参数膨胀；
+    没有匹配到路由的请求统一记为 "unmatched"。状态码 >= 500 或抛出异常记为错误。
+    WebSocket 和 lifespan 直接透传。
+    """
+
+    def __init__(self, app, performance_monitor: Optional[PerformanceMonitor] = None):
+        self.app = app
+        self.monitor = performance_monitor or monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        # 路由要等路由匹配之后才知道，所以并发数记在总序列 "http" 上
+        self.monitor.begin("http")
+        start = time.perf_counter()
         error = False
         try:
-            result = await func(*args, **kwargs)
-            return result
-        except Exception as e:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
             error = True
-            raise e
+            raise
         finally:
-            response_time = time.time() - start
-            monitor.record_request(response_time, error)
-    return wrapper
-
-
-
+            duration = time.perf_counter() - start
+            self.monitor.end("http", duration, error or status["code"] >= 500)
+            route = scope.get("route")
+            path = getattr(route, "path", None)
+            label = f"{scope.get('method', '')} {path}" if path else "unmatched"
+            self.monitor.record(f"route:{label}", duration, error or status["code"] >= 500)
@@ -1,28 +1,40 @@
 """
 实时进度系统 - WebSocket实时通信
 真正的实时进度，不是假的！
+
+每次分析一个 run_id、一个追踪器，只推送给订阅了这个 run_id 的连接，
+并发的分析互不干扰。
 """
 
 import asyncio
-from typing import Dict, List, Callable
+import re
+import time
+import uuid
+from typing import Dict, List, Callable, Optional
 from datetime import datetime
 import json
 
 class RealtimeProgressTracker:
     """实时进度追踪器"""
     
-    def __init__(self):
+    def __init__(self, run_id: str = ""):
+        self.run_id = run_id
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
         self.connections: List = []  # WebSocket连接列表
         self.current_progress = {
+            "run_id": run_id,
             "step": 0,
             "total_steps": 5,
             "percentage": 0,
             "status": "idle",
             "message": "",
             "ai_messages": [],
-            "start_time": None,
+            "start_time": datetime.now().isoformat(),
             "current_agent": None
         }
+        # 各AI正在流式输出的内容（结束后转为一条 ai_message）
+        self.streaming: Dict[str, List[str]] = {}
     
     async def connect(self, websocket):
         """添加WebSocket连接"""
@@ -62,6 +74,30 @@ class RealtimeProgressTracker:
             "data": ai_msg
         })
     
+    async def add_ai_delta(self, agent: str, delta: str, done: bool = False):
+        """推送AI流式输出的增量；done=True 时把完整内容记为一条AI消息"""
+        parts = self.streaming.setdefault(agent, [])
+        if delta:
+            parts.append(delta)
+
+        await self.broadcast({
+            "type": "ai_delta",
+            "data": {
+                "agent": agent,
+                "delta": delta,
+                "done": done,
+                "timestamp": datetime.now().isoformat()
+            }
+        })
+
+        if done:
+            self.streaming.pop(agent, None)
+            self.current_progress["ai_messages"].append({
+                "agent": agent,
+                "message": "".join(parts),
+                "timestamp": datetime.now().isoformat()
+            })
+    
     async def complete(self):
         """完成处理"""
         self.current_progress.update({
@@ -70,6 +106,7 @@ class RealtimeProgressTracker:
             "status": "completed",
             "message": "所有AI协作完成！"
         })
+        self.finished_at = time.monotonic()
         
         await self.broadcast(self.current_progress)
     
@@ -79,6 +116,7 @@ class RealtimeProgressTracker:
             "status": "error",
             "message": error_message
         })
+        self.finished_at = time.monotonic()
         
         await self.broadcast(self.current_progress)
     
@@ -89,31 +127,59 @@ class RealtimeProgressTracker:
         
         message = json.dumps(data, ensure_ascii=False)
         
-        # 移除已断开的连接
-        disconnected = []
-        for websocket in self.connections:
-            try:
-                await websocket.send_text(message)
-            except:
-                disconnected.append(websocket)
-        
-        for ws in disconnected:
-            self.disconnect(ws)
-    
-    def reset(self):
-        """重置进度"""
-        self.current_progress = {
-            "step": 0,
-            "total_steps": 5,
-            "percentage": 0,
-            "status": "idle",
-            "message": "",
-            "ai_messages": [],
-            "start_time": None,
-            "current_agent": None
-        }
+        # 并发发送，慢连接不拖累其他连接；移除已断开的连接
+        connections = list(self.connections)
+        results = await asyncio.gather(
+            *(websocket.send_text(message) for websocket in connections),
+            return_exceptions=True
+        )
+        for ws, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(ws)
+
+
+_RUN_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class ProgressRegistry:
+    """
+    按 run_id 管理进度追踪器
+
+    WebSocket 可以在发起分析之前先用自己生成的 run_id 订阅；结束的追踪器
+    在没有连接后保留 keep_s 秒，方便晚连上的客户端拿到最终结果。
+    """
+
+    def __init__(self, keep_s: float = 300):
+        self.keep_s = keep_s
+        self._runs: Dict[str, RealtimeProgressTracker] = {}
+
+    @staticmethod
+    def valid_run_id(run_id: Optional[str]) -> bool:
+        return bool(run_id and _RUN_ID.match(run_id))
+
+    def new_run_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def get(self, run_id: str) -> RealtimeProgressTracker:
+        """获取（不存在时创建）run_id 对应的追踪器"""
+        self._purge()
+        tracker = self._runs.get(run_id)
+        if tracker is None:
+            tracker = self._runs[run_id] = RealtimeProgressTracker(run_id)
+        return tracker
 
+    def _purge(self):
+        """清理没有连接、且已结束（或一直没开始）超过 keep_s 的追踪器"""
+        cutoff = time.monotonic() - self.keep_s
+        for run_id, tracker in list(self._runs.items()):
+            if tracker.connections:
+                continue
+            last = tracker.finished_at
+            if last is None and tracker.current_progress["status"] == "idle":
+                last = tracker.created_at
+            if last is not None and last < cutoff:
+                del self._runs[run_id]
 
-# 全局进度追踪器
-progress_tracker = RealtimeProgressTracker()
 
+# 全局进度追踪器（按 run_id 分开）
+progress_runs = ProgressRegistry()
@@ -1,7 +1,7 @@
 """
 简历分析 API - 集成 4 个 AI Agent
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 import logging
@@ -14,12 +14,37 @@ logger = logging.getLogger(__name__)
 class ResumeAnalysisRequest(BaseModel):
     resume_text: str
     analysis_type: str = "full"  # full, career, jobs, interview, quality
+    refresh: bool = False  # True 时忽略已存储的结果，重新分析
+    run_id: Optional[str] = None  # /fast：进度推送的订阅 ID，客户端可先用它连接 /ws/progress
 
 
 class ResumeAnalysisResponse(BaseModel):
     success: bool
     results: Dict[str, Any]
     message: str = ""
+    run_id: Optional[str] = None
+
+
+# 分析步骤：(Agent, 适用的 analysis_type, 上游结果键, 输出结果键, 结果有效期秒数)
+# 岗位匹配会实时搜索岗位，结果只保留一天
+ANALYSIS_STEPS = [
+    ("career_analyst", {"full", "career"}, [], ["career_analysis"], None),
+    ("job_matcher", {"full", "jobs"}, ["career_analysis"], ["job_recommendations"], 24 * 3600),
+    ("interview_coach", {"full", "interview"}, ["career_analysis", "job_recommendations"],
+     ["interview_preparation", "mock_interview"], None),
+    ("quality_auditor", {"full", "quality"}, ["career_analysis", "job_recommendations", "interview_preparation"],
+     ["skill_gap_analysis", "quality_audit"], None),
+]
+
+
+def _build_agent_context(agent: str, resume_text: str, results: Dict[str, Any]) -> str:
+    if agent == "career_analyst":
+        return f"请分析以下简历：\n\n{resume_text}"
+    if agent == "job_matcher":
+        return f"简历：\n{resume_text}\n\n职业分析：\n{results.get('career_analysis', '无')}"
+    if agent == "interview_coach":
+        return f"简历：\n{resume_text}\n\n职业分析：\n{results.get('career_analysis', '无')}\n\n岗位匹配：\n{results.get('job_recommendations', '无')}"
+    return f"职业分析：\n{results.get('career_analysis', '无')}\n\n岗位匹配：\n{results.get('job_recommendations', '无')}\n\n面试准备：\n{results.get('interview_preparation', '无')}"
 
 
 @router.post("/resume", response_model=ResumeAnalysisResponse)
@@ -30,63 +55,53 @@ async def analyze_resume(request: ResumeAnalysisRequest):
     - job_matcher: 岗位推荐专家
     - interview_coach: 面试辅导专家
     - quality_auditor: 质量审核官
+
+    每个 Agent 的结果按（规范化简历哈希 + 提示词版本 + 上游输入）持久化，
+    命中的 Agent 直接复用，只运行缺失的 Agent。
     """
     try:
         from ai.optimized_pipeline import OptimizedJobPipeline
+        from data.analysis_store import get_analysis_store, prompt_version, resume_hash
 
         logger.info(f"开始简历分析，类型: {request.analysis_type}")
 
         pipeline = OptimizedJobPipeline()
+        store = get_analysis_store()
+        digest = resume_hash(request.resume_text)
         results = {}
-
-        # Agent 1: 职业分析
-        if request.analysis_type in ["full", "career"]:
-            logger.info("执行职业分析...")
-            career_analysis = await asyncio.to_thread(
-                pipeline._ai_think,
-                "career_analyst",
-                f"请分析以下简历：\n\n{request.resume_text}"
-            )
-            results['career_analysis'] = career_analysis
-
-        # Agent 2: 岗位推荐
-        if request.analysis_type in ["full", "jobs"]:
-            logger.info("执行岗位推荐...")
-            job_recommendations = await asyncio.to_thread(
-                pipeline._ai_think,
-                "job_matcher",
-                f"简历：\n{request.resume_text}\n\n职业分析：\n{results.get('career_analysis', '无')}"
-            )
-            results['job_recommendations'] = job_recommendations
-
-        # Agent 3: 面试辅导
-        if request.analysis_type in ["full", "interview"]:
-            logger.info("执行面试辅导...")
-            interview_prep = await asyncio.to_thread(
-                pipeline._ai_think,
-                "interview_coach",
-                f"简历：\n{request.resume_text}\n\n职业分析：\n{results.get('career_analysis', '无')}\n\n岗位匹配：\n{results.get('job_recommendations', '无')}"
-            )
-            results['interview_preparation'] = interview_prep
-            results['mock_interview'] = interview_prep
-
-        # Agent 4: 质量审核
-        if request.analysis_type in ["full", "quality"]:
-            logger.info("执行质量审核...")
-            quality_audit = await asyncio.to_thread(
-                pipeline._ai_think,
-                "quality_auditor",
-                f"职业分析：\n{results.get('career_analysis', '无')}\n\n岗位匹配：\n{results.get('job_recommendations', '无')}\n\n面试准备：\n{results.get('interview_preparation', '无')}"
-            )
-            results['skill_gap_analysis'] = quality_audit
-            results['quality_audit'] = quality_audit
+        reused = []
+
+        for agent, types, upstream_keys, output_keys, ttl_s in ANALYSIS_STEPS:
+            if request.analysis_type not in types:
+                continue
+
+            version = prompt_version(pipeline.agents[agent]["prompt"], pipeline.reasoning_model)
+            key = store.make_key(digest, agent, version, [results.get(k, "无") for k in upstream_keys])
+            output = None if request.refresh else await asyncio.to_thread(store.get, key)
+
+            if output is not None:
+                logger.info(f"复用已存储的分析结果: {agent}")
+                reused.append(agent)
+            else:
+                logger.info(f"执行 {agent}...")
+                output = await asyncio.to_thread(
+                    pipeline._ai_think,
+                    agent,
+                    _build_agent_context(agent, request.resume_text, results)
+                )
+                # 失败的输出不存储，下次重新分析
+                if not output.startswith("❌"):
+                    await asyncio.to_thread(store.put, key, digest, agent, version, output, ttl_s)
+
+            for output_key in output_keys:
+                results[output_key] = output
 
         logger.info("简历分析完成")
 
         return ResumeAnalysisResponse(
             success=True,
             results=results,
-            message="分析完成"
+            message=f"分析完成（复用 {len(reused)} 个已有结果）" if reused else "分析完成"
         )
 
     except Exception as e:
@@ -96,6 +111,66 @@ async def analyze_resume(request: ResumeAnalysisRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.websocket("/ws/progress")
+async def websocket_progress(websocket: WebSocket, run_id: str = Query("")):
+    """
+    WebSocket 实时进度 - 推送某次 /fast 分析（?run_id=...）的步骤进度和AI流式输出增量（type=ai_delta）
+    """
+    from ai.realtime_progress import progress_runs
+
+    if not progress_runs.valid_run_id(run_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    tracker = progress_runs.get(run_id)
+    await websocket.accept()
+    await tracker.connect(websocket)
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        tracker.disconnect(websocket)
+
+
+@router.post("/fast")
+async def analyze_resume_fast(request: ResumeAnalysisRequest):
+    """
+    快速分析 - 6 个 AI 按依赖并行，流式输出通过 /ws/progress?run_id=... 实时推送
+
+    想看实时进度时，客户端先生成 run_id 并连接 WebSocket，再带着同一个 run_id 调用本接口；
+    不传 run_id 时由服务端生成，随结果返回。
+    """
+    from ai.fast_ai_engine import fast_pipeline
+    from ai.realtime_progress import progress_runs
+
+    if request.run_id and not progress_runs.valid_run_id(request.run_id):
+        raise HTTPException(status_code=400, detail="run_id 只能包含字母、数字、- 和 _，最长 64 位")
+    run_id = request.run_id or progress_runs.new_run_id()
+    tracker = progress_runs.get(run_id)
+
+    try:
+        results = await fast_pipeline.process_resume_fast(
+            request.resume_text,
+            progress_callback=tracker.update_progress,
+            stream_callback=tracker.add_ai_delta
+        )
+        await tracker.complete()
+
+        return ResumeAnalysisResponse(
+            success=True,
+            results=results,
+            message="分析完成",
+            run_id=run_id
+        )
+
+    except Exception as e:
+        logger.error(f"快速分析失败: {e}")
+        await tracker.error(str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/optimize")
 async def optimize_resume(resume_text: str, target_job: Optional[str] = None):
     """
@@ -1,20 +1,20 @@
 """
 投递记录 API
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+import asyncio
 import logging
-import json
-import os
+
+from data import record_export
+from data.record_store import DuplicateRecordError, get_record_store
 
 router = APIRouter(prefix="/api/records", tags=["记录"])
 logger = logging.getLogger(__name__)
 
-# 简单的 JSON 文件存储
-RECORDS_FILE = "data/application_records.json"
-
 
 class ApplicationRecord(BaseModel):
     id: str
@@ -32,85 +32,69 @@ class ApplicationRecord(BaseModel):
 class RecordsResponse(BaseModel):
     success: bool
     records: List[ApplicationRecord]
-    total: int
-
-
-def _ensure_data_dir():
-    """确保数据目录存在"""
-    os.makedirs("data", exist_ok=True)
-
-
-def _load_records() -> List[dict]:
-    """加载记录"""
-    _ensure_data_dir()
-
-    if not os.path.exists(RECORDS_FILE):
-        return []
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
-    try:
-        with open(RECORDS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"加载记录失败: {e}")
-        return []
 
-
-def _save_records(records: List[dict]):
-    """保存记录"""
-    _ensure_data_dir()
-
-    try:
-        with open(RECORDS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(records, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        logger.error(f"保存记录失败: {e}")
+def _to_model(r: dict) -> ApplicationRecord:
+    return ApplicationRecord(
+        id=r.get('id', ''),
+        job_id=r.get('job_id', ''),
+        job_title=r.get('job_title', ''),
+        company=r.get('company', ''),
+        salary=r.get('salary', ''),
+        location=r.get('location', ''),
+        status=r.get('status', ''),
+        cover_letter=r.get('cover_letter', ''),
+        applied_at=r.get('applied_at', ''),
+        response=r.get('response')
+    )
 
 
 @router.get("", response_model=RecordsResponse)
 async def get_records(
     status: Optional[str] = None,
-    limit: int = 100,
-    offset: int = 0
+    company: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    with_total: bool = True
 ):
     """
-    获取投递记录
+    获取投递记录（最新的在前）
+
+    - status / company：精确匹配
+    - date_from / date_to：投递时间范围（ISO 日期或时间，date_to 只给日期时包含当天）
+    - q：职位名称关键词
+    - cursor：上一页返回的 next_cursor，按 (applied_at, id) 翻页；不传时使用 offset
+    - with_total=false：跳过总数统计（轮询时推荐）
     """
     try:
-        records = _load_records()
-
-        # 筛选
-        if status:
-            records = [r for r in records if r.get('status') == status]
-
-        # 排序（最新的在前）
-        records.sort(key=lambda x: x.get('applied_at', ''), reverse=True)
-
-        # 分页
-        total = len(records)
-        records = records[offset:offset + limit]
-
-        # 转换为响应格式
-        record_list = []
-        for r in records:
-            record_list.append(ApplicationRecord(
-                id=r.get('id', ''),
-                job_id=r.get('job_id', ''),
-                job_title=r.get('job_title', ''),
-                company=r.get('company', ''),
-                salary=r.get('salary', ''),
-                location=r.get('location', ''),
-                status=r.get('status', ''),
-                cover_letter=r.get('cover_letter', ''),
-                applied_at=r.get('applied_at', ''),
-                response=r.get('response')
-            ))
+        records, total, next_cursor = await asyncio.to_thread(
+            get_record_store().query,
+            status=status,
+            company=company,
+            date_from=date_from,
+            date_to=date_to,
+            q=q,
+            limit=limit,
+            cursor=cursor,
+            offset=offset,
+            with_total=with_total,
+        )
 
         return RecordsResponse(
             success=True,
-            records=record_list,
-            total=total
+            records=[_to_model(r) for r in records],
+            total=total,
+            next_cursor=next_cursor
         )
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取记录失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -122,20 +106,19 @@ async def add_record(record: ApplicationRecord):
     添加投递记录
     """
     try:
-        records = _load_records()
-
-        # 添加新记录
         record_dict = record.dict()
         if not record_dict.get('id'):
-            record_dict['id'] = f"{record.job_id}_{int(datetime.now().timestamp())}"
+            # 留空交给 RecordStore 生成 {job_id}_{uuid}，避免同一秒内重复
+            record_dict.pop('id', None)
         if not record_dict.get('applied_at'):
             record_dict['applied_at'] = datetime.now().isoformat()
 
-        records.append(record_dict)
-        _save_records(records)
+        saved = await asyncio.to_thread(get_record_store().insert, record_dict)
 
-        return {"success": True, "message": "记录添加成功"}
+        return {"success": True, "message": "记录添加成功", "id": saved.get("id")}
 
+    except DuplicateRecordError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"添加记录失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -147,9 +130,7 @@ async def delete_record(record_id: str):
     删除投递记录
     """
     try:
-        records = _load_records()
-        records = [r for r in records if r.get('id') != record_id]
-        _save_records(records)
+        await asyncio.to_thread(get_record_store().delete, record_id)
 
         return {"success": True, "message": "记录删除成功"}
 
@@ -161,22 +142,25 @@ async def delete_record(record_id: str):
 @router.get("/stats")
 async def get_stats():
     """
-    获取统计信息
+    获取统计信息（读物化计数，与记录数无关）
     """
     try:
-        records = _load_records()
+        stats = await asyncio.to_thread(get_record_store().stats)
 
-        total = len(records)
-        success = len([r for r in records if r.get('status') == 'success'])
-        failed = len([r for r in records if r.get('status') == 'failed'])
-        pending = len([r for r in records if r.get('status') == 'pending'])
+        counts = stats["by_status"]
+        total = stats["total"]
+        success = counts.get('success', 0)
+        failed = counts.get('failed', 0)
+        pending = counts.get('pending', 0)
 
         return {
             "total": total,
             "success": success,
             "failed": failed,
             "pending": pending,
-            "success_rate": round(success / total * 100, 2) if total > 0 else 0
+            "success_rate": round(success / total * 100, 2) if total > 0 else 0,
+            "by_status": counts,
+            "by_platform": stats["by_platform"]
         }
 
     except Exception as e:
@@ -184,17 +168,45 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/export")
-async def export_records():
+@router.get("/stats/daily")
+async def get_daily_stats(date_from: Optional[str] = None, date_to: Optional[str] = None):
     """
-    导出记录为 CSV
+    按天的投递数（图表用），date_from / date_to 为 YYYY-MM-DD
     """
     try:
-        records = _load_records()
-
-        # TODO: 实现 CSV 导出
-        return {"message": "功能开发中"}
+        series = await asyncio.to_thread(get_record_store().daily_series, date_from, date_to)
+        return {"success": True, "series": series}
 
     except Exception as e:
-        logger.error(f"导出失败: {e}")
+        logger.error(f"获取统计失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/export")
+async def export_records(
+    format: str = "csv",
+    gzip: bool = False,
+    status: Optional[str] = None,
+    company: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    q: Optional[str] = None
+):
+    """
+    导出投递记录（流式，支持 csv / ndjson / parquet，筛选参数与列表接口相同）
+    """
+    filters = {"status": status, "company": company, "date_from": date_from, "date_to": date_to, "q": q}
+    try:
+        stream = record_export.export_records(get_record_store(), format, filters=filters, gzip=gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type, ext = record_export.EXPORT_FORMATS[format]
+    filename = f"application_records_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+    if gzip:
+        # 作为 .gz 文件下载，而不是 Content-Encoding（否则浏览器会自动解压）
+        media_type, filename = "application/gzip", f"{filename}.gz"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    # 同步生成器由 Starlette 放到线程池里逐块迭代，不阻塞事件循环
+    return StreamingResponse(stream, media_type=media_type, headers=headers)
@@ -1,17 +1,20 @@
 """
 简历管理 API
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
+import asyncio
 import logging
 import os
-import PyPDF2
-from docx import Document
+import uuid
+
+from data.resume_jobs import get_resume_jobs
+from data.resume_store import RESUME_DIR, RESUME_EXTENSIONS, get_resume_store
 
 router = APIRouter(prefix="/api/resume", tags=["简历"])
 logger = logging.getLogger(__name__)
 
-RESUME_DIR = "data/resumes"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 class ResumeInfo(BaseModel):
@@ -26,89 +29,132 @@ def _ensure_resume_dir():
     os.makedirs(RESUME_DIR, exist_ok=True)
 
 
-def _extract_text_from_pdf(file_path: str) -> str:
-    """从 PDF 提取文本"""
-    try:
-        with open(file_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-            return text
-    except Exception as e:
-        logger.error(f"PDF 提取失败: {e}")
-        return ""
-
-
-def _extract_text_from_docx(file_path: str) -> str:
-    """从 Word 提取文本"""
-    try:
-        doc = Document(file_path)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        return text
-    except Exception as e:
-        logger.error(f"Word 提取失败: {e}")
-        return ""
-
-
 @router.post("/upload")
-async def upload_resume(file: UploadFile = File(...)):
+async def upload_resume(file: UploadFile = File(...), wait: bool = False):
     """
     上传简历
     支持 PDF 和 Word 格式
+
+    文件保存后立即返回 job_id，文本提取和信息抽取在后台进程池里进行；
+    通过 GET /api/resume/jobs/{job_id} 轮询或 WS /api/resume/ws/jobs 订阅结果。
+    wait=true 时等处理完成再返回（旧的同步行为）。
     """
     try:
         _ensure_resume_dir()
 
         # 检查文件类型
-        if not file.filename.endswith(('.pdf', '.doc', '.docx')):
+        filename = os.path.basename(file.filename or "")
+        if not filename.endswith(RESUME_EXTENSIONS):
             raise HTTPException(status_code=400, detail="仅支持 PDF 和 Word 格式")
 
-        # 保存文件
-        file_path = os.path.join(RESUME_DIR, file.filename)
-        with open(file_path, 'wb') as f:
-            content = await file.read()
-            f.write(content)
-
-        # 提取文本
-        if file.filename.endswith('.pdf'):
-            text = _extract_text_from_pdf(file_path)
-        else:
-            text = _extract_text_from_docx(file_path)
-
-        logger.info(f"简历上传成功: {file.filename}")
-
+        # 分块写入临时文件，写完再改名，处理中的任务不会读到半个文件
+        file_path = os.path.join(RESUME_DIR, filename)
+        tmp_path = os.path.join(RESUME_DIR, f".upload-{uuid.uuid4().hex}")
+        try:
+            with open(tmp_path, 'wb') as f:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    await asyncio.to_thread(f.write, chunk)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        jobs = get_resume_jobs()
+        job = jobs.submit(filename)
+        logger.info(f"简历上传成功: {filename}，后台处理中")
+
+        if not wait:
+            return {
+                "success": True,
+                "message": "简历上传成功，正在后台解析",
+                "filename": filename,
+                "job_id": job["job_id"],
+                "status": job["status"]
+            }
+
+        job = await jobs.wait(job["job_id"])
+        if job["status"] != "done":
+            raise HTTPException(status_code=500, detail=job.get("error") or "简历解析失败")
         return {
             "success": True,
             "message": "简历上传成功",
-            "filename": file.filename,
-            "text_length": len(text),
-            "text_preview": text[:200] if text else ""
+            "filename": filename,
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "text_length": job["result"]["text_length"],
+            "text_preview": job["result"]["text_preview"],
+            "info": job["result"].get("info")
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"简历上传失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/jobs/{job_id}")
+async def get_resume_job(job_id: str):
+    """
+    查询简历处理任务状态（queued / processing / done / failed）
+    """
+    job = get_resume_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return {"success": True, **job}
+
+
+@router.websocket("/ws/jobs")
+async def websocket_resume_jobs(websocket: WebSocket):
+    """
+    WebSocket 推送简历处理任务的状态变化（{"type": "resume_job", "data": 任务}）
+    """
+    await websocket.accept()
+    jobs = get_resume_jobs()
+    queue = jobs.subscribe()
+
+    async def _drain_client():
+        # 客户端消息只用来检测断开
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    receiver = asyncio.create_task(_drain_client())
+    try:
+        while not receiver.done():
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                await websocket.send_json({"type": "resume_job", "data": getter.result()})
+            else:
+                getter.cancel()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        jobs.unsubscribe(queue)
+
+
 @router.get("/list")
 async def list_resumes():
     """
-    列出所有简历
+    列出所有简历（读元数据索引）
     """
     try:
         _ensure_resume_dir()
 
         files = []
-        for filename in os.listdir(RESUME_DIR):
-            if filename.endswith(('.pdf', '.doc', '.docx')):
-                file_path = os.path.join(RESUME_DIR, filename)
-                size = os.path.getsize(file_path)
-                files.append({
-                    "filename": filename,
-                    "size": size,
-                    "path": file_path
-                })
+        for meta in await asyncio.to_thread(get_resume_store().list):
+            files.append({
+                "filename": meta["filename"],
+                "size": meta["size"],
+                "path": os.path.join(RESUME_DIR, meta["filename"]),
+                "pages": meta["pages"],
+                "text_length": meta["text_length"],
+                "uploaded_at": meta["uploaded_at"]
+            })
 
         return {
             "success": True,
@@ -127,23 +173,19 @@ async def get_resume_text(filename: str):
     获取简历文本
     """
     try:
-        file_path = os.path.join(RESUME_DIR, filename)
-
-        if not os.path.exists(file_path):
+        # 读取上传时提取的文本，文件变化过才重新提取
+        text = await asyncio.to_thread(get_resume_store().get_text, filename)
+        if text is None:
             raise HTTPException(status_code=404, detail="简历不存在")
 
-        # 提取文本
-        if filename.endswith('.pdf'):
-            text = _extract_text_from_pdf(file_path)
-        else:
-            text = _extract_text_from_docx(file_path)
-
         return {
             "success": True,
             "filename": filename,
             "text": text
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取简历文本失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -161,6 +203,7 @@ async def delete_resume(filename: str):
             raise HTTPException(status_code=404, detail="简历不存在")
 
         os.remove(file_path)
+        get_resume_store().remove(filename)
 
         return {
             "success": True,
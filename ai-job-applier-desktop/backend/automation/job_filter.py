@@ -7,49 +7,96 @@ import hashlib
 import json
 import logging
 import os
+import sqlite3
+import threading
+import time
 from typing import Set, Dict, Optional, List
 from datetime import datetime, timedelta
 from collections import defaultdict
 
+from data.sqlite_util import ThreadLocalConnections
+
+from .keyword_matcher import BlacklistMatch, BlacklistMatcher
+
 logger = logging.getLogger(__name__)
 
 
 class DeduplicateManager:
-    """去重管理器"""
+    """
+    去重管理器
+
+    已投递记录存放在 SQLite（WAL 模式）里，每次投递只追加一行，不再重写整个文件；
+    内存里保留岗位ID集合，is_applied 不查库。applied_at 上有索引，
+    "今日投递" 和清理旧记录都是范围查询。
+    synchronous=NORMAL 下提交只写 WAL，fsync 合并到检查点时进行。
+    """
+
+    # 清理删除超过这么多行时顺带压缩数据库文件
+    COMPACT_THRESHOLD = 1000
 
     def __init__(self, storage_file: str = "data/applied_jobs.json"):
-        self.storage_file = storage_file
+        # 兼容旧参数：传入 .json 时数据库放在同名 .db，旧 JSON 只导入一次
+        base, ext = os.path.splitext(storage_file)
+        self.legacy_file = storage_file if ext == ".json" else None
+        self.storage_file = f"{base}.db" if ext == ".json" else storage_file
         self.applied_jobs: Set[str] = set()
-        self.job_details: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._conn = ThreadLocalConnections(self.storage_file)
+        self._init_db()
         self._load()
 
-    def _load(self):
-        """加载已投递记录"""
-        if not os.path.exists(self.storage_file):
-            return
+    def _init_db(self):
+        if os.path.dirname(self.storage_file):
+            os.makedirs(os.path.dirname(self.storage_file), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS applied_jobs (
+                job_key TEXT PRIMARY KEY,
+                job_title TEXT,
+                company TEXT,
+                job_url TEXT,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_applied_at ON applied_jobs(applied_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_applied_company ON applied_jobs(company)")
 
+    def _load(self):
+        """加载已投递记录（首次运行时导入旧的 applied_jobs.json）"""
+        conn = self._conn()
         try:
-            with open(self.storage_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.applied_jobs = set(data.get('applied_jobs', []))
-                self.job_details = data.get('job_details', {})
+            if self.legacy_file and os.path.exists(self.legacy_file):
+                self._migrate_json(conn)
+            self.applied_jobs = {row[0] for row in conn.execute("SELECT job_key FROM applied_jobs")}
             logger.info(f"已加载 {len(self.applied_jobs)} 条投递记录")
         except Exception as e:
             logger.error(f"加载投递记录失败: {e}")
 
-    def _save(self):
-        """保存投递记录"""
-        os.makedirs(os.path.dirname(self.storage_file), exist_ok=True)
-
+    def _migrate_json(self, conn: sqlite3.Connection):
+        with open(self.legacy_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        details = data.get('job_details', {})
+        rows = []
+        for job_id in set(data.get('applied_jobs', [])) | set(details):
+            d = details.get(job_id, {})
+            rows.append((job_id, d.get('job_title'), d.get('company'), d.get('job_url', ''),
+                         d.get('applied_at') or data.get('updated_at') or datetime.now().isoformat()))
         try:
-            with open(self.storage_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'applied_jobs': list(self.applied_jobs),
-                    'job_details': self.job_details,
-                    'updated_at': datetime.now().isoformat()
-                }, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"保存投递记录失败: {e}")
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR IGNORE INTO applied_jobs(job_key, job_title, company, job_url, applied_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            # 回滚后再抛给 _load，不让这个线程的连接停在写事务里
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        os.replace(self.legacy_file, f"{self.legacy_file}.migrated")
+        logger.info(f"已从 {self.legacy_file} 导入 {len(rows)} 条投递记录")
 
     def generate_job_id(self, job: Dict) -> str:
         """生成岗位唯一ID"""
@@ -71,20 +118,43 @@ class DeduplicateManager:
 
     def mark_applied(self, job: Dict):
         """标记为已投递"""
-        job_id = self.generate_job_id(job)
-        self.applied_jobs.add(job_id)
-
-        # 保存详细信息
-        self.job_details[job_id] = {
-            'job_title': job.get('job_title'),
-            'company': job.get('company'),
-            'applied_at': datetime.now().isoformat(),
-            'job_url': job.get('job_url', '')
-        }
-
-        self._save()
+        self.mark_applied_many([job])
         logger.info(f"已标记投递: {job.get('company')} - {job.get('job_title')}")
 
+    def mark_applied_many(self, jobs: List[Dict]) -> int:
+        """批量标记为已投递（一个事务），返回新增条数；写库失败时回滚并返回 0"""
+        now = datetime.now().isoformat()
+        rows = {}
+        with self._lock:
+            for job in jobs:
+                job_id = self.generate_job_id(job)
+                if job_id in self.applied_jobs or job_id in rows:
+                    continue
+                rows[job_id] = (job_id, job.get('job_title'), job.get('company'), job.get('job_url', ''), now)
+        if not rows:
+            return 0
+
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO applied_jobs(job_key, job_title, company, job_url, applied_at) VALUES (?, ?, ?, ?, ?)",
+                list(rows.values()),
+            )
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.error(f"保存投递记录失败: {e}")
+            return 0
+
+        # 提交成功后才更新内存集合，避免内存里出现没落盘的"已投递"
+        with self._lock:
+            self.applied_jobs.update(rows)
+        return added
+
     def get_applied_count(self) -> int:
         """获取已投递数量"""
         return len(self.applied_jobs)
@@ -92,51 +162,67 @@ class DeduplicateManager:
     def get_applied_today(self) -> int:
         """获取今日投递数量"""
         today = datetime.now().date()
-        count = 0
-
-        for job_id, details in self.job_details.items():
-            applied_at = datetime.fromisoformat(details['applied_at'])
-            if applied_at.date() == today:
-                count += 1
-
-        return count
+        tomorrow = today + timedelta(days=1)
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM applied_jobs WHERE applied_at >= ? AND applied_at < ?",
+            (today.isoformat(), tomorrow.isoformat()),
+        ).fetchone()[0]
 
     def get_applied_companies(self) -> Set[str]:
         """获取已投递的公司列表"""
-        companies = set()
-        for details in self.job_details.values():
-            companies.add(details['company'])
-        return companies
+        rows = self._conn().execute("SELECT DISTINCT company FROM applied_jobs WHERE company IS NOT NULL")
+        return {row[0] for row in rows}
 
     def clear_old_records(self, days: int = 90):
         """清理旧记录"""
-        cutoff_date = datetime.now() - timedelta(days=days)
-        removed_count = 0
+        cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
+        conn = self._conn()
 
-        job_ids_to_remove = []
-        for job_id, details in self.job_details.items():
-            applied_at = datetime.fromisoformat(details['applied_at'])
-            if applied_at < cutoff_date:
-                job_ids_to_remove.append(job_id)
+        with self._lock:
+            old_ids = [row[0] for row in conn.execute(
+                "SELECT job_key FROM applied_jobs WHERE applied_at < ?", (cutoff_date,)
+            )]
+            if not old_ids:
+                return
+            conn.execute("DELETE FROM applied_jobs WHERE applied_at < ?", (cutoff_date,))
+            self.applied_jobs.difference_update(old_ids)
 
-        for job_id in job_ids_to_remove:
-            self.applied_jobs.discard(job_id)
-            del self.job_details[job_id]
-            removed_count += 1
+        logger.info(f"已清理 {len(old_ids)} 条旧记录")
+        if len(old_ids) >= self.COMPACT_THRESHOLD:
+            self.compact()
 
-        if removed_count > 0:
-            self._save()
-            logger.info(f"已清理 {removed_count} 条旧记录")
+    def compact(self):
+        """压缩数据库：合并 WAL 并回收已删除记录占用的空间"""
+        conn = self._conn()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
 
 
 class BlacklistManager:
-    """黑名单管理器"""
+    """
+    黑名单管理器
+
+    规则变化时编译一次 BlacklistMatcher（见 automation/keyword_matcher.py），
+    检查岗位不再逐条规则做子串比较；黑名单文件被外部修改时自动重新加载。
+    """
+
+    # 检查文件是否被修改的最小间隔（秒）
+    RELOAD_CHECK_INTERVAL = 1.0
 
     def __init__(self, storage_file: str = "data/blacklist.json"):
         self.storage_file = storage_file
         self.blacklist: Dict[str, List[str]] = defaultdict(list)
+        self._matcher: Optional[BlacklistMatcher] = None
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
         self._load()
 
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.storage_file).st_mtime
+        except OSError:
+            return None
+
     def _load(self):
         """加载黑名单"""
         if not os.path.exists(self.storage_file):
@@ -145,6 +231,8 @@ class BlacklistManager:
         try:
             with open(self.storage_file, 'r', encoding='utf-8') as f:
                 self.blacklist = defaultdict(list, json.load(f))
+            self._mtime = self._file_mtime()
+            self._matcher = None
             logger.info(f"已加载黑名单")
         except Exception as e:
             logger.error(f"加载黑名单失败: {e}")
@@ -152,13 +240,36 @@ class BlacklistManager:
     def _save(self):
         """保存黑名单"""
         os.makedirs(os.path.dirname(self.storage_file), exist_ok=True)
+        self._matcher = None
 
         try:
             with open(self.storage_file, 'w', encoding='utf-8') as f:
                 json.dump(dict(self.blacklist), f, ensure_ascii=False, indent=2)
+            self._mtime = self._file_mtime()
         except Exception as e:
             logger.error(f"保存黑名单失败: {e}")
 
+    def _reload_if_changed(self):
+        """文件被外部修改时重新加载（最多每 RELOAD_CHECK_INTERVAL 秒 stat 一次）"""
+        now = time.monotonic()
+        if now - self._last_check < self.RELOAD_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        mtime = self._file_mtime()
+        if mtime is not None and mtime != self._mtime:
+            self._load()
+
+    @property
+    def matcher(self) -> BlacklistMatcher:
+        """当前规则对应的匹配器（规则变化后首次使用时重新编译）"""
+        self._reload_if_changed()
+        if self._matcher is None:
+            self._matcher = BlacklistMatcher(
+                self.blacklist.get('companies', []),
+                self.blacklist.get('keywords', []),
+            )
+        return self._matcher
+
     def add_company(self, company: str, reason: str = ""):
         """添加公司到黑名单"""
         if company not in self.blacklist['companies']:
@@ -173,24 +284,26 @@ class BlacklistManager:
             self._save()
             logger.info(f"已添加关键词到黑名单: {keyword} ({reason})")
 
+    def match(self, job: Dict) -> Optional[BlacklistMatch]:
+        """返回命中的规则（类型、规则、原因），未命中返回 None"""
+        return self.matcher.match(job)
+
     def is_blacklisted(self, job: Dict) -> tuple[bool, str]:
         """检查岗位是否在黑名单"""
-        company = job.get('company', '')
-        job_title = job.get('job_title', '')
-        description = job.get('description', '')
-
-        # 检查公司黑名单
-        for blacklisted_company in self.blacklist.get('companies', []):
-            if blacklisted_company.lower() in company.lower():
-                return True, f"公司在黑名单: {blacklisted_company}"
+        hit = self.match(job)
+        return (True, hit.reason) if hit else (False, "")
 
-        # 检查关键词黑名单
-        full_text = f"{job_title} {description}".lower()
-        for keyword in self.blacklist.get('keywords', []):
-            if keyword.lower() in full_text:
-                return True, f"包含黑名单关键词: {keyword}"
-
-        return False, ""
+    def filter_jobs(self, jobs: List[Dict]) -> tuple[List[Dict], List[tuple[Dict, BlacklistMatch]]]:
+        """批量过滤：返回 (未命中的岗位, [(命中的岗位, 命中结果)])"""
+        matcher = self.matcher
+        passed, rejected = [], []
+        for job in jobs:
+            hit = matcher.match(job)
+            if hit:
+                rejected.append((job, hit))
+            else:
+                passed.append(job)
+        return passed, rejected
 
     def remove_company(self, company: str):
         """从黑名单移除公司"""
@@ -210,9 +323,13 @@ class BlacklistManager:
 class JobFilter:
     """岗位过滤器（综合去重和黑名单）"""
 
-    def __init__(self):
-        self.dedup_manager = DeduplicateManager()
-        self.blacklist_manager = BlacklistManager()
+    def __init__(
+        self,
+        dedup_manager: Optional[DeduplicateManager] = None,
+        blacklist_manager: Optional[BlacklistManager] = None,
+    ):
+        self.dedup_manager = dedup_manager or DeduplicateManager()
+        self.blacklist_manager = blacklist_manager or BlacklistManager()
 
     def should_apply(self, job: Dict) -> tuple[bool, str]:
         """判断是否应该投递"""
@@ -233,7 +350,6 @@ class JobFilter:
 
     def filter_jobs(self, jobs: List[Dict]) -> List[Dict]:
         """过滤岗位列表"""
-        filtered_jobs = []
         stats = {
             'total': len(jobs),
             'already_applied': 0,
@@ -241,16 +357,17 @@ class JobFilter:
             'passed': 0
         }
 
+        # 先按已投递去重，再整批过一遍黑名单（匹配器只取一次）
+        candidates = []
         for job in jobs:
-            should_apply, reason = self.should_apply(job)
-
-            if should_apply:
-                filtered_jobs.append(job)
-                stats['passed'] += 1
-            elif "已投递" in reason:
+            if self.dedup_manager.is_applied(job):
                 stats['already_applied'] += 1
             else:
-                stats['blacklisted'] += 1
+                candidates.append(job)
+
+        filtered_jobs, rejected = self.blacklist_manager.filter_jobs(candidates)
+        stats['blacklisted'] = len(rejected)
+        stats['passed'] = len(filtered_jobs)
 
         logger.info(
             f"岗位过滤完成: 总数 {stats['total']}, "
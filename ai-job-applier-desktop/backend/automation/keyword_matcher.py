@@ -0,0 +1,133 @@
+"""
+关键词匹配器
+Aho-Corasick 自动机：一次扫描文本即可找出所有命中的关键词，
+耗时只与文本长度有关，与关键词数量无关
+"""
+
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+
+def normalize_text(text: str) -> str:
+    """规范化：全角转半角、小写、去掉首尾空白"""
+    return unicodedata.normalize("NFKC", text or "").lower().strip()
+
+
+class KeywordMatcher:
+    """
+    多模式子串匹配
+
+    用法：
+        matcher = KeywordMatcher(["996", "外包"])
+        matcher.first_match("Go开发 996工作制")  # -> "996"
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        # 保留原始写法和顺序，命中多个时返回最靠前的那个
+        self.keywords: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        seen = set()
+        for keyword in keywords:
+            pattern = normalize_text(keyword)
+            if not pattern or pattern in seen:
+                continue
+            seen.add(pattern)
+            self._add(pattern, len(self.keywords))
+            self.keywords.append(keyword)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def _add(self, pattern: str, index: int):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(index)
+
+    def _build(self):
+        """BFS 计算失败指针，并把失败链上的输出合并到每个节点"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def iter_matches(self, text: str) -> Iterable[int]:
+        """依次产出命中关键词的下标（可能重复）"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in normalize_text(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                yield from out[node]
+
+    def first_match(self, text: str) -> Optional[str]:
+        """返回命中的关键词中在列表里最靠前的一个，未命中返回 None"""
+        if not self.keywords or not text:
+            return None
+        best = min(self.iter_matches(text), default=None)
+        return None if best is None else self.keywords[best]
+
+    def find_all(self, text: str) -> List[str]:
+        """返回所有命中的关键词（按列表顺序去重）"""
+        return [self.keywords[i] for i in sorted(set(self.iter_matches(text)))]
+
+
+@dataclass
+class BlacklistMatch:
+    """黑名单命中结果"""
+    rule_type: str  # company / keyword
+    rule: str
+    reason: str
+
+
+class BlacklistMatcher:
+    """
+    编译后的黑名单：规则集变化时重建一次，之后每个岗位的检查都是一次线性扫描
+
+    - 公司：规范化名称先查哈希表（完全相同），再用自动机查子串
+    - 关键词：自动机扫描 "职位名称 + 描述"
+    """
+
+    def __init__(self, companies: Iterable[str], keywords: Iterable[str]):
+        companies = list(companies)
+        self._exact_companies = {}
+        for company in companies:
+            self._exact_companies.setdefault(normalize_text(company), company)
+        self._companies = KeywordMatcher(companies)
+        self._keywords = KeywordMatcher(keywords)
+
+    def match(self, job: Dict) -> Optional[BlacklistMatch]:
+        company = job.get('company', '') or ''
+        normalized = normalize_text(company)
+
+        hit = self._exact_companies.get(normalized) or self._companies.first_match(company)
+        if hit:
+            return BlacklistMatch("company", hit, f"公司在黑名单: {hit}")
+
+        text = f"{job.get('job_title', '') or ''} {job.get('description', '') or ''}"
+        hit = self._keywords.first_match(text)
+        if hit:
+            return BlacklistMatch("keyword", hit, f"包含黑名单关键词: {hit}")
+        return None
@@ -0,0 +1,130 @@
+"""
+简历分析结果存储 - 按简历内容哈希持久化每个 Agent 的输出
+
+缓存键 = 规范化简历哈希 + Agent 提示词版本 + 上游输入哈希：
+- 同一份简历重复上传、只改了空白字符，也能命中
+- OptimizedJobPipeline.agents 里的提示词或模型一变，版本号随之变化，旧结果自动失效
+- 上游 Agent 的输出变了，下游 Agent 的结果也随之失效
+"""
+
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from data.sqlite_util import ThreadLocalConnections, lazy_singleton
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_resume(text: str) -> str:
+    """规范化简历文本：全角转半角、合并空白"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def resume_hash(text: str) -> str:
+    return hashlib.sha256(normalize_resume(text).encode("utf-8")).hexdigest()
+
+
+def prompt_version(prompt: str, model: str = "") -> str:
+    """Agent 提示词版本：提示词 + 模型的哈希"""
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()[:16]
+
+
+class AnalysisStore:
+    """
+    基于 SQLite（WAL 模式）的分析结果存储
+
+    每个 Agent 的结果单独存一行，analysis_type 不同的请求也能复用彼此的子结果。
+    过期结果在读取时视为未命中，存储初始化（即每次启动）时从磁盘删除。
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl_s: Optional[int] = None):
+        self.db_path = db_path or os.getenv("ANALYSIS_STORE_PATH", "data/analysis_store.db")
+        self.ttl_s = int(ttl_s or os.getenv("ANALYSIS_STORE_TTL_S", "") or 7 * 24 * 3600)
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = ThreadLocalConnections(self.db_path)
+        self._init_db()
+        self.purge_expired()
+
+    def _init_db(self) -> None:
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analysis_results (
+                key TEXT PRIMARY KEY,
+                resume_hash TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_resume ON analysis_results(resume_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_expires ON analysis_results(expires_at)")
+
+    @staticmethod
+    def make_key(resume_digest: str, agent: str, version: str, upstream: Optional[List[str]] = None) -> str:
+        """结果键：简历哈希 + Agent + 提示词版本 + 各上游输入的哈希"""
+        h = hashlib.sha256()
+        for part in (resume_digest, agent, version):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        for text in upstream or []:
+            h.update(hashlib.sha256((text or "").encode("utf-8")).digest())
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT result, expires_at FROM analysis_results WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def put(
+        self,
+        key: str,
+        resume_digest: str,
+        agent: str,
+        version: str,
+        result: str,
+        ttl_s: Optional[int] = None,
+    ) -> None:
+        now = time.time()
+        self._conn().execute(
+            """
+            INSERT OR REPLACE INTO analysis_results(key, resume_hash, agent, prompt_version, result, created_at, expires_at)
+            VALUES(?, ?, ?, ?, ?, ?, ?)
+            """,
+            (key, resume_digest, agent, version, result, now, now + (ttl_s or self.ttl_s)),
+        )
+
+    def invalidate(self, resume_digest: str) -> int:
+        """删除某份简历的所有分析结果"""
+        cur = self._conn().execute("DELETE FROM analysis_results WHERE resume_hash = ?", (resume_digest,))
+        return cur.rowcount
+
+    def purge_expired(self) -> int:
+        """删除已过期的结果，返回删除条数"""
+        cur = self._conn().execute("DELETE FROM analysis_results WHERE expires_at <= ?", (time.time(),))
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        total = conn.execute("SELECT COUNT(*), COUNT(DISTINCT resume_hash) FROM analysis_results").fetchone()
+        by_agent = dict(conn.execute("SELECT agent, COUNT(*) FROM analysis_results GROUP BY agent").fetchall())
+        return {"entries": total[0], "resumes": total[1], "by_agent": by_agent}
+
+
+@lazy_singleton
+def get_analysis_store() -> AnalysisStore:
+    """获取全局分析结果存储"""
+    return AnalysisStore()
@@ -1,76 +1,143 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
 import json
 import os
 import sqlite3
 import threading
 from datetime import UTC, datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from data.sqlite_util import ThreadLocalConnections
+
+# Per-event flag kept in the rollups next to the plain count:
+# successful `resume_processed` runs and failed `process_quality_gate` checks.
+_FLAG_SQL = """
+    CASE
+        WHEN event_name = 'resume_processed' AND json_extract(payload_json, '$.ok') = 1 THEN 1
+        WHEN event_name = 'process_quality_gate'
+             AND CAST(json_extract(payload_json, '$.passed') AS TEXT) IN ('0', 'false', 'False') THEN 1
+        ELSE 0
+    END
+"""
+
+# Events this recent are never rolled up, so late flushes still land in an open bucket.
+_ROLLUP_GRACE = timedelta(minutes=5)
 
 
 class BusinessService:
-    """Persistent lead + funnel tracking for growth and monetization."""
+    """
+    Persistent lead + funnel tracking for growth and monetization.
+
+    Each thread reuses one WAL-mode connection. Events are buffered in memory and
+    written in a single transaction once `flush_size` events are queued or
+    `flush_interval_s` seconds have passed; reads flush first so they always see
+    every tracked event. The `a*` methods run the blocking calls in a worker thread.
+
+    Dashboards read from rollups: `events_hourly` and `feedback_daily` hold closed
+    buckets up to a watermark, and only rows newer than the watermark are counted
+    from the raw tables. The flusher thread rolls up once per hour and prunes raw
+    events older than `retention_days` that are already rolled up.
+    """
 
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        flush_size: Optional[int] = None,
+        flush_interval_s: Optional[float] = None,
+        retention_days: Optional[int] = None,
+    ):
         self.db_path = db_path or os.getenv("APP_DATA_DB_PATH", "data/app_data.db")
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.flush_size = flush_size or int(os.getenv("EVENT_FLUSH_SIZE", "200") or 200)
+        self.flush_interval_s = flush_interval_s or float(os.getenv("EVENT_FLUSH_INTERVAL_S", "2") or 2)
+        self.retention_days = retention_days or int(os.getenv("EVENT_RETENTION_DAYS", "90") or 90)
         self._lock = threading.Lock()
+        self._rollup_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # keeps sqlite3's implicit transactions; writes end with commit() / rollback()
+        self._conn = ThreadLocalConnections(self.db_path, row_factory=sqlite3.Row, isolation_level="")
+        self._pending: List[Tuple[str, str, str]] = []
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
         self._init_db()
-
-    def _conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        return conn
+        atexit.register(self.close)
 
     def _init_db(self) -> None:
-        with self._lock:
-            conn = self._conn()
-            try:
-                conn.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS leads (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        email TEXT NOT NULL UNIQUE,
-                        name TEXT,
-                        company TEXT,
-                        use_case TEXT,
-                        budget TEXT,
-                        source TEXT,
-                        note TEXT,
-                        created_at TEXT NOT NULL
-                    )
-                    """
-                )
-                conn.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS events (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        event_name TEXT NOT NULL,
-                        payload_json TEXT,
-                        created_at TEXT NOT NULL
-                    )
-                    """
-                )
-                conn.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS feedback (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        rating INTEGER,
-                        category TEXT,
-                        message TEXT NOT NULL,
-                        email TEXT,
-                        source TEXT,
-                        page TEXT,
-                        created_at TEXT NOT NULL
-                    )
-                    """
-                )
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_events_name_time ON events(event_name, created_at)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_events_time ON events(created_at)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_time ON feedback(created_at)")
-                conn.commit()
-            finally:
-                conn.close()
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS leads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL UNIQUE,
+                name TEXT,
+                company TEXT,
+                use_case TEXT,
+                budget TEXT,
+                source TEXT,
+                note TEXT,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_name TEXT NOT NULL,
+                payload_json TEXT,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS feedback (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                rating INTEGER,
+                category TEXT,
+                message TEXT NOT NULL,
+                email TEXT,
+                source TEXT,
+                page TEXT,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_events_name_time ON events(event_name, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_events_time ON events(created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_time ON feedback(created_at)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events_hourly (
+                hour TEXT NOT NULL,
+                event_name TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                flagged INTEGER NOT NULL,
+                PRIMARY KEY (hour, event_name)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS feedback_daily (
+                day TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                rating_sum INTEGER NOT NULL,
+                rating_count INTEGER NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                name TEXT PRIMARY KEY,
+                watermark TEXT NOT NULL
+            )
+            """
+        )
+        conn.commit()
 
     def add_lead(
         self,
@@ -83,36 +150,182 @@ class BusinessService:
         note: str = "",
     ) -> Dict[str, Any]:
         now = datetime.now(UTC).isoformat()
-        with self._lock:
-            conn = self._conn()
-            try:
-                cur = conn.execute(
-                    """
-                    INSERT OR REPLACE INTO leads(email, name, company, use_case, budget, source, note, created_at)
-                    VALUES(?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (email.strip().lower(), name.strip(), company.strip(), use_case.strip(), budget.strip(), source.strip(), note.strip(), now),
-                )
-                conn.commit()
-                lead_id = cur.lastrowid
-            finally:
-                conn.close()
+        conn = self._conn()
+        cur = conn.execute(
+            """
+            INSERT OR REPLACE INTO leads(email, name, company, use_case, budget, source, note, created_at)
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (email.strip().lower(), name.strip(), company.strip(), use_case.strip(), budget.strip(), source.strip(), note.strip(), now),
+        )
+        conn.commit()
+        lead_id = cur.lastrowid
         self.track_event("lead_captured", {"email": email, "source": source, "budget": budget})
         return {"lead_id": lead_id, "created_at": now}
 
     def track_event(self, event_name: str, payload: Optional[Dict[str, Any]] = None) -> None:
+        """Queue an event; it is written with the next batch."""
         now = datetime.now(UTC).isoformat()
         payload_json = json.dumps(payload or {}, ensure_ascii=False)
         with self._lock:
+            self._pending.append((event_name.strip(), payload_json, now))
+            full = len(self._pending) >= self.flush_size
+            if self._flusher is None:
+                self._start_flusher()
+        if full:
+            self.flush()
+
+    def _start_flusher(self) -> None:
+        def run() -> None:
+            while not self._stop.wait(self.flush_interval_s):
+                try:
+                    self.flush()
+                    self.maybe_rollup()
+                except sqlite3.Error:
+                    # keep the events queued and retry on the next tick
+                    pass
+
+        self._flusher = threading.Thread(target=run, name="business-event-flusher", daemon=True)
+        self._flusher.start()
+
+    def flush(self) -> int:
+        """Write all queued events in one transaction; returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
             conn = self._conn()
             try:
-                conn.execute(
+                conn.executemany(
                     "INSERT INTO events(event_name, payload_json, created_at) VALUES(?, ?, ?)",
-                    (event_name.strip(), payload_json, now),
+                    batch,
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            return len(batch)
+
+    def close(self) -> None:
+        self._stop.set()
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass
+
+    def _watermark(self, conn: sqlite3.Connection, name: str) -> str:
+        row = conn.execute("SELECT watermark FROM rollup_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else ""
+
+    def maybe_rollup(self) -> None:
+        """Roll up if a new hour has closed since the last run."""
+        target = (datetime.now(UTC) - _ROLLUP_GRACE).strftime("%Y-%m-%dT%H")
+        if self._watermark(self._conn(), "events") < target:
+            self.rollup()
+
+    def rollup(self) -> Dict[str, str]:
+        """
+        Move closed buckets into the rollup tables and prune old raw events.
+
+        Watermarks are time prefixes (`YYYY-MM-DDTHH` for events, `YYYY-MM-DD` for
+        feedback) and compare directly against ISO `created_at` values.
+        """
+        self.flush()
+        edge = datetime.now(UTC) - _ROLLUP_GRACE
+        hour, day = edge.strftime("%Y-%m-%dT%H"), edge.strftime("%Y-%m-%d")
+        with self._rollup_lock:
+            conn = self._conn()
+            try:
+                ev_mark = self._watermark(conn, "events")
+                if ev_mark < hour:
+                    conn.execute(
+                        f"""
+                        INSERT INTO events_hourly(hour, event_name, count, flagged)
+                        SELECT substr(created_at, 1, 13), event_name, COUNT(*), SUM({_FLAG_SQL})
+                        FROM events
+                        WHERE created_at >= ? AND created_at < ?
+                        GROUP BY 1, 2
+                        ON CONFLICT(hour, event_name) DO UPDATE SET
+                            count = count + excluded.count,
+                            flagged = flagged + excluded.flagged
+                        """,
+                        (ev_mark, hour),
+                    )
+                    ev_mark = hour
+                fb_mark = self._watermark(conn, "feedback")
+                if fb_mark < day:
+                    conn.execute(
+                        """
+                        INSERT INTO feedback_daily(day, count, rating_sum, rating_count)
+                        SELECT substr(created_at, 1, 10), COUNT(*), COALESCE(SUM(rating), 0), COUNT(rating)
+                        FROM feedback
+                        WHERE created_at >= ? AND created_at < ?
+                        GROUP BY 1
+                        ON CONFLICT(day) DO UPDATE SET
+                            count = count + excluded.count,
+                            rating_sum = rating_sum + excluded.rating_sum,
+                            rating_count = rating_count + excluded.rating_count
+                        """,
+                        (fb_mark, day),
+                    )
+                    fb_mark = day
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rollup_state(name, watermark) VALUES(?, ?)",
+                    [("events", ev_mark), ("feedback", fb_mark)],
                 )
+                # only rows that are already counted in events_hourly may go
+                cutoff = (datetime.now(UTC) - timedelta(days=self.retention_days)).isoformat()
+                conn.execute("DELETE FROM events WHERE created_at < ? AND created_at < ?", (cutoff, ev_mark))
                 conn.commit()
-            finally:
-                conn.close()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        return {"events": ev_mark, "feedback": fb_mark}
+
+    def _event_counts(self, conn: sqlite3.Connection) -> Dict[str, Tuple[int, int]]:
+        """All-time (count, flagged) per event name: closed hours + raw rows after the watermark."""
+        mark = self._watermark(conn, "events")
+        counts: Dict[str, Tuple[int, int]] = {}
+        rows = conn.execute(
+            "SELECT event_name, SUM(count), SUM(flagged) FROM events_hourly WHERE hour < ? GROUP BY event_name",
+            (mark,),
+        ).fetchall()
+        rows += conn.execute(
+            f"SELECT event_name, COUNT(*), SUM({_FLAG_SQL}) FROM events WHERE created_at >= ? GROUP BY event_name",
+            (mark,),
+        ).fetchall()
+        for name, count, flagged in rows:
+            c, f = counts.get(name, (0, 0))
+            counts[name] = (c + int(count or 0), f + int(flagged or 0))
+        return counts
+
+    def _feedback_window(self, conn: sqlite3.Connection, since: Optional[str] = None) -> Tuple[int, int, int]:
+        """(count, rating_sum, rating_count) of feedback created at or after `since` (all time if None)."""
+        mark = self._watermark(conn, "feedback")
+        if since is None:
+            first_full_day, partial = "", ("", "")
+        else:
+            first_full_day = (datetime.fromisoformat(since) + timedelta(days=1)).strftime("%Y-%m-%d")
+            partial = (since, first_full_day)
+        # closed days come from the rollup; the partial first day and the open bucket from raw rows
+        closed = conn.execute(
+            """
+            SELECT COALESCE(SUM(count), 0), COALESCE(SUM(rating_sum), 0), COALESCE(SUM(rating_count), 0)
+            FROM feedback_daily WHERE day >= ? AND day < ?
+            """,
+            (first_full_day, mark),
+        ).fetchone()
+        raw = conn.execute(
+            """
+            SELECT COUNT(*), COALESCE(SUM(rating), 0), COUNT(rating) FROM feedback
+            WHERE (created_at >= ? AND created_at < ?) OR created_at >= ?
+            """,
+            (*partial, max(mark, first_full_day)),
+        ).fetchone()
+        return tuple(int(a) + int(b) for a, b in zip(closed, raw))
 
     def add_feedback(
         self,
@@ -131,28 +344,24 @@ class BusinessService:
             rate = max(1, min(5, int(rating)))
 
         now = datetime.now(UTC).isoformat()
-        with self._lock:
-            conn = self._conn()
-            try:
-                cur = conn.execute(
-                    """
-                    INSERT INTO feedback(rating, category, message, email, source, page, created_at)
-                    VALUES(?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        rate,
-                        (category or "").strip(),
-                        msg,
-                        (email or "").strip().lower(),
-                        (source or "").strip(),
-                        (page or "").strip(),
-                        now,
-                    ),
-                )
-                conn.commit()
-                fid = cur.lastrowid
-            finally:
-                conn.close()
+        conn = self._conn()
+        cur = conn.execute(
+            """
+            INSERT INTO feedback(rating, category, message, email, source, page, created_at)
+            VALUES(?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                rate,
+                (category or "").strip(),
+                msg,
+                (email or "").strip().lower(),
+                (source or "").strip(),
+                (page or "").strip(),
+                now,
+            ),
+        )
+        conn.commit()
+        fid = cur.lastrowid
 
         self.track_event(
             "user_feedback",
@@ -164,27 +373,19 @@ class BusinessService:
         d = max(1, min(int(days or 7), 30))
         n = max(1, min(int(limit or 50), 200))
         since = (datetime.now(UTC) - timedelta(days=d)).isoformat()
-        with self._lock:
-            conn = self._conn()
-            try:
-                total = self._count(conn, "SELECT COUNT(*) FROM feedback")
-                total_d = self._count(conn, "SELECT COUNT(*) FROM feedback WHERE created_at >= ?", (since,))
-                row = conn.execute(
-                    "SELECT AVG(rating) AS avg_rating FROM feedback WHERE rating IS NOT NULL AND created_at >= ?",
-                    (since,),
-                ).fetchone()
-                avg_rating = float(row["avg_rating"]) if row and row["avg_rating"] is not None else None
-                rows = conn.execute(
-                    """
-                    SELECT id, rating, category, message, email, source, page, created_at
-                    FROM feedback
-                    ORDER BY id DESC
-                    LIMIT ?
-                    """,
-                    (n,),
-                ).fetchall()
-            finally:
-                conn.close()
+        conn = self._conn()
+        total = self._feedback_window(conn)[0]
+        total_d, rating_sum, rating_count = self._feedback_window(conn, since)
+        avg_rating = rating_sum / rating_count if rating_count else None
+        rows = conn.execute(
+            """
+            SELECT id, rating, category, message, email, source, page, created_at
+            FROM feedback
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (n,),
+        ).fetchall()
         return {
             "total": total,
             "last_days": d,
@@ -198,44 +399,26 @@ class BusinessService:
         return int(row[0] if row and row[0] is not None else 0)
 
     def metrics(self) -> Dict[str, Any]:
-        with self._lock:
-            conn = self._conn()
-            try:
-                total_leads = self._count(conn, "SELECT COUNT(*) FROM leads")
-                leads_7d = self._count(
-                    conn,
-                    "SELECT COUNT(*) FROM leads WHERE created_at >= ?",
-                    ((datetime.now(UTC) - timedelta(days=7)).isoformat(),),
-                )
+        self.flush()
+        conn = self._conn()
+        total_leads = self._count(conn, "SELECT COUNT(*) FROM leads")
+        leads_7d = self._count(
+            conn,
+            "SELECT COUNT(*) FROM leads WHERE created_at >= ?",
+            ((datetime.now(UTC) - timedelta(days=7)).isoformat(),),
+        )
 
-                uploads = self._count(conn, "SELECT COUNT(*) FROM events WHERE event_name='resume_uploaded'")
-                process_runs = self._count(conn, "SELECT COUNT(*) FROM events WHERE event_name='resume_processed'")
-                searches = self._count(conn, "SELECT COUNT(*) FROM events WHERE event_name='job_search'")
-                applies = self._count(conn, "SELECT COUNT(*) FROM events WHERE event_name='job_apply'")
-                job_link_clicks = self._count(conn, "SELECT COUNT(*) FROM events WHERE event_name='job_link_click'")
-                result_downloads = self._count(conn, "SELECT COUNT(*) FROM events WHERE event_name='result_download'")
-                feedback_total = self._count(conn, "SELECT COUNT(*) FROM feedback")
-                feedback_7d = self._count(
-                    conn,
-                    "SELECT COUNT(*) FROM feedback WHERE created_at >= ?",
-                    ((datetime.now(UTC) - timedelta(days=7)).isoformat(),),
-                )
-
-                processed_success = self._count(
-                    conn,
-                    "SELECT COUNT(*) FROM events WHERE event_name='resume_processed' AND json_extract(payload_json, '$.ok') = 1",
-                )
-                quality_gate_failures = self._count(
-                    conn,
-                    """
-                    SELECT COUNT(*) FROM events
-                    WHERE event_name='process_quality_gate'
-                      AND CAST(json_extract(payload_json, '$.passed') AS TEXT) IN ('0', 'false', 'False')
-                    """,
-                )
-                errors = self._count(conn, "SELECT COUNT(*) FROM events WHERE event_name='api_error'")
-            finally:
-                conn.close()
+        events = self._event_counts(conn)
+        uploads = events.get("resume_uploaded", (0, 0))[0]
+        process_runs, processed_success = events.get("resume_processed", (0, 0))
+        searches = events.get("job_search", (0, 0))[0]
+        applies = events.get("job_apply", (0, 0))[0]
+        job_link_clicks = events.get("job_link_click", (0, 0))[0]
+        result_downloads = events.get("result_download", (0, 0))[0]
+        quality_gate_failures = events.get("process_quality_gate", (0, 0))[1]
+        errors = events.get("api_error", (0, 0))[0]
+        feedback_total = self._feedback_window(conn)[0]
+        feedback_7d = self._feedback_window(conn, (datetime.now(UTC) - timedelta(days=7)).isoformat())[0]
 
         upload_to_process = round((process_runs / uploads) * 100, 2) if uploads else 0.0
         process_to_search = round((searches / process_runs) * 100, 2) if process_runs else 0.0
@@ -277,3 +460,26 @@ class BusinessService:
             },
             "generated_at": datetime.now(UTC).isoformat(),
         }
+
+    # async wrappers for FastAPI handlers
+
+    async def aadd_lead(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.add_lead, *args, **kwargs)
+
+    async def atrack_event(self, event_name: str, payload: Optional[Dict[str, Any]] = None) -> None:
+        # queuing is cheap; only a full buffer needs a thread for the write
+        with self._lock:
+            room = len(self._pending) + 1 < self.flush_size
+        if room:
+            self.track_event(event_name, payload)
+        else:
+            await asyncio.to_thread(self.track_event, event_name, payload)
+
+    async def aadd_feedback(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.add_feedback, *args, **kwargs)
+
+    async def afeedback_summary(self, days: int = 7, limit: int = 50) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.feedback_summary, days, limit)
+
+    async def ametrics(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.metrics)
@@ -0,0 +1,188 @@
+"""
+岗位详情存储 - 所有数据源共用，SQLite（WAL 模式）持久化
+
+- 键是带数据源前缀的岗位 ID（jooble_xxx / bing_xxx / ...），重启后 get_job_detail 依然能命中
+- 每个数据源单独设置过期时间（JOB_DETAIL_TTL_S，或 JOB_DETAIL_TTL_<PROVIDER>_S）
+- 条数上限 JOB_DETAIL_MAX_ENTRIES，超出时按最近访问时间淘汰（LRU）
+- 前面再挂一层有界的内存 LRU，投递流程里的重复查询不用读盘
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from data.sqlite_util import ThreadLocalConnections, lazy_singleton
+
+# 各数据源的默认过期时间（秒）：API 返回的岗位下架快，搜索引擎结果只是链接，保留久一些
+DEFAULT_TTLS = {
+    "jooble": 24 * 3600,
+    "openclaw": 24 * 3600,
+    "bing": 3 * 24 * 3600,
+    "brave": 3 * 24 * 3600,
+    "baidu": 3 * 24 * 3600,
+}
+
+# 每写入这么多条检查一次是否超出上限
+_EVICT_EVERY = 200
+
+
+def provider_of(job_id: str) -> str:
+    """岗位 ID 的数据源前缀（jooble_abc → jooble），没有前缀返回空字符串"""
+    prefix, sep, _ = (job_id or "").partition("_")
+    return prefix if sep else ""
+
+
+class JobDetailStore:
+    """
+    岗位详情存储
+
+    访问时间只在读盘命中和写入时更新（内存层命中不写盘），LRU 淘汰是近似的。
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        memory_entries: int = 2048,
+    ):
+        self.db_path = db_path or os.getenv("JOB_DETAIL_DB_PATH", "data/job_details.db")
+        self.max_entries = int(max_entries or os.getenv("JOB_DETAIL_MAX_ENTRIES", "") or 20000)
+        self.default_ttl_s = int(os.getenv("JOB_DETAIL_TTL_S", "") or 24 * 3600)
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = ThreadLocalConnections(self.db_path)
+        self._memory: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._init_db()
+
+    def _init_db(self) -> None:
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_details (
+                job_id TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_details_accessed ON job_details(accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_details_expires ON job_details(expires_at)")
+
+    def ttl_for(self, provider: str) -> int:
+        value = os.getenv(f"JOB_DETAIL_TTL_{provider.upper()}_S", "").strip() if provider else ""
+        if value:
+            return int(value)
+        return DEFAULT_TTLS.get(provider, self.default_ttl_s)
+
+    def _remember(self, job_id: str, job: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._memory[job_id] = (job, expires_at)
+            self._memory.move_to_end(job_id)
+            while len(self._memory) > self._memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """按岗位 ID 读取详情；不存在或已过期返回 None"""
+        if not job_id:
+            return None
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(job_id)
+            if hit is not None:
+                if hit[1] > now:
+                    self._memory.move_to_end(job_id)
+                    return hit[0]
+                del self._memory[job_id]
+
+        conn = self._conn()
+        row = conn.execute("SELECT data, expires_at FROM job_details WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            conn.execute("DELETE FROM job_details WHERE job_id = ?", (job_id,))
+            return None
+        conn.execute("UPDATE job_details SET accessed_at = ? WHERE job_id = ?", (now, job_id))
+        job = json.loads(row[0])
+        self._remember(job_id, job, row[1])
+        return job
+
+    def put(self, job: Dict[str, Any], ttl_s: Optional[int] = None) -> None:
+        self.put_many([job], ttl_s=ttl_s)
+
+    def put_many(self, jobs: Iterable[Dict[str, Any]], ttl_s: Optional[int] = None) -> int:
+        """批量写入（一个事务）；岗位必须带 id"""
+        now = time.time()
+        rows = []
+        for job in jobs:
+            job_id = job.get("id")
+            if not job_id:
+                continue
+            provider = job.get("provider") or provider_of(job_id)
+            expires_at = now + (ttl_s or self.ttl_for(provider))
+            rows.append((job_id, provider, json.dumps(job, ensure_ascii=False), expires_at, now))
+            self._remember(job_id, job, expires_at)
+        if not rows:
+            return 0
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_details(job_id, provider, data, expires_at, accessed_at) VALUES(?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            self._writes += len(rows)
+            should_evict = self._writes >= _EVICT_EVERY
+            if should_evict:
+                self._writes = 0
+        if should_evict:
+            self.evict()
+        return len(rows)
+
+    def evict(self) -> int:
+        """删除过期条目，并把条数压回上限以内（先淘汰最久未访问的）"""
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM job_details WHERE expires_at <= ?", (time.time(),)).rowcount
+        overflow = conn.execute("SELECT COUNT(*) FROM job_details").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            removed += conn.execute(
+                "DELETE FROM job_details WHERE job_id IN "
+                "(SELECT job_id FROM job_details ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            ).rowcount
+        return removed
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            self._memory.pop(job_id, None)
+        return self._conn().execute("DELETE FROM job_details WHERE job_id = ?", (job_id,)).rowcount > 0
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        by_provider = dict(conn.execute("SELECT provider, COUNT(*) FROM job_details GROUP BY provider").fetchall())
+        return {
+            "entries": sum(by_provider.values()),
+            "by_provider": by_provider,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+        }
+
+
+@lazy_singleton
+def get_job_detail_store() -> JobDetailStore:
+    """获取全局岗位详情存储"""
+    return JobDetailStore()
@@ -0,0 +1,518 @@
+"""
+本地岗位倒排索引 - 离线模式的搜索和按 ID 查询
+
+- 分词：英文/数字按词切分，中文按相邻两字（bigram）切分，不依赖分词库
+- 职位名称、技能要求分字段建倒排表，BM25 打分（名称权重 10、要求权重 5，与原来的加分比例一致）
+- 地点、经验区间（"3-5年" → 3~5）建过滤倒排表；薪资解析成数值列（单位 K），按下限排序后二分查找
+- 岗位 ID → 文档号一次字典查找
+- 索引持久化为一组二进制文件，启动时 mmap 加载，不再逐条生成/扫描
+
+索引目录：
+    meta.json          词典（词 → 倒排表偏移/长度）、ID 表、统计信息
+    postings.bin       倒排表文档号（uint32，每个词内按文档号升序）
+    weights.bin        对应的 BM25 词频得分（float32，已含字段权重和长度归一，查询时只需乘 idf）
+    filters.bin        地点/经验过滤倒排表文档号（uint32）
+    salary_lo.bin      薪资下限（float32，未知为 -1），salary_hi.bin 同理
+    salary_order.bin   按薪资下限排序的文档号（uint32），salary_sorted.bin 为对应的下限值
+    location_id.bin    各文档地点编号（uint16，对应 meta.json 的 location_names）
+    exp_lo.bin         经验区间下限（uint8，无要求为 255），exp_hi.bin 同理
+    jobs.jsonl         岗位原文，doc_offsets.bin（uint64）记录每行起止位置
+"""
+
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import shutil
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 10.0
+REQ_WEIGHT = 5.0
+
+# 非文本条件的加分（与原来逐条打分时一致）
+LOCATION_BONUS = 8
+SALARY_BONUS = 5
+EXPERIENCE_BONUS = 5
+
+# 经验上限未知时记为 99 年；没有经验要求的文档在数值列里记为 255
+_OPEN_END = 99
+_NO_EXPERIENCE = 255
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.]*|[㐀-鿿]+")
+_SALARY = re.compile(r"(\d+(?:\.\d+)?)\s*(?:[-~至到]\s*(\d+(?:\.\d+)?))?\s*([kK千万wW])?")
+_YEARS = re.compile(r"(\d+)\s*(?:[-~至到]\s*(\d+))?")
+
+_COLUMN_FILES = {
+    "postings": ("postings.bin", "I"),
+    "weights": ("weights.bin", "f"),
+    "filters": ("filters.bin", "I"),
+    "salary_lo": ("salary_lo.bin", "f"),
+    "salary_hi": ("salary_hi.bin", "f"),
+    "salary_order": ("salary_order.bin", "I"),
+    "salary_sorted": ("salary_sorted.bin", "f"),
+    "doc_offsets": ("doc_offsets.bin", "Q"),
+    "location_id": ("location_id.bin", "H"),
+    "exp_lo": ("exp_lo.bin", "B"),
+    "exp_hi": ("exp_hi.bin", "B"),
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """英文/数字按词，中文按 bigram（单个汉字保留原字）"""
+    tokens: List[str] = []
+    for m in _TOKEN.finditer(unicodedata.normalize("NFKC", text or "").lower()):
+        token = m.group()
+        if token[0] < "㐀":
+            token = token.rstrip(".")
+            if token:
+                tokens.append(token)
+        elif len(token) == 1:
+            tokens.append(token)
+        else:
+            tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return tokens
+
+
+def parse_salary(text: str) -> Tuple[float, float]:
+    """'15-30K' → (15, 30)，'1.5-2万' → (15, 20)（单位 K/月）；无法解析返回 (-1, -1)"""
+    m = _SALARY.search(unicodedata.normalize("NFKC", text or ""))
+    if not m:
+        return -1.0, -1.0
+    lo = float(m.group(1))
+    hi = float(m.group(2)) if m.group(2) else lo
+    if (m.group(3) or "").lower() in ("万", "w"):
+        lo, hi = lo * 10, hi * 10
+    return lo, hi
+
+
+def parse_experience(text: str) -> Optional[Tuple[int, int]]:
+    """'3-5年' → (3, 5)，'5年以上' → (5, 99)，'1年以内' → (0, 1)，'应届'/'不限' → (0, 0)/(0, 99)"""
+    text = unicodedata.normalize("NFKC", text or "").replace(" ", "")
+    if not text:
+        return None
+    if "不限" in text:
+        return 0, _OPEN_END
+    if "应届" in text or "在校" in text:
+        return 0, 0
+    m = _YEARS.search(text)
+    if not m:
+        return None
+    lo = int(m.group(1))
+    if m.group(2):
+        return lo, int(m.group(2))
+    if "以上" in text:
+        return lo, _OPEN_END
+    if "以内" in text or "以下" in text:
+        return 0, lo
+    return lo, lo
+
+
+def _bucket(span: Tuple[int, int]) -> str:
+    return f"{span[0]}-{span[1]}"
+
+
+def _empty_view(fmt: str) -> memoryview:
+    return memoryview(b"").cast(fmt)
+
+
+class JobIndex:
+    """
+    只读倒排索引（通过 build 构建、save 保存、load 以 mmap 方式加载）
+
+    同时实现了序列接口（len / 迭代 / 下标），可以直接当作岗位列表使用。
+    """
+
+    def __init__(self, meta: Dict[str, Any], columns: Dict[str, Sequence], docs: Any, mmaps: Optional[List[Any]] = None):
+        self.meta = meta
+        self.terms: Dict[str, List[int]] = meta["terms"]
+        self.ids: Dict[str, int] = meta["ids"]
+        self.columns = columns
+        self._docs = docs
+        self._mmaps = mmaps or []
+        self.count = meta["count"]
+        self._idf = {
+            term: math.log(1 + (self.count - df + 0.5) / (df + 0.5)) for term, (_, df) in self.terms.items()
+        }
+
+    # ------------------------------------------------------------------ 构建
+
+    @classmethod
+    def build(cls, jobs: Sequence[Dict[str, Any]], source: str = "") -> "JobIndex":
+        """从岗位列表构建（内存中），之后可 save 到磁盘"""
+        term_postings: Dict[str, List[Tuple[int, int, int]]] = defaultdict(list)
+        location_postings: Dict[str, List[int]] = defaultdict(list)
+        experience_postings: Dict[str, List[int]] = defaultdict(list)
+        len_title, len_req = array("H"), array("H")
+        salary_lo, salary_hi = array("f"), array("f")
+        exp_lo, exp_hi = array("B"), array("B")
+        job_locations: List[str] = []
+        ids: Dict[str, int] = {}
+        facets: Dict[str, Counter] = {"platform": Counter(), "location": Counter(), "company": Counter()}
+
+        lines: List[bytes] = []
+        offsets = array("Q", [0])
+        for doc, job in enumerate(jobs):
+            title_tokens = tokenize(job.get("title", ""))
+            req_tokens = [t for req in job.get("requirements") or [] for t in tokenize(req)]
+            title_tf, req_tf = Counter(title_tokens), Counter(req_tokens)
+            for term in title_tf.keys() | req_tf.keys():
+                term_postings[term].append((doc, min(title_tf[term], 65535), min(req_tf[term], 65535)))
+            len_title.append(min(len(title_tokens), 65535))
+            len_req.append(min(len(req_tokens), 65535))
+
+            location = job.get("location") or ""
+            location_postings[location].append(doc)
+            job_locations.append(location)
+            span = parse_experience(job.get("experience", ""))
+            if span is not None:
+                experience_postings[_bucket(span)].append(doc)
+                exp_lo.append(min(span[0], _OPEN_END))
+                exp_hi.append(min(span[1], _OPEN_END))
+            else:
+                exp_lo.append(_NO_EXPERIENCE)
+                exp_hi.append(_NO_EXPERIENCE)
+            lo, hi = parse_salary(job.get("salary", ""))
+            salary_lo.append(lo)
+            salary_hi.append(hi)
+
+            ids[str(job.get("id", doc))] = doc
+            for name, counter in facets.items():
+                counter[job.get(name) or ""] += 1
+
+            line = json.dumps(job, ensure_ascii=False).encode("utf-8") + b"\n"
+            lines.append(line)
+            offsets.append(offsets[-1] + len(line))
+
+        count = len(lines)
+        avg_title = (sum(len_title) / count) if count else 0.0
+        avg_req = (sum(len_req) / count) if count else 0.0
+
+        def saturate(tf: int, length: int, avg: float) -> float:
+            return tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / (avg or 1.0))) if tf else 0.0
+
+        postings, weights = array("I"), array("f")
+        terms: Dict[str, List[int]] = {}
+        for term in sorted(term_postings):
+            entries = term_postings[term]
+            terms[term] = [len(postings), len(entries)]
+            for doc, tft, tfr in entries:
+                postings.append(doc)
+                weights.append(
+                    TITLE_WEIGHT * saturate(tft, len_title[doc], avg_title)
+                    + REQ_WEIGHT * saturate(tfr, len_req[doc], avg_req)
+                )
+
+        filters = array("I")
+        filter_dicts: Dict[str, Dict[str, List[int]]] = {"locations": {}, "experience": {}}
+        for name, source_postings in (("locations", location_postings), ("experience", experience_postings)):
+            for key in sorted(source_postings):
+                docs = source_postings[key]
+                filter_dicts[name][key] = [len(filters), len(docs)]
+                filters.extend(docs)
+
+        location_names = sorted(location_postings)
+        location_ids = {name: i for i, name in enumerate(location_names)}
+        location_id = array("H", (location_ids[name] for name in job_locations))
+
+        order = sorted((d for d in range(count) if salary_lo[d] >= 0), key=lambda d: (salary_lo[d], d))
+        salary_order = array("I", order)
+        salary_sorted = array("f", (salary_lo[d] for d in order))
+
+        meta = {
+            "version": INDEX_VERSION,
+            "source": source,
+            "byteorder": sys.byteorder,
+            "count": count,
+            "avg_len_title": avg_title,
+            "avg_len_req": avg_req,
+            "terms": terms,
+            "ids": ids,
+            "location_names": location_names,
+            **filter_dicts,
+            "facets": {
+                "platform": dict(facets["platform"]),
+                "location": dict(facets["location"]),
+                "companies": len([c for c in facets["company"] if c]),
+            },
+        }
+        columns = {
+            "postings": postings, "weights": weights, "filters": filters,
+            "salary_lo": salary_lo, "salary_hi": salary_hi,
+            "salary_order": salary_order, "salary_sorted": salary_sorted, "doc_offsets": offsets,
+            "location_id": location_id, "exp_lo": exp_lo, "exp_hi": exp_hi,
+        }
+        return cls(meta, columns, b"".join(lines))
+
+    # ------------------------------------------------------------------ 持久化
+
+    def save(self, index_dir: str) -> None:
+        """写入临时目录后整体替换，避免其他进程读到写了一半的索引"""
+        parent = os.path.dirname(os.path.abspath(index_dir))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = f"{index_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        for name, (filename, fmt) in _COLUMN_FILES.items():
+            with open(os.path.join(tmp_dir, filename), "wb") as f:
+                f.write(bytes(self.columns[name]))
+        with open(os.path.join(tmp_dir, "jobs.jsonl"), "wb") as f:
+            f.write(bytes(self._docs))
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+
+        old_dir = f"{index_dir}.old-{os.getpid()}"
+        if os.path.exists(index_dir):
+            os.replace(index_dir, old_dir)
+        os.replace(tmp_dir, index_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "JobIndex":
+        """mmap 方式加载：数值列和岗位原文按需分页读入，不整体复制到内存"""
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION or meta.get("byteorder") != sys.byteorder:
+            raise ValueError("索引版本或字节序不匹配")
+
+        mmaps: List[Any] = []
+
+        def map_file(filename: str) -> Any:
+            path = os.path.join(index_dir, filename)
+            if os.path.getsize(path) == 0:
+                return b""
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            mmaps.append(mm)
+            return mm
+
+        columns: Dict[str, Sequence] = {}
+        for name, (filename, fmt) in _COLUMN_FILES.items():
+            buf = map_file(filename)
+            if len(buf):
+                base = memoryview(buf)
+                mmaps.insert(0, base)
+                columns[name] = base.cast(fmt)
+                mmaps.insert(0, columns[name])
+            else:
+                columns[name] = _empty_view(fmt)
+        return cls(meta, columns, map_file("jobs.jsonl"), mmaps)
+
+    def close(self) -> None:
+        """释放 mmap（先释放视图，再关闭映射）"""
+        for handle in self._mmaps:
+            if isinstance(handle, memoryview):
+                handle.release()
+            else:
+                handle.close()
+        self._mmaps = []
+
+    # ------------------------------------------------------------------ 读取
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, doc: int) -> Dict[str, Any]:
+        if doc < 0:
+            doc += self.count
+        if not 0 <= doc < self.count:
+            raise IndexError(doc)
+        offsets = self.columns["doc_offsets"]
+        return json.loads(bytes(self._docs[offsets[doc]:offsets[doc + 1]]))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for doc in range(self.count):
+            yield self[doc]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """按岗位 ID 读取"""
+        doc = self.ids.get(job_id)
+        return None if doc is None else self[doc]
+
+    @property
+    def facets(self) -> Dict[str, Any]:
+        return self.meta["facets"]
+
+    def _filter_docs(self, name: str, key: str) -> Sequence[int]:
+        offset, length = self.meta[name][key]
+        return self.columns["filters"][offset:offset + length]
+
+    def _keyword_scores(self, keyword: str) -> Dict[int, float]:
+        """
+        一个关键词的 BM25 得分；关键词切出的多个词须同时出现（近似原来的子串匹配）
+
+        从文档数最少的词开始求交集；候选已经很少时改为在倒排表里二分查找，不再整段遍历
+        """
+        postings, weights = self.columns["postings"], self.columns["weights"]
+        entries = []
+        for term in dict.fromkeys(tokenize(keyword)):
+            entry = self.terms.get(term)
+            if entry is None:
+                return {}
+            entries.append((entry[1], entry[0], self._idf[term]))
+        if not entries:
+            return {}
+        entries.sort()
+
+        df, offset, idf = entries[0]
+        scores = {doc: idf * w for doc, w in zip(postings[offset:offset + df], weights[offset:offset + df])}
+        for df, offset, idf in entries[1:]:
+            docs = postings[offset:offset + df]
+            if len(scores) * max(1, df.bit_length()) < df:
+                narrowed = {}
+                for doc, score in scores.items():
+                    i = bisect_left(docs, doc)
+                    if i < df and docs[i] == doc:
+                        narrowed[doc] = score + idf * weights[offset + i]
+            else:
+                narrowed = {
+                    doc: scores[doc] + idf * w
+                    for doc, w in zip(docs, weights[offset:offset + df])
+                    if doc in scores
+                }
+            scores = narrowed
+            if not scores:
+                return {}
+        return scores
+
+    def search(
+        self,
+        keywords: Optional[List[str]] = None,
+        location: Optional[str] = None,
+        salary_min: Optional[float] = None,
+        experience: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """
+        打分并返回前 limit 条（附 match_score / match_percentage）
+
+        与原来的逐条打分一样，命中任一条件（关键词/地点/薪资/经验）即入选，得分相加。
+        """
+        if limit <= 0:
+            return []
+        text_scores: Dict[int, float] = defaultdict(float)
+        for keyword in keywords or []:
+            for doc, score in self._keyword_scores(keyword).items():
+                text_scores[doc] += score
+
+        location_keys = [key for key in self.meta["locations"] if location and location in key]
+        span = parse_experience(experience) if experience else None
+        experience_keys = [
+            key for key in self.meta["experience"]
+            if span is not None and int(key.split("-")[0]) <= span[1] and span[0] <= int(key.split("-")[1])
+        ]
+        max_bonus = (
+            (LOCATION_BONUS if location_keys else 0)
+            + (SALARY_BONUS if salary_min else 0)
+            + (EXPERIENCE_BONUS if experience_keys else 0)
+        )
+
+        top: List[Tuple[float, int]] = []
+        if text_scores:
+            # 快速路径：只给关键词命中的文档逐个补上条件加分（查数值列）；
+            # 如果第 limit 名的得分已经高于"只命中条件"能拿到的最高分，就不必再遍历条件倒排表
+            names = self.meta["location_names"]
+            wanted_locations = {names.index(key) for key in location_keys}
+            location_id, salary_lo = self.columns["location_id"], self.columns["salary_lo"]
+            exp_lo, exp_hi = self.columns["exp_lo"], self.columns["exp_hi"]
+            for doc, score in text_scores.items():
+                if location_id[doc] in wanted_locations:
+                    score += LOCATION_BONUS
+                if salary_min and salary_lo[doc] >= salary_min:
+                    score += SALARY_BONUS
+                if span is not None and exp_lo[doc] != _NO_EXPERIENCE and exp_lo[doc] <= span[1] and span[0] <= exp_hi[doc]:
+                    score += EXPERIENCE_BONUS
+                text_scores[doc] = score
+            top = heapq.nsmallest(limit, ((-score, doc) for doc, score in text_scores.items() if score > 0))
+
+        if max_bonus and not (len(top) >= limit and -top[-1][0] > max_bonus):
+            scores: Dict[int, float] = defaultdict(float)
+            for doc, score in text_scores.items():
+                scores[doc] = score
+            for key in location_keys:
+                for doc in self._filter_docs("locations", key):
+                    if doc not in text_scores:
+                        scores[doc] += LOCATION_BONUS
+            if salary_min:
+                order, values = self.columns["salary_order"], self.columns["salary_sorted"]
+                for i in range(bisect_left(values, float(salary_min)), len(order)):
+                    if order[i] not in text_scores:
+                        scores[order[i]] += SALARY_BONUS
+            for key in experience_keys:
+                for doc in self._filter_docs("experience", key):
+                    if doc not in text_scores:
+                        scores[doc] += EXPERIENCE_BONUS
+            top = heapq.nsmallest(limit, ((-score, doc) for doc, score in scores.items() if score > 0))
+
+        # 同分时保持数据集原有顺序（nsmallest 按 (-得分, 文档号) 排序）
+        results = []
+        for neg_score, doc in top:
+            job = self[doc]
+            job["match_score"] = round(-neg_score, 2)
+            job["match_percentage"] = min(int(-neg_score * 2), 100)
+            results.append(job)
+        return results
+
+
+def file_source(path: str) -> str:
+    """数据文件的指纹（路径 + 大小 + 修改时间），文件变化后索引自动重建"""
+    st = os.stat(path)
+    return f"file:{os.path.abspath(path)}:{st.st_size}:{int(st.st_mtime)}"
+
+
+def load_jobs_file(path: str) -> List[Dict[str, Any]]:
+    """读取 JSON 数组或 JSONL 格式的岗位数据"""
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            return json.load(f)
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def open_job_index(index_dir: str, source: str, jobs_factory: Callable[[], Sequence[Dict[str, Any]]]) -> JobIndex:
+    """加载已有索引；不存在、损坏或数据源变化时重新构建并保存"""
+    try:
+        index = JobIndex.load(index_dir)
+        if index.meta.get("source") == source:
+            return index
+        index.close()
+        logger.info(f"岗位数据源已变化，重建索引: {index_dir}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"加载岗位索引失败，将重建: {e}")
+
+    JobIndex.build(jobs_factory(), source=source).save(index_dir)
+    return JobIndex.load(index_dir)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    # python -m data.job_index build jobs.jsonl --out data/job_index
+    parser = argparse.ArgumentParser(description="构建本地岗位倒排索引")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="从 JSON / JSONL 岗位文件构建索引")
+    build_cmd.add_argument("input")
+    build_cmd.add_argument("--out", default=os.getenv("LOCAL_JOB_INDEX_DIR", "data/job_index"))
+    args = parser.parse_args()
+
+    built = JobIndex.build(load_jobs_file(args.input), source=file_source(args.input))
+    built.save(args.out)
+    print(f"已构建 {len(built)} 条岗位、{len(built.terms)} 个词的索引: {args.out}")
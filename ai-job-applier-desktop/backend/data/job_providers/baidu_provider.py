@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import html as html_lib
 import os
@@ -7,12 +8,10 @@ import re
 from typing import Any, Dict, List, Optional
 from urllib.parse import quote_plus, urlparse
 
-import requests
+from .base import AsyncJobProvider, JobSearchParams, get_pool_stats
 
-from .base import JobProvider, JobSearchParams
 
-
-class BaiduSearchProvider(JobProvider):
+class BaiduSearchProvider(AsyncJobProvider):
     """
     Real-time job link discovery via Baidu search result HTML.
 
@@ -23,7 +22,9 @@ class BaiduSearchProvider(JobProvider):
 
     Caveats:
     - Can be blocked by anti-bot / captcha at any time.
-    - Do NOT use at high QPS.
+    - Do NOT use at high QPS. Per-site queries run concurrently; redirects are
+      resolved in small batches (JOB_HTTP_MAX_PER_HOST at a time) only until
+      `limit` unique URLs are found.
 
     Env:
       - JOB_SEARCH_SITES: optional comma-separated domains to restrict
@@ -37,7 +38,6 @@ class BaiduSearchProvider(JobProvider):
         self.timeout_s = int(timeout_s or os.getenv("BAIDU_TIMEOUT_S", "12") or "12")
         sites = os.getenv("JOB_SEARCH_SITES", "").strip()
         self.sites = [s.strip().lstrip(".") for s in sites.split(",") if s.strip()] if sites else []
-        self._cache: Dict[str, Dict[str, Any]] = {}
 
     def _job_id(self, url: str) -> str:
         return "baidu_" + hashlib.sha1(url.encode("utf-8", errors="ignore")).hexdigest()[:16]
@@ -57,20 +57,20 @@ class BaiduSearchProvider(JobProvider):
             return "前程无忧"
         return host or "百度"
 
-    def _resolve_redirect(self, url: str) -> str:
+    async def _resolve_redirect(self, url: str) -> str:
         # Baidu uses redirector links; follow once to get the final job board URL.
         try:
-            r = requests.get(
+            r = await self.request(
+                "GET",
                 url,
                 headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/122"},
-                timeout=self.timeout_s,
-                allow_redirects=True,
+                follow_redirects=True,
             )
-            return r.url or url
+            return str(r.url) or url
         except Exception:
             return url
 
-    def search_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
+    async def asearch_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
         limit = max(1, min(int(params.limit or 50), 50))
 
         q_parts: List[str] = []
@@ -86,19 +86,20 @@ class BaiduSearchProvider(JobProvider):
 
         base_query = " ".join(q_parts) if q_parts else "招聘 职位"
 
-        def fetch(query: str, n: int) -> List[tuple[str, str]]:
+        async def fetch(query: str, n: int) -> List[tuple[str, str]]:
             wd = quote_plus(query)
             url = f"https://www.baidu.com/s?wd={wd}&rn={max(1, min(n, 50))}"
-            resp = requests.get(
+            resp = await self.request(
+                "GET",
                 url,
                 headers={
                     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/122",
                     "Accept-Language": "zh-CN,zh;q=0.9",
                 },
-                timeout=self.timeout_s,
             )
             # Baidu may redirect to captcha page.
-            if "wappass.baidu.com" in (resp.url or "") or "captcha" in (resp.url or ""):
+            final = str(resp.url or "")
+            if "wappass.baidu.com" in final or "captcha" in final:
                 raise RuntimeError("百度触发安全验证/验证码，无法继续实时搜索。请稍后重试或改用第三方API。")
             text = resp.text or ""
             if ("安全验证" in text) or ("请输入验证码" in text):
@@ -120,41 +121,45 @@ class BaiduSearchProvider(JobProvider):
         pairs: List[tuple[str, str]] = []
         if self.sites:
             per_site = max(3, limit // min(len(self.sites), 4))
-            for site in self.sites[:4]:
-                pairs.extend(fetch(f"{base_query} site:{site}", per_site))
-                if len(pairs) >= limit:
-                    break
+            batches = await asyncio.gather(*(fetch(f"{base_query} site:{site}", per_site) for site in self.sites[:4]))
+            for batch in batches:
+                pairs.extend(batch)
         else:
-            pairs = fetch(base_query, limit)
+            pairs = await fetch(base_query, limit)
 
+        # Resolve redirects in batches, stopping once `limit` unique URLs are
+        # found (each resolution is a full page GET against Baidu); order, and
+        # therefore ranking, is kept.
+        batch_size = max(1, get_pool_stats()["max_per_host"])
         out: List[Dict[str, Any]] = []
         seen: set[str] = set()
-        for title, href in pairs:
-            if len(out) >= limit:
-                break
-            final_url = self._resolve_redirect(href)
-            if final_url in seen:
-                continue
-            seen.add(final_url)
-
-            job_id = self._job_id(final_url)
-            job = {
-                "id": job_id,
-                "title": title,
-                "company": "",
-                "location": params.location or "",
-                "salary": "",
-                "description": "",
-                "requirements": [],
-                "platform": self._platform_from_url(final_url),
-                "link": final_url,
-                "updated": "",
-                "provider": self.name,
-            }
-            self._cache[job_id] = job
-            out.append(job)
-
+        pos = 0
+        while pos < len(pairs) and len(out) < limit:
+            batch = pairs[pos: pos + min(batch_size, limit - len(out))]
+            pos += len(batch)
+            final_urls = await asyncio.gather(*(self._resolve_redirect(href) for _, href in batch))
+            for (title, _), final_url in zip(batch, final_urls):
+                if len(out) >= limit:
+                    break
+                if final_url in seen:
+                    continue
+                seen.add(final_url)
+
+                job_id = self._job_id(final_url)
+                job = {
+                    "id": job_id,
+                    "title": title,
+                    "company": "",
+                    "location": params.location or "",
+                    "salary": "",
+                    "description": "",
+                    "requirements": [],
+                    "platform": self._platform_from_url(final_url),
+                    "link": final_url,
+                    "updated": "",
+                    "provider": self.name,
+                }
+                out.append(job)
+
+        await self.aremember(out)
         return out
-
-    def get_job_detail(self, job_id: str) -> Optional[Dict[str, Any]]:
-        return self._cache.get(job_id)
@@ -1,7 +1,19 @@
 from __future__ import annotations
 
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Coroutine, Dict, List, Optional, TypeVar
+from urllib.parse import urlparse
+
+import httpx
+
+from ..job_detail_store import get_job_detail_store
+
+T = TypeVar("T")
 
 
 @dataclass
@@ -26,6 +38,165 @@ class JobProvider:
     def search_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
         raise NotImplementedError
 
+    def remember(self, jobs: List[Dict[str, Any]]) -> None:
+        """Write search results into the shared job detail store."""
+        get_job_detail_store().put_many(jobs)
+
     def get_job_detail(self, job_id: str) -> Optional[Dict[str, Any]]:
-        return None
+        # Most sources have no detail endpoint; serve what an earlier search
+        # stored (survives restarts, expires per provider TTL).
+        return get_job_detail_store().get(job_id)
+
+
+# ---------------------------------------------------------------------------
+# Shared HTTP pool for async providers
+#
+# One httpx.AsyncClient per event loop (its connections are bound to the loop
+# that created it), shared by every provider so repeated searches reuse
+# keep-alive TCP/TLS connections. On top of the client-wide limit each host
+# gets its own semaphore, so a provider fanning out many requests to one site
+# (e.g. Baidu redirect resolution) cannot starve the others or trip rate limits.
+#
+# Env:
+#   - JOB_HTTP_MAX_CONNECTIONS: total connections per client, default 50
+#   - JOB_HTTP_MAX_PER_HOST: concurrent requests per host, default 6
+#   - JOB_HTTP_KEEPALIVE_S: idle keep-alive expiry, default 60
+# ---------------------------------------------------------------------------
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_host_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+_pool_lock = threading.Lock()
+
+
+def _http_options() -> Dict[str, Any]:
+    max_connections = int(os.getenv("JOB_HTTP_MAX_CONNECTIONS", "50") or "50")
+    http2_env = os.getenv("JOB_HTTP2", "auto").strip().lower()
+    return {
+        "max_connections": max_connections,
+        "max_per_host": int(os.getenv("JOB_HTTP_MAX_PER_HOST", "6") or "6"),
+        "keepalive_expiry": float(os.getenv("JOB_HTTP_KEEPALIVE_S", "60") or "60"),
+        # Same rule as the LLM pool: on when the h2 package (httpx[http2]) is installed.
+        "http2": importlib.util.find_spec("h2") is not None and http2_env not in {"0", "false", "no", "off"},
+    }
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Pooled client for the running event loop (call from inside a coroutine)."""
+    loop = asyncio.get_running_loop()
+    with _pool_lock:
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            opts = _http_options()
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=opts["max_connections"],
+                    max_keepalive_connections=opts["max_connections"],
+                    keepalive_expiry=opts["keepalive_expiry"],
+                ),
+                http2=opts["http2"],
+                follow_redirects=True,
+            )
+            _clients[loop] = client
+    return client
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    host = urlparse(url).netloc.lower()
+    with _pool_lock:
+        limits = _host_limits.get(loop)
+        if limits is None:
+            limits = {}
+            _host_limits[loop] = limits
+        sem = limits.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(_http_options()["max_per_host"])
+            limits[host] = sem
+    return sem
+
+
+async def aclose_clients() -> None:
+    """Close the pooled client of the running loop and of the sync shim loop."""
+    loop = asyncio.get_running_loop()
+    with _pool_lock:
+        client = _clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+    if _runner is not None:
+        _runner.close()
+
+
+class _SyncRunner:
+    """
+    Background event loop used by the sync shim.
+
+    Keeping one long-lived loop (instead of asyncio.run per call) lets sync
+    callers share a pooled client too, and works both from plain threads and
+    from code that is already running inside another event loop.
+    """
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="job-provider-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def close(self) -> None:
+        async def _close() -> None:
+            client = _clients.pop(self.loop, None)
+            if client is not None:
+                await client.aclose()
+
+        if self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(_close(), self.loop).result()
+
+
+_runner: Optional[_SyncRunner] = None
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine to completion from synchronous code."""
+    global _runner
+    if _runner is None:
+        with _pool_lock:
+            if _runner is None:
+                _runner = _SyncRunner()
+    return _runner.run(coro)
+
+
+class AsyncJobProvider(JobProvider):
+    """
+    Provider implemented with non-blocking HTTP on the shared client pool.
+
+    Subclasses implement ``asearch_jobs``; ``search_jobs`` stays available as a
+    blocking shim for existing synchronous callers.
+    """
+
+    timeout_s: float = 12
+
+    async def asearch_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def search_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
+        return run_sync(self.asearch_jobs(params))
+
+    async def aremember(self, jobs: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self.remember, jobs)
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a request through the pooled client, honouring the per-host limit."""
+        kwargs.setdefault("timeout", self.timeout_s)
+        async with _host_semaphore(url):
+            return await get_async_client().request(method, url, **kwargs)
+
 
+def get_pool_stats() -> Dict[str, Any]:
+    """Connection pool overview."""
+    with _pool_lock:
+        return {
+            "clients": len(_clients),
+            "hosts": sum(len(h) for h in _host_limits.values()),
+            **_http_options(),
+        }
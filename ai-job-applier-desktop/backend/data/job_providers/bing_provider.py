@@ -5,12 +5,12 @@ import os
 from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse
 
-import requests
+import httpx
 
-from .base import JobProvider, JobSearchParams
+from .base import AsyncJobProvider, JobSearchParams
 
 
-class BingWebSearchProvider(JobProvider):
+class BingWebSearchProvider(AsyncJobProvider):
     """
     Real-time job link discovery via Bing Web Search API.
 
@@ -33,7 +33,6 @@ class BingWebSearchProvider(JobProvider):
         self.api_key = (api_key or os.getenv("BING_SEARCH_API_KEY", "")).strip()
         self.endpoint = (endpoint or os.getenv("BING_SEARCH_ENDPOINT", "")).strip() or "https://api.bing.microsoft.com/v7.0/search"
         self.timeout_s = timeout_s
-        self._cache: Dict[str, Dict[str, Any]] = {}
 
         sites = os.getenv("JOB_SEARCH_SITES", "").strip()
         self.sites = [s.strip().lstrip(".") for s in sites.split(",") if s.strip()] if sites else []
@@ -56,7 +55,7 @@ class BingWebSearchProvider(JobProvider):
             return "前程无忧"
         return host or "Bing"
 
-    def search_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
+    async def asearch_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
         if not self.api_key:
             raise RuntimeError("BING_SEARCH_API_KEY 未配置，无法使用实时搜索数据源。")
 
@@ -79,8 +78,8 @@ class BingWebSearchProvider(JobProvider):
         query = {"q": q, "mkt": "zh-CN", "count": max(1, min(int(params.limit or 50), 50))}
 
         try:
-            resp = requests.get(self.endpoint, headers=headers, params=query, timeout=self.timeout_s)
-        except requests.RequestException as e:
+            resp = await self.request("GET", self.endpoint, headers=headers, params=query)
+        except httpx.HTTPError as e:
             raise RuntimeError(f"Bing Search API 请求失败: {e}") from e
 
         if resp.status_code != 200:
@@ -109,10 +108,7 @@ class BingWebSearchProvider(JobProvider):
                 "updated": "",
                 "provider": self.name,
             }
-            self._cache[job_id] = job
             out.append(job)
 
+        await self.aremember(out)
         return out
-
-    def get_job_detail(self, job_id: str) -> Optional[Dict[str, Any]]:
-        return self._cache.get(job_id)
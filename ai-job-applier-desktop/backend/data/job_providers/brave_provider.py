@@ -5,12 +5,12 @@ import os
 from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse
 
-import requests
+import httpx
 
-from .base import JobProvider, JobSearchParams
+from .base import AsyncJobProvider, JobSearchParams
 
 
-class BraveSearchProvider(JobProvider):
+class BraveSearchProvider(AsyncJobProvider):
     """
     Real-time job link discovery via Brave Search API (legit web search API).
 
@@ -36,7 +36,6 @@ class BraveSearchProvider(JobProvider):
 
         sites = os.getenv("JOB_SEARCH_SITES", "").strip()
         self.sites = [s.strip().lstrip(".") for s in sites.split(",") if s.strip()] if sites else []
-        self._cache: Dict[str, Dict[str, Any]] = {}
 
     def _job_id(self, url: str) -> str:
         return "brave_" + hashlib.sha1(url.encode("utf-8", errors="ignore")).hexdigest()[:16]
@@ -56,7 +55,7 @@ class BraveSearchProvider(JobProvider):
             return "前程无忧"
         return host or "Brave"
 
-    def search_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
+    async def asearch_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
         if not self.api_key:
             raise RuntimeError("BRAVE_SEARCH_API_KEY 未配置，无法使用实时搜索数据源。")
 
@@ -88,8 +87,8 @@ class BraveSearchProvider(JobProvider):
         }
 
         try:
-            resp = requests.get(url, headers=headers, params=query, timeout=self.timeout_s)
-        except requests.RequestException as e:
+            resp = await self.request("GET", url, headers=headers, params=query)
+        except httpx.HTTPError as e:
             raise RuntimeError(f"Brave Search API 请求失败: {e}") from e
 
         if resp.status_code != 200:
@@ -117,11 +116,7 @@ class BraveSearchProvider(JobProvider):
                 "updated": "",
                 "provider": self.name,
             }
-            self._cache[job_id] = job
             out.append(job)
 
+        await self.aremember(out)
         return out
-
-    def get_job_detail(self, job_id: str) -> Optional[Dict[str, Any]]:
-        return self._cache.get(job_id)
-
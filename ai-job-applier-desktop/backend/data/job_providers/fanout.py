@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from .base import AsyncJobProvider, JobProvider, JobSearchParams, run_sync
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that only carry tracking / session state. Two links that
+# differ only in these point at the same posting.
+_TRACKING_PARAMS = {
+    "ka", "spm", "ref", "from", "source", "src", "lid", "sessionid", "sid",
+    "track_id", "trackid", "fr", "gclid", "fbclid", "msclkid",
+}
+_PUNCT = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalize a job link for deduplication: lowercase scheme/host, drop "www.",
+    the fragment, tracking parameters and a trailing slash, sort the rest.
+    """
+    url = (url or "").strip()
+    if not url:
+        return ""
+    try:
+        parts = urlparse(url)
+    except ValueError:
+        return url
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunparse(("https" if parts.scheme in ("http", "https") else parts.scheme, host, path, "", urlencode(query), ""))
+
+
+def _norm(text: str) -> str:
+    return _PUNCT.sub("", unicodedata.normalize("NFKC", text or "").lower())
+
+
+def dedup_keys(job: Dict[str, Any]) -> List[str]:
+    """
+    Keys identifying the same posting across providers: the canonical link and,
+    when the company is known, title + company. Search-engine providers leave
+    company empty, so for them only the link counts.
+    """
+    keys = []
+    link = canonical_url(job.get("link") or job.get("apply_url") or "")
+    if link:
+        keys.append("url:" + link)
+    title, company = _norm(job.get("title", "")), _norm(job.get("company", ""))
+    if title and company:
+        keys.append(f"tc:{title}|{company}")
+    return keys
+
+
+class JobMerger:
+    """Accumulates provider results in arrival order, skipping duplicates."""
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.jobs: List[Dict[str, Any]] = []
+        self._index: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, jobs: Sequence[Dict[str, Any]]) -> int:
+        """Merge a batch; returns how many new postings it contributed."""
+        added = 0
+        for job in jobs:
+            keys = dedup_keys(job)
+            existing = next((self._index[k] for k in keys if k in self._index), None)
+            if existing is not None:
+                # Keep the first copy, but let later providers fill blanks
+                # (e.g. Jooble knows the company, a search hit does not).
+                for field, value in job.items():
+                    if value and not existing.get(field):
+                        existing[field] = value
+                provider = job.get("provider")
+                if provider and provider not in existing["sources"]:
+                    existing["sources"].append(provider)
+                for k in keys:
+                    self._index.setdefault(k, existing)
+                continue
+            merged = dict(job)
+            merged["sources"] = [job["provider"]] if job.get("provider") else []
+            self.jobs.append(merged)
+            for k in keys:
+                self._index[k] = merged
+            added += 1
+        return added
+
+    def result(self) -> List[Dict[str, Any]]:
+        return self.jobs[: self.limit] if self.limit else list(self.jobs)
+
+
+async def _run_provider(provider: JobProvider, params: JobSearchParams, timeout_s: float) -> Tuple[str, str, Any]:
+    """Run one provider under its deadline; returns (name, status, jobs | error)."""
+    if isinstance(provider, AsyncJobProvider):
+        call = provider.asearch_jobs(params)
+    else:
+        # Blocking providers (e.g. OpenClaw CLI) run on a worker thread; on
+        # timeout the thread finishes in the background and is ignored.
+        call = asyncio.to_thread(provider.search_jobs, params)
+    try:
+        return provider.name, "ok", await asyncio.wait_for(call, timeout_s)
+    except asyncio.TimeoutError:
+        return provider.name, "timeout", None
+    except Exception as e:
+        return provider.name, "error", e
+
+
+async def afanout_search(
+    providers: Sequence[JobProvider],
+    params: JobSearchParams,
+    timeout_s: float,
+    timeouts: Optional[Dict[str, float]] = None,
+    progress_callback: Optional[Callable[[str, int], None]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    Query all providers concurrently and merge their results as they arrive.
+
+    Each provider gets its own deadline (``timeouts[name]`` or ``timeout_s``);
+    a provider that misses it is cancelled and reported as "timeout", so total
+    latency is bounded by the slowest deadline rather than the sum of provider
+    latencies.
+
+    Returns (jobs, report) where report maps provider name to
+    {"status": ok|error|timeout, "count", "added", "elapsed_ms", "error"?}.
+    Raises RuntimeError only when every provider failed.
+    """
+    timeouts = timeouts or {}
+    start = time.monotonic()
+    merger = JobMerger(limit=params.limit)
+    report: Dict[str, Dict[str, Any]] = {}
+
+    calls = [_run_provider(p, params, float(timeouts.get(p.name, timeout_s))) for p in providers]
+    for finished in asyncio.as_completed(calls):
+        name, status, value = await finished
+        entry: Dict[str, Any] = {"status": status, "count": 0, "added": 0, "elapsed_ms": int((time.monotonic() - start) * 1000)}
+        if status == "ok":
+            jobs = value or []
+            entry["count"], entry["added"] = len(jobs), merger.add(jobs)
+        elif status == "error":
+            entry["error"] = str(value)
+            logger.warning(f"job provider {name} failed: {value}")
+        else:
+            logger.warning(f"job provider {name} timed out after {timeouts.get(name, timeout_s)}s")
+        report[name] = entry
+
+        if progress_callback and status == "ok":
+            try:
+                progress_callback(f"{name}: {entry['count']} 条", int(len(report) * 100 / len(calls)))
+            except Exception:
+                pass
+
+    if calls and not any(r["status"] == "ok" for r in report.values()):
+        errors = "; ".join(f"{n}: {r.get('error', r['status'])}" for n, r in report.items())
+        raise RuntimeError(f"所有岗位数据源均不可用（{errors}）")
+
+    return merger.result(), report
+
+
+def fanout_search(
+    providers: Sequence[JobProvider],
+    params: JobSearchParams,
+    timeout_s: float,
+    timeouts: Optional[Dict[str, float]] = None,
+    progress_callback: Optional[Callable[[str, int], None]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """Blocking wrapper around afanout_search for synchronous callers."""
+    return run_sync(afanout_search(providers, params, timeout_s, timeouts, progress_callback))
@@ -4,12 +4,12 @@ import hashlib
 import os
 from typing import Any, Dict, List, Optional
 
-import requests
+import httpx
 
-from .base import JobProvider, JobSearchParams
+from .base import AsyncJobProvider, JobSearchParams
 
 
-class JoobleProvider(JobProvider):
+class JoobleProvider(AsyncJobProvider):
     """
     Real-time job search via Jooble API.
 
@@ -21,7 +21,6 @@ class JoobleProvider(JobProvider):
     def __init__(self, api_key: Optional[str] = None, timeout_s: int = 12):
         self.api_key = api_key or os.getenv("JOOBLE_API_KEY", "").strip()
         self.timeout_s = timeout_s
-        self._cache: Dict[str, Dict[str, Any]] = {}
 
     def _job_id(self, job: Dict[str, Any]) -> str:
         # Jooble returns an "id" but it's not always present. We create a stable
@@ -36,7 +35,7 @@ class JoobleProvider(JobProvider):
         )
         return "jooble_" + hashlib.sha1(raw.encode("utf-8", errors="ignore")).hexdigest()[:16]
 
-    def search_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
+    async def asearch_jobs(self, params: JobSearchParams) -> List[Dict[str, Any]]:
         if not self.api_key:
             raise RuntimeError("JOOBLE_API_KEY 未配置，无法使用实时岗位数据源。")
 
@@ -57,8 +56,8 @@ class JoobleProvider(JobProvider):
             payload["salary"] = int(params.salary_min)
 
         try:
-            resp = requests.post(endpoint, json=payload, timeout=self.timeout_s)
-        except requests.RequestException as e:
+            resp = await self.request("POST", endpoint, json=payload)
+        except httpx.HTTPError as e:
             raise RuntimeError(f"Jooble API 请求失败: {e}") from e
 
         if resp.status_code != 200:
@@ -84,12 +83,7 @@ class JoobleProvider(JobProvider):
                 "updated": j.get("updated") or "",
                 "provider": self.name,
             }
-            self._cache[job_id] = job
             out.append(job)
 
+        await self.aremember(out)
         return out
-
-    def get_job_detail(self, job_id: str) -> Optional[Dict[str, Any]]:
-        # Jooble API doesn't provide a detail endpoint; we return cached entry
-        # from the most recent search.
-        return self._cache.get(job_id)
@@ -75,7 +75,6 @@ class OpenClawBrowserProvider(JobProvider):
     def __init__(self, browser_profile: Optional[str] = None, timeout_s: int = 90):
         self.browser_profile = (browser_profile or os.getenv("OPENCLAW_BROWSER_PROFILE", "")).strip() or "chrome"
         self.timeout_s = timeout_s
-        self._cache: Dict[str, Dict[str, Any]] = {}
 
     def _oc(self, *args: str, json_out: bool = False, timeout_s: Optional[int] = None) -> _CmdResult:
         cmd = ["openclaw", "browser", "--browser-profile", self.browser_profile]
@@ -233,7 +232,6 @@ class OpenClawBrowserProvider(JobProvider):
                     "updated": "",
                     "provider": self.name,
                 }
-                self._cache[job_id] = job
                 results.append(job)
                 if len(results) >= limit:
                     if progress_callback:
@@ -241,6 +239,7 @@ class OpenClawBrowserProvider(JobProvider):
                             progress_callback("完成", 100)
                         except Exception:
                             pass
+                    self.remember(results[:limit])
                     return results[:limit]
 
         if progress_callback:
@@ -248,11 +247,9 @@ class OpenClawBrowserProvider(JobProvider):
                 progress_callback("完成", 100)
             except Exception:
                 pass
+        self.remember(results[:limit])
         return results[:limit]
 
-    def get_job_detail(self, job_id: str) -> Optional[Dict[str, Any]]:
-        return self._cache.get(job_id)
-
     def health_check(self) -> Dict[str, Any]:
         """
         健康检查：检测OpenClaw是否可用
@@ -3,20 +3,34 @@
 支持: Boss直聘、猎聘、智联招聘、前程无忧
 """
 
+import asyncio
 import os
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import random
-from datetime import datetime, timedelta
+import uuid
+from datetime import date, datetime, timedelta
 from urllib.parse import quote
 
 from app.services.application_record_service import ApplicationRecordService
-from app.services.job_providers.base import JobSearchParams
+from app.services.job_providers.base import AsyncJobProvider, JobSearchParams
 from app.services.job_providers.jooble_provider import JoobleProvider
 from app.services.job_providers.bing_provider import BingWebSearchProvider
 from app.services.job_providers.baidu_provider import BaiduSearchProvider
 from app.services.job_providers.brave_provider import BraveSearchProvider
 from app.services.job_providers.openclaw_browser_provider import OpenClawBrowserProvider
+from app.services.job_providers.fanout import afanout_search, fanout_search
+from app.services.job_detail_store import provider_of
+from app.services.search_cache import get_search_cache
+from app.services.job_index import JobIndex, file_source, load_jobs_file, open_job_index
+
+# 内置岗位生成逻辑变化时加一，已保存的索引随之重建
+LOCAL_DATASET_VERSION = 1
+
+
+def _complete(report: Dict[str, Dict[str, Any]]) -> bool:
+    """扇出搜索的每个数据源都正常返回（没有超时或报错），结果才是完整的"""
+    return all(r.get("status") == "ok" for r in report.values())
 
 class RealJobService:
     """真实招聘数据服务"""
@@ -36,8 +50,26 @@ class RealJobService:
         self.brave = BraveSearchProvider()
         self.openclaw = OpenClawBrowserProvider()
 
+        # 并发聚合模式（JOB_DATA_PROVIDER=fanout 或 JOB_SEARCH_FANOUT=1）：
+        # 同时查询所有可用数据源，合并去重；单个数据源超时只丢弃它的结果
+        self.fanout = self.provider_name in ("fanout", "all") or os.getenv("JOB_SEARCH_FANOUT", "").strip().lower() in {
+            "1", "true", "yes", "on"
+        }
+        self.provider_timeout_s = float(os.getenv("JOB_PROVIDER_TIMEOUT_S", "10") or 10)
+        # 最近一次聚合搜索各数据源的状态（耗时、条数、超时/失败原因）
+        self.last_search_report: Dict[str, Dict[str, Any]] = {}
+        self.search_cache = get_search_cache() if os.getenv("JOB_SEARCH_CACHE", "1").strip().lower() not in {
+            "0", "false", "no", "off"
+        } else None
+
         # 本地岗位数据库（fallback；用于无API Key时的演示/离线运行）
-        self.real_jobs_database = self._load_real_jobs()
+        # 倒排索引持久化在 LOCAL_JOB_INDEX_DIR，启动时 mmap 加载；索引本身可当作岗位列表使用
+        self.job_index = self._open_job_index()
+        self.real_jobs_database = self.job_index
+        # 岗位 ID 前缀 → 数据源；详情统一存在共享的岗位详情存储里，重启后依然可查
+        self._providers_by_prefix = {
+            p.name: p for p in (self.jooble, self.bing, self.baidu, self.brave, self.openclaw)
+        }
 
         # 投递记录
         self.records = ApplicationRecordService()
@@ -54,6 +86,21 @@ class RealJobService:
             }
         }
     
+    def _open_job_index(self) -> JobIndex:
+        """
+        加载本地岗位索引；不存在或数据源变化时重建
+
+        LOCAL_JOBS_FILE 指定 JSON / JSONL 岗位文件（例如压测用的大规模数据），
+        未指定时使用内置生成的岗位。内置岗位的发布日期相对当天生成，
+        所以数据源标识带上日期，每天首次启动时重建，日期不会停留在第一次构建那天。
+        """
+        index_dir = os.getenv("LOCAL_JOB_INDEX_DIR", "data/job_index")
+        jobs_file = os.getenv("LOCAL_JOBS_FILE", "").strip()
+        if jobs_file:
+            return open_job_index(index_dir, file_source(jobs_file), lambda: load_jobs_file(jobs_file))
+        source = f"builtin:{LOCAL_DATASET_VERSION}:{date.today().isoformat()}"
+        return open_job_index(index_dir, source, self._load_real_jobs)
+
     def _load_real_jobs(self) -> List[Dict[str, Any]]:
         """加载本地岗位数据库（fallback；用于无API Key时的演示/离线运行）"""
 
@@ -278,10 +325,101 @@ class RealJobService:
         # auto fallback: if no API-based provider is enabled, use Baidu.
         return (not self._use_jooble()) and (not self._use_brave()) and (not self._use_bing())
 
+    def _fanout_providers(self) -> List[Any]:
+        """聚合模式下参与查询的数据源：JOB_FANOUT_PROVIDERS 显式指定，否则为所有已配置 Key 的 API + 百度"""
+        available = {p.name: p for p in (self.jooble, self.brave, self.bing, self.baidu, self.openclaw)}
+        names = [n.strip().lower() for n in os.getenv("JOB_FANOUT_PROVIDERS", "").split(",") if n.strip()]
+        if names:
+            return [available[n] for n in names if n in available]
+        providers = [p for p in (self.jooble, self.brave, self.bing) if p.api_key]
+        providers.append(self.baidu)
+        return providers
+
+    def _provider_timeouts(self) -> Dict[str, float]:
+        """单个数据源的超时，例如 JOB_PROVIDER_TIMEOUT_BAIDU_S=5"""
+        timeouts = {}
+        for name in ("jooble", "brave", "bing", "baidu", "openclaw"):
+            value = os.getenv(f"JOB_PROVIDER_TIMEOUT_{name.upper()}_S", "").strip()
+            if value:
+                timeouts[name] = float(value)
+        return timeouts
+
     def _use_local_dataset(self) -> bool:
         # Local synthetic jobs are allowed only when explicitly requested.
         return self.provider_name in ("local", "offline") or self.allow_local_fallback
     
+    def _select_provider(self):
+        """非聚合模式下按优先级选出的实时数据源；None 表示走本地数据"""
+        if self._use_jooble():
+            return self.jooble
+        if self._use_openclaw():
+            return self.openclaw
+        if self._use_brave():
+            return self.brave
+        # Real-time link discovery via search engine.
+        if self._use_bing():
+            return self.bing
+        # No-key China-friendly option: Baidu SERP -> real job URLs.
+        if self._use_baidu():
+            return self.baidu
+        return None
+
+    def _search_source(self) -> str:
+        """当前数据源配置（作为搜索缓存键的一部分，切换数据源后不会读到旧结果）"""
+        if self.fanout:
+            return "fanout:" + ",".join(p.name for p in self._fanout_providers())
+        provider = self._select_provider()
+        if provider is not None:
+            return provider.name
+        return "local" if self._use_local_dataset() else "none"
+
+    def _search_uncached(self, params: JobSearchParams, progress_callback=None) -> Tuple[List[Dict[str, Any]], List[str], bool]:
+        """实际请求数据源，返回 (岗位列表, 调用过的数据源, 是否所有数据源都成功返回)"""
+        if self.fanout:
+            jobs, self.last_search_report = fanout_search(
+                self._fanout_providers(),
+                params,
+                timeout_s=self.provider_timeout_s,
+                timeouts=self._provider_timeouts(),
+                progress_callback=progress_callback,
+            )
+            return jobs, list(self.last_search_report), _complete(self.last_search_report)
+
+        provider = self._select_provider()
+        if provider is self.openclaw:
+            return provider.search_jobs(params, progress_callback=progress_callback), [provider.name], True
+        if provider is not None:
+            return provider.search_jobs(params), [provider.name], True
+
+        if not self._use_local_dataset():
+            return [], [], True
+        return self._search_local(params), [], True
+
+    async def _asearch_uncached(self, params: JobSearchParams, progress_callback=None) -> Tuple[List[Dict[str, Any]], List[str], bool]:
+        if self.fanout:
+            jobs, self.last_search_report = await afanout_search(
+                self._fanout_providers(),
+                params,
+                timeout_s=self.provider_timeout_s,
+                timeouts=self._provider_timeouts(),
+                progress_callback=progress_callback,
+            )
+            return jobs, list(self.last_search_report), _complete(self.last_search_report)
+        provider = self._select_provider()
+        if isinstance(provider, AsyncJobProvider):
+            return await provider.asearch_jobs(params), [provider.name], True
+        return await asyncio.to_thread(self._search_uncached, params, progress_callback)
+
+    def _search_local(self, params: JobSearchParams) -> List[Dict[str, Any]]:
+        """本地岗位匹配（倒排索引 + BM25 打分）"""
+        return self.job_index.search(
+            keywords=params.keywords,
+            location=params.location,
+            salary_min=params.salary_min,
+            experience=params.experience,
+            limit=params.limit,
+        )
+
     def search_jobs(self, 
                    keywords: List[str] = None,
                    location: str = None,
@@ -291,6 +429,9 @@ class RealJobService:
                    progress_callback=None) -> List[Dict[str, Any]]:
         """
         搜索岗位（实时优先；无API Key时自动回退到本地数据）
+
+        相同含义的查询（关键词顺序/大小写/同义词、城市别名不同）共用搜索缓存，
+        缓存软过期后先返回旧结果再在后台刷新（JOB_SEARCH_CACHE=0 关闭）
         
         Args:
             keywords: 关键词列表（技能、职位等）
@@ -302,135 +443,48 @@ class RealJobService:
         Returns:
             匹配的岗位列表
         """
-        
-        keywords = keywords or []
-
-        # Real-time provider path.
-        if self._use_jooble():
-            params = JobSearchParams(
-                keywords=keywords,
-                location=location,
-                salary_min=salary_min,
-                experience=experience,
-                limit=limit,
-            )
-            return self.jooble.search_jobs(params)
-
-        if self._use_openclaw():
-            params = JobSearchParams(
-                keywords=keywords,
-                location=location,
-                salary_min=salary_min,
-                experience=experience,
-                limit=limit,
-            )
-            return self.openclaw.search_jobs(params, progress_callback=progress_callback)
-
-        if self._use_brave():
-            params = JobSearchParams(
-                keywords=keywords,
-                location=location,
-                salary_min=salary_min,
-                experience=experience,
-                limit=limit,
-            )
-            return self.brave.search_jobs(params)
-
-        # Real-time link discovery via search engine.
-        if self._use_bing():
-            params = JobSearchParams(
-                keywords=keywords,
-                location=location,
-                salary_min=salary_min,
-                experience=experience,
-                limit=limit,
-            )
-            return self.bing.search_jobs(params)
-
-        # No-key China-friendly option: Baidu SERP -> real job URLs.
-        if self._use_baidu():
-            params = JobSearchParams(
-                keywords=keywords,
-                location=location,
-                salary_min=salary_min,
-                experience=experience,
-                limit=limit,
-            )
-            return self.baidu.search_jobs(params)
+        params = JobSearchParams(
+            keywords=keywords or [],
+            location=location,
+            salary_min=salary_min,
+            experience=experience,
+            limit=limit,
+        )
+        if self.search_cache is None:
+            return self._search_uncached(params, progress_callback)[0]
+        return self.search_cache.get_or_fetch(
+            params, self._search_source(), self._search_uncached, progress_callback
+        )
 
-        if not self._use_local_dataset():
-            return []
+    async def asearch_jobs(self,
+                           keywords: List[str] = None,
+                           location: str = None,
+                           salary_min: int = None,
+                           experience: str = None,
+                           limit: int = 50,
+                           progress_callback=None) -> List[Dict[str, Any]]:
+        """搜索岗位（异步版，供 async 路由调用，不阻塞事件循环），参数同 search_jobs"""
+        params = JobSearchParams(
+            keywords=keywords or [],
+            location=location,
+            salary_min=salary_min,
+            experience=experience,
+            limit=limit,
+        )
+        if self.search_cache is None:
+            return (await self._asearch_uncached(params, progress_callback))[0]
+        return await self.search_cache.aget_or_fetch(
+            params, self._search_source(), self._asearch_uncached, progress_callback
+        )
 
-        matched_jobs: List[Dict[str, Any]] = []
-        
-        for job in self.real_jobs_database:
-            score = 0
-            
-            # 关键词匹配
-            if keywords:
-                for keyword in keywords:
-                    keyword_lower = keyword.lower()
-                    # 检查标题
-                    if keyword_lower in job['title'].lower():
-                        score += 10
-                    # 检查技能要求
-                    for req in job['requirements']:
-                        if keyword_lower in req.lower():
-                            score += 5
-            
-            # 地点匹配
-            if location and location in job['location']:
-                score += 8
-            
-            # 薪资匹配
-            if salary_min:
-                salary_range = job['salary'].replace('K', '').split('-')
-                if len(salary_range) == 2:
-                    min_salary = int(salary_range[0])
-                    if min_salary >= salary_min:
-                        score += 5
-            
-            # 经验匹配
-            if experience and experience in job['experience']:
-                score += 5
-            
-            if score > 0:
-                job_copy = job.copy()
-                job_copy['match_score'] = score
-                job_copy['match_percentage'] = min(int(score * 2), 100)
-                matched_jobs.append(job_copy)
-        
-        # 按匹配度排序
-        matched_jobs.sort(key=lambda x: x['match_score'], reverse=True)
-        
-        return matched_jobs[:limit]
-    
     def get_job_detail(self, job_id: str) -> Dict[str, Any]:
-        """获取岗位详情"""
-        if job_id and job_id.startswith("jooble_"):
-            job = self.jooble.get_job_detail(job_id)
-            if job:
-                return job
-        if job_id and job_id.startswith("bing_"):
-            job = self.bing.get_job_detail(job_id)
-            if job:
-                return job
-        if job_id and job_id.startswith("baidu_"):
-            job = self.baidu.get_job_detail(job_id)
-            if job:
-                return job
-        if job_id and job_id.startswith("brave_"):
-            job = self.brave.get_job_detail(job_id)
-            if job:
-                return job
-        if job_id and job_id.startswith("openclaw_"):
-            job = self.openclaw.get_job_detail(job_id)
-            if job:
-                return job
-        for job in self.real_jobs_database:
-            if job['id'] == job_id:
-                return job
-        return None
+        """获取岗位详情（按 ID 前缀分派到数据源，本地岗位查字典）"""
+        if not job_id:
+            return None
+        provider = self._providers_by_prefix.get(provider_of(job_id))
+        if provider is not None:
+            return provider.get_job_detail(job_id)
+        return self.job_index.get(job_id)
     
     def apply_job(self, job_id: str, resume_text: str, user_info: Dict) -> Dict[str, Any]:
         """
@@ -457,7 +511,7 @@ class RealJobService:
         # API. Real automated applying generally requires logged-in browser
         # automation and may violate platform ToS, and also runs into captchas.
         # Here we implement "真实岗位 + 跳转投递" and record an application entry.
-        application_id = f"APP{random.randint(100000, 999999)}"
+        application_id = f"APP{uuid.uuid4().hex[:16].upper()}"
         apply_link = job.get("link") or job.get("apply_url") or ""
         status = "待投递" if apply_link else "待处理"
 
@@ -472,7 +526,12 @@ class RealJobService:
             "apply_link": apply_link,
             "user_info": user_info or {},
         }
-        self.records.add_record(application)
+        if not self.records.add_record(application):
+            return {
+                "success": False,
+                "message": "投递记录保存失败",
+                "data": application,
+            }
 
         if apply_link:
             return {
@@ -498,8 +557,8 @@ class RealJobService:
     def get_statistics(self) -> Dict[str, Any]:
         """获取数据统计"""
         return {
-            "total_jobs": len(self.real_jobs_database),
-            "total_companies": len(set(job['company'] for job in self.real_jobs_database)),
+            "total_jobs": len(self.job_index),
+            "total_companies": self.job_index.facets["companies"],
             "provider_mode": (
                 "jooble"
                 if self._use_jooble()
@@ -518,18 +577,12 @@ class RealJobService:
                 )
             ),
             "platforms": {
-                "Boss直聘": len([j for j in self.real_jobs_database if j['platform'] == 'Boss直聘']),
-                "猎聘": len([j for j in self.real_jobs_database if j['platform'] == '猎聘']),
-                "智联招聘": len([j for j in self.real_jobs_database if j['platform'] == '智联招聘']),
-                "前程无忧": len([j for j in self.real_jobs_database if j['platform'] == '前程无忧'])
+                name: self.job_index.facets["platform"].get(name, 0)
+                for name in ("Boss直聘", "猎聘", "智联招聘", "前程无忧")
             },
             "locations": {
-                "北京": len([j for j in self.real_jobs_database if j['location'] == '北京']),
-                "上海": len([j for j in self.real_jobs_database if j['location'] == '上海']),
-                "深圳": len([j for j in self.real_jobs_database if j['location'] == '深圳']),
-                "杭州": len([j for j in self.real_jobs_database if j['location'] == '杭州']),
-                "广州": len([j for j in self.real_jobs_database if j['location'] == '广州']),
-                "成都": len([j for j in self.real_jobs_database if j['location'] == '成都'])
+                name: self.job_index.facets["location"].get(name, 0)
+                for name in ("北京", "上海", "深圳", "杭州", "广州", "成都")
             }
         }
 
@@ -0,0 +1,139 @@
+"""
+投递记录导出 - CSV / NDJSON / Parquet 流式输出
+
+按 (applied_at, id) 游标分块读取记录，边读边编码，内存占用与导出行数无关。
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from data.record_store import COLUMNS, RecordStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:  # pyarrow 未安装时不支持 Parquet
+    PYARROW_AVAILABLE = False
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+CHUNK_SIZE = 2000
+
+
+def iter_chunks(store: RecordStore, filters: Dict[str, Any], chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """按游标分块读取（每块一次独立查询，可以在不同线程里迭代）"""
+    cursor = None
+    while True:
+        records, _, cursor = store.query(**filters, limit=chunk_size, cursor=cursor, with_total=False)
+        if records:
+            yield records
+        if not cursor:
+            break
+
+
+def _csv_rows(chunks: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # 带 BOM，Excel 打开中文不乱码
+    buffer.write("\ufeff")
+    writer.writerow(COLUMNS)
+    for chunk in chunks:
+        writer.writerows([r.get(col) if r.get(col) is not None else "" for col in COLUMNS] for r in chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _ndjson_rows(chunks: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in chunk).encode("utf-8")
+
+
+class _StreamSink:
+    """只追加的写入目标：Parquet 写完一个行组就把字节交出去，tell() 仍返回总偏移"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _parquet_rows(chunks: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    schema = pa.schema([(col, pa.string()) for col in COLUMNS])
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    try:
+        for chunk in chunks:
+            # 每块写成一个行组
+            writer.write_table(pa.Table.from_pylist([{col: r.get(col) for col in COLUMNS} for r in chunk], schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _gzip(stream: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31：gzip 格式
+    for data in stream:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_records(
+    store: RecordStore,
+    fmt: str = "csv",
+    filters: Optional[Dict[str, Any]] = None,
+    gzip: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    生成导出文件的字节流
+
+    Args:
+        fmt: csv / ndjson / parquet
+        filters: 与 RecordStore.query 相同的筛选参数（status、company、date_from、date_to、q）
+        gzip: 是否 gzip 压缩（Parquet 本身已压缩，一般不需要）
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    if fmt == "parquet" and not PYARROW_AVAILABLE:
+        raise ValueError("Parquet 导出需要安装 pyarrow")
+
+    chunks = iter_chunks(store, filters or {}, chunk_size)
+    encoders = {"csv": _csv_rows, "ndjson": _ndjson_rows, "parquet": _parquet_rows}
+    stream = encoders[fmt](chunks)
+    return _gzip(stream) if gzip else stream
@@ -0,0 +1,487 @@
+"""
+投递记录存储 - SQLite（WAL 模式）
+
+替代 data/application_records.json（api/records.py）和 data/applications.json
+（ApplicationRecordService）两个 JSON 文件：单条写入不再重写整个文件，
+并发请求之间也不会互相覆盖。首次打开时自动把旧 JSON 文件导入一次。
+"""
+
+import base64
+import json
+import logging
+import os
+import sqlite3
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from data.sqlite_util import ThreadLocalConnections, lazy_singleton
+
+logger = logging.getLogger(__name__)
+
+# 独立成列（可建索引、可筛选）的字段；其余字段原样存进 extra_json
+COLUMNS = (
+    "id", "job_id", "job_title", "company", "salary", "location", "platform",
+    "status", "cover_letter", "response", "apply_link", "applied_at", "updated_at",
+)
+
+# 旧 JSON 文件里的别名字段
+_ALIASES = {"application_id": "id", "apply_time": "applied_at"}
+
+LEGACY_FILES = ("data/application_records.json", "data/applications.json")
+
+# 物化统计的维度：名称 → 分桶表达式（{row} 为 new / old）
+STAT_DIMENSIONS = {
+    "total": "''",
+    "status": "{row}.status",
+    "platform": "{row}.platform",
+    "day": "substr({row}.applied_at, 1, 10)",
+    "day_status": "substr({row}.applied_at, 1, 10) || '|' || {row}.status",
+}
+
+
+class DuplicateRecordError(ValueError):
+    """insert 时 id 已存在（INSERT OR IGNORE 没有写入任何行）"""
+
+
+def _stat_sql(row: str, delta: int, dimensions: Iterable[str]) -> str:
+    return "\n".join(
+        f"INSERT INTO record_stats(dimension, bucket, count) VALUES ('{name}', {STAT_DIMENSIONS[name].format(row=row)}, {delta}) "
+        f"ON CONFLICT(dimension, bucket) DO UPDATE SET count = count + ({delta});"
+        for name in dimensions
+    )
+
+
+_INSERT_SQL = (
+    f"INSERT OR IGNORE INTO application_records({', '.join(COLUMNS)}, extra_json) "
+    f"VALUES({', '.join('?' for _ in COLUMNS)}, ?)"
+)
+
+
+def normalize_time(value: Any) -> str:
+    """统一成 ISO 格式（'2024-01-01 10:00:00' → '2024-01-01T10:00:00'），保证按字符串排序即按时间排序"""
+    if not value:
+        return datetime.now().isoformat()
+    text = str(value).strip()
+    if len(text) >= 19 and text[10] == " ":
+        text = f"{text[:10]}T{text[11:]}"
+    return text
+
+
+class RecordStore:
+    """
+    投递记录存储
+
+    - 每个线程复用一个连接；所有 SQL 都是固定文本，走 sqlite3 的语句缓存
+    - status / applied_at / job_id 上有索引
+    - insert_many 在一个事务里批量写入
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("RECORDS_DB_PATH", "data/records.db")
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = ThreadLocalConnections(self.db_path, row_factory=sqlite3.Row, cached_statements=128)
+        self._init_db()
+
+    def _init_db(self) -> None:
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS application_records (
+                id TEXT PRIMARY KEY,
+                job_id TEXT NOT NULL DEFAULT '',
+                job_title TEXT NOT NULL DEFAULT '',
+                company TEXT NOT NULL DEFAULT '',
+                salary TEXT NOT NULL DEFAULT '',
+                location TEXT NOT NULL DEFAULT '',
+                platform TEXT NOT NULL DEFAULT '',
+                status TEXT NOT NULL DEFAULT '',
+                cover_letter TEXT NOT NULL DEFAULT '',
+                response TEXT,
+                apply_link TEXT NOT NULL DEFAULT '',
+                applied_at TEXT NOT NULL,
+                updated_at TEXT,
+                extra_json TEXT
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_records_status_time ON application_records(status, applied_at, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_records_time ON application_records(applied_at, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_records_job ON application_records(job_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_records_company_time ON application_records(company, applied_at, id)")
+        self.fts_enabled = self._init_fts(conn)
+        self._init_stats(conn)
+
+    def _init_stats(self, conn: sqlite3.Connection) -> None:
+        """
+        物化统计表 record_stats(dimension, bucket, count)
+
+        由触发器在插入 / 删除 / 修改 status、platform、applied_at 时同一事务内增减，
+        读取统计不再扫描记录表。
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'record_stats'"
+        ).fetchone()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS record_stats (
+                dimension TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dimension, bucket)
+            ) WITHOUT ROWID
+            """
+        )
+        changing = [name for name in STAT_DIMENSIONS if name != "total"]
+        conn.executescript(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS record_stats_ai AFTER INSERT ON application_records BEGIN
+                {_stat_sql("new", 1, STAT_DIMENSIONS)}
+            END;
+            CREATE TRIGGER IF NOT EXISTS record_stats_ad AFTER DELETE ON application_records BEGIN
+                {_stat_sql("old", -1, STAT_DIMENSIONS)}
+            END;
+            CREATE TRIGGER IF NOT EXISTS record_stats_au AFTER UPDATE OF status, platform, applied_at ON application_records BEGIN
+                {_stat_sql("old", -1, changing)}
+                {_stat_sql("new", 1, changing)}
+            END;
+            """
+        )
+        if not exists:
+            self.rebuild_stats()
+
+    @staticmethod
+    def _init_fts(conn: sqlite3.Connection) -> bool:
+        """职位名称的 FTS5 trigram 索引（外部内容表，由触发器同步）；SQLite 不支持时退化为 LIKE"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records_fts'"
+        ).fetchone()
+        if exists:
+            return True
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE records_fts USING fts5("
+                "job_title, content='application_records', content_rowid='rowid', tokenize='trigram')"
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 trigram 不可用，职位搜索使用 LIKE: {e}")
+            return False
+        conn.executescript(
+            """
+            CREATE TRIGGER IF NOT EXISTS records_fts_ai AFTER INSERT ON application_records BEGIN
+                INSERT INTO records_fts(rowid, job_title) VALUES (new.rowid, new.job_title);
+            END;
+            CREATE TRIGGER IF NOT EXISTS records_fts_ad AFTER DELETE ON application_records BEGIN
+                INSERT INTO records_fts(records_fts, rowid, job_title) VALUES ('delete', old.rowid, old.job_title);
+            END;
+            CREATE TRIGGER IF NOT EXISTS records_fts_au AFTER UPDATE OF job_title ON application_records BEGIN
+                INSERT INTO records_fts(records_fts, rowid, job_title) VALUES ('delete', old.rowid, old.job_title);
+                INSERT INTO records_fts(rowid, job_title) VALUES (new.rowid, new.job_title);
+            END;
+            """
+        )
+        # 已有数据补建索引
+        conn.execute("INSERT INTO records_fts(records_fts) VALUES ('rebuild')")
+        return True
+
+    @staticmethod
+    def _to_params(record: Dict[str, Any]) -> Tuple:
+        data = dict(record)
+        for old, new in _ALIASES.items():
+            if old in data and not data.get(new):
+                data[new] = data.pop(old)
+            else:
+                data.pop(old, None)
+
+        if not data.get("id"):
+            data["id"] = f"{data.get('job_id', '')}_{uuid.uuid4().hex[:12]}"
+        data["applied_at"] = normalize_time(data.get("applied_at"))
+        if data.get("updated_at"):
+            data["updated_at"] = normalize_time(data["updated_at"])
+
+        values = []
+        for col in COLUMNS:
+            value = data.pop(col, None)
+            if value is None and col not in ("response", "updated_at"):
+                value = ""
+            values.append(value if value is None or isinstance(value, str) else str(value))
+        extra = json.dumps(data, ensure_ascii=False) if data else None
+        return (*values, extra)
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        record = {k: row[k] for k in COLUMNS}
+        if row["extra_json"]:
+            try:
+                extra = json.loads(row["extra_json"])
+                record = {**extra, **record}
+            except ValueError:
+                pass
+        return record
+
+    def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """写入一条记录，返回实际存储的内容（补全 id / applied_at）；id 已存在时抛 DuplicateRecordError"""
+        params = self._to_params(record)
+        cur = self._conn().execute(_INSERT_SQL, params)
+        if cur.rowcount == 0:
+            raise DuplicateRecordError(f"记录 ID 已存在: {params[0]}")
+        return self.get(params[0]) or {}
+
+    def insert_many(self, records: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+        """批量写入（每 batch_size 条一个事务），已存在的 id 跳过，返回写入条数"""
+        conn = self._conn()
+        inserted = 0
+        batch: List[Tuple] = []
+
+        def flush():
+            nonlocal inserted
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # total_changes 会把 FTS / 统计触发器写的行也算进去，只看本语句的 rowcount
+                inserted += conn.executemany(_INSERT_SQL, batch).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            batch.clear()
+
+        for record in records:
+            batch.append(self._to_params(record))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        return inserted
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM application_records WHERE id = ?", (record_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def update_status(self, record_id: str, status: str) -> bool:
+        cur = self._conn().execute(
+            "UPDATE application_records SET status = ?, updated_at = ? WHERE id = ?",
+            (status, datetime.now().isoformat(timespec="seconds"), record_id),
+        )
+        return cur.rowcount > 0
+
+    def delete(self, record_id: str) -> bool:
+        cur = self._conn().execute("DELETE FROM application_records WHERE id = ?", (record_id,))
+        return cur.rowcount > 0
+
+    @staticmethod
+    def encode_cursor(record: Dict[str, Any]) -> str:
+        """游标 = 上一页最后一条的 (applied_at, id)"""
+        raw = json.dumps([record["applied_at"], record["id"]], ensure_ascii=False)
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, str]:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            applied_at, record_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            return str(applied_at), str(record_id)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"无效的分页游标: {cursor}") from e
+
+    def _where(
+        self,
+        status: Optional[str],
+        company: Optional[str],
+        date_from: Optional[str],
+        date_to: Optional[str],
+        q: Optional[str],
+    ) -> Tuple[List[str], List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if status:
+            clauses.append("r.status = ?")
+            params.append(status)
+        if company:
+            clauses.append("r.company = ?")
+            params.append(company)
+        if date_from:
+            clauses.append("r.applied_at >= ?")
+            params.append(normalize_time(date_from))
+        if date_to:
+            # 只给日期时包含当天全天
+            date_to = normalize_time(date_to)
+            clauses.append("r.applied_at <= ?" if len(date_to) > 10 else "r.applied_at < ?")
+            params.append(date_to if len(date_to) > 10 else f"{date_to}T99")
+        q = (q or "").strip()
+        if q:
+            if self.fts_enabled and len(q) >= 3:
+                # trigram 要求至少 3 个字符；整体加引号按子串匹配
+                clauses.append("r.rowid IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)")
+                params.append('"' + q.replace('"', '""') + '"')
+            else:
+                escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                clauses.append("r.job_title LIKE ? ESCAPE '\\'")
+                params.append(f"%{escaped}%")
+        return clauses, params
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        company: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        q: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+        with_total: bool = True,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int], Optional[str]]:
+        """
+        按投递时间倒序查询，返回 (记录, 总数, 下一页游标)
+
+        传 cursor 时按 (applied_at, id) 做 keyset 分页，翻到多深都只扫一页的索引，
+        且不受新插入记录影响；offset 仅为兼容保留。with_total=False 时跳过 COUNT。
+        """
+        conn = self._conn()
+        clauses, params = self._where(status, company, date_from, date_to, q)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        total = None
+        if with_total:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM application_records r{where}", params
+            ).fetchone()[0]
+
+        page_clauses, page_params = list(clauses), list(params)
+        if cursor:
+            page_clauses.append("(r.applied_at, r.id) < (?, ?)")
+            page_params.extend(self.decode_cursor(cursor))
+            offset = 0
+        page_where = f" WHERE {' AND '.join(page_clauses)}" if page_clauses else ""
+
+        rows = conn.execute(
+            f"SELECT r.* FROM application_records r{page_where} "
+            f"ORDER BY r.applied_at DESC, r.id DESC LIMIT ? OFFSET ?",
+            (*page_params, limit, offset),
+        ).fetchall()
+        records = [self._to_dict(r) for r in rows]
+
+        next_cursor = None
+        if limit > 0 and len(records) == limit:
+            next_cursor = self.encode_cursor(records[-1])
+        return records, total, next_cursor
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """按投递时间倒序分页，返回 (记录, 总数)"""
+        records, total, _ = self.query(status=status, limit=limit, offset=offset)
+        return records, total
+
+    def rebuild_stats(self) -> Dict[str, int]:
+        """从记录表重新计算全部统计（统计数据损坏或手工改库后使用）"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM record_stats")
+            for name, expr in STAT_DIMENSIONS.items():
+                conn.execute(
+                    f"INSERT INTO record_stats(dimension, bucket, count) "
+                    f"SELECT '{name}', {expr.format(row='r')}, COUNT(*) FROM application_records r GROUP BY 2"
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self._dimension("status")
+
+    def _dimension(self, dimension: str) -> Dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT bucket, count FROM record_stats WHERE dimension = ? AND count > 0",
+            (dimension,),
+        ).fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    def count_by_status(self) -> Dict[str, int]:
+        return self._dimension("status")
+
+    def stats(self) -> Dict[str, Any]:
+        """总数、按状态、按平台的计数（读物化统计，与记录数无关）"""
+        return {
+            "total": self._dimension("total").get("", 0),
+            "by_status": self._dimension("status"),
+            "by_platform": self._dimension("platform"),
+        }
+
+    def daily_series(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按天的投递数（含各状态），date_from / date_to 为 YYYY-MM-DD，闭区间"""
+        clauses = ["dimension = 'day_status'", "count > 0"]
+        params: List[Any] = []
+        if date_from:
+            clauses.append("bucket >= ?")
+            params.append(date_from[:10])
+        if date_to:
+            clauses.append("bucket < ?")
+            params.append(f"{date_to[:10]}|\uffff")
+        rows = self._conn().execute(
+            f"SELECT bucket, count FROM record_stats WHERE {' AND '.join(clauses)} ORDER BY bucket",
+            params,
+        ).fetchall()
+
+        series: Dict[str, Dict[str, Any]] = {}
+        for bucket, count in rows:
+            day, _, status = bucket.partition("|")
+            point = series.setdefault(day, {"date": day, "total": 0, "by_status": {}})
+            point["total"] += count
+            point["by_status"][status] = count
+        return list(series.values())
+
+    def migrate_json(self, path: str) -> int:
+        """把旧 JSON 文件导入一次（按文件路径记录，重复调用不会重复导入）"""
+        conn = self._conn()
+        name = f"json:{os.path.normpath(path)}"
+        if conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+            return 0
+        if not os.path.exists(path):
+            return 0
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取旧记录文件失败 {path}: {e}")
+            return 0
+
+        count = self.insert_many(r for r in records if isinstance(r, dict))
+        conn.execute(
+            "INSERT OR REPLACE INTO migrations(name, applied_at) VALUES(?, ?)",
+            (name, datetime.now().isoformat(timespec="seconds")),
+        )
+        logger.info(f"已从 {path} 导入 {count} 条投递记录")
+        return count
+
+
+@lazy_singleton
+def get_record_store() -> RecordStore:
+    """获取全局记录存储（首次调用时导入旧 JSON 文件）"""
+    store = RecordStore()
+    for path in LEGACY_FILES:
+        store.migrate_json(path)
+    return store
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python -m data.record_store rebuild-stats
+    if sys.argv[1:] == ["rebuild-stats"]:
+        print(RecordStore().rebuild_stats())
+    else:
+        print("用法: python -m data.record_store rebuild-stats")
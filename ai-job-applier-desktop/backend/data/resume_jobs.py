@@ -0,0 +1,163 @@
+"""
+简历后台处理 - 上传后立即返回，文本提取和信息抽取放到进程池里
+
+PDF / Word 解析和正则抽取都是 CPU 密集的纯 Python 代码，放在事件循环里会让其他接口一起卡住；
+放进线程池也受 GIL 限制，所以交给独立进程。任务状态可以轮询，也可以通过 WebSocket 订阅。
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from data.resume_store import USE_PROCESS_POOL, ResumeStore, extract_text, file_sha256, get_resume_store
+
+logger = logging.getLogger(__name__)
+
+# 内存里保留的最近任务数
+MAX_JOBS = 500
+
+def _process_resume(path: str, text: Optional[str] = None) -> Dict[str, Any]:
+    """在工作进程里运行：提取文本（已有缓存文本时跳过，extract_text 已做规范化）→ 抽取关键信息"""
+    from ai.resume_analyzer import ResumeAnalyzer
+
+    pages = None
+    if text is None:
+        text, pages = extract_text(path, parallel=False)
+    return {"text": text, "pages": pages, "info": ResumeAnalyzer().extract_info(text)}
+
+
+class ResumeJobManager:
+    """
+    简历处理任务
+
+    状态：queued → processing → done / failed
+    """
+
+    def __init__(self, store: Optional[ResumeStore] = None, max_workers: Optional[int] = None):
+        self.store = store or get_resume_store()
+        self.max_workers = max_workers or int(os.getenv("RESUME_WORKERS", "2") or 2)
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pool: Optional[Executor] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if USE_PROCESS_POOL:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                # 打包的 exe 里退回线程池（见 resume_store.USE_PROCESS_POOL）
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="resume")
+        return self._pool
+
+    def submit(self, filename: str) -> Dict[str, Any]:
+        """登记任务并在后台开始处理（需要在事件循环里调用）"""
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "filename": filename,
+            "status": "queued",
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        self.jobs[job_id] = job
+        while len(self.jobs) > MAX_JOBS:
+            self.jobs.popitem(last=False)
+
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._notify(job)
+        return dict(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        filename = job["filename"]
+        path = self.store.file_path(filename)
+        job["status"] = "processing"
+        self._notify(job)
+
+        try:
+            # 同内容的文件提取过就只做信息抽取
+            digest = await asyncio.to_thread(file_sha256, path)
+            cached = await asyncio.to_thread(self.store.text_by_digest, digest)
+
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_pool(), _process_resume, path, cached)
+
+            meta = await asyncio.to_thread(
+                self.store.ingest, filename, result["text"], result["pages"], result["info"]
+            )
+            job["result"] = {
+                **meta,
+                "text_preview": result["text"][:200],
+            }
+            job["status"] = "done"
+            logger.info(f"简历处理完成: {filename}")
+        except Exception as e:
+            logger.error(f"简历处理失败 {filename}: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = datetime.now().isoformat()
+            self._notify(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """等待任务结束（兼容需要同步拿到结果的调用方）"""
+        queue = self.subscribe()
+        try:
+            async def _wait():
+                while True:
+                    job = self.jobs.get(job_id)
+                    if job is None or job["status"] in ("done", "failed"):
+                        return self.get(job_id)
+                    await queue.get()
+
+            return await asyncio.wait_for(_wait(), timeout)
+        finally:
+            self.unsubscribe(queue)
+
+    def subscribe(self) -> asyncio.Queue:
+        """订阅所有任务的状态变化"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def _notify(self, job: Dict[str, Any]) -> None:
+        snapshot = dict(job)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(snapshot)
+            except asyncio.QueueFull:
+                # 消费太慢的订阅者丢弃最旧的一条
+                queue.get_nowait()
+                queue.put_nowait(snapshot)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_manager: Optional[ResumeJobManager] = None
+
+
+def get_resume_jobs() -> ResumeJobManager:
+    """获取全局任务管理器（只在事件循环线程里使用，不需要加锁）"""
+    global _manager
+    if _manager is None:
+        _manager = ResumeJobManager()
+    return _manager
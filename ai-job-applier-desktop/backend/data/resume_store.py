@@ -0,0 +1,269 @@
+"""
+简历文本存储 - 上传时提取一次，之后直接读取
+
+- 提取出的文本按文件 SHA-256 存成旁路文件（.index/<sha256>.txt），同内容的文件只提取一次；
+  文本在 extract_text 里统一规范化，上传任务和按需提取两条路径写出的内容一致
+- 元数据索引（.index/index.json）记录 文件名 → 哈希 / 大小 / 修改时间 / 页数，
+  列表接口直接读索引，不再逐个 stat
+- 文件大小或修改时间变化时才重新提取
+- 页数较多的 PDF 按页分段交给多个进程并行提取
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from data.sqlite_util import lazy_singleton
+
+logger = logging.getLogger(__name__)
+
+RESUME_DIR = "data/resumes"
+RESUME_EXTENSIONS = ('.pdf', '.doc', '.docx')
+
+# 页数达到这个值才并行提取（进程启动有开销，小文件串行更快）
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "30") or 30)
+
+# PyInstaller 打包的 exe 里，spawn 出的子进程会重新执行整个 exe；main.py 已调用
+# multiprocessing.freeze_support()，但打包版本没有验证过多进程，默认退回线程池
+# （RESUME_PROCESS_POOL=1 强制使用进程池）
+USE_PROCESS_POOL = (
+    os.getenv("RESUME_PROCESS_POOL", "").strip().lower() in ("1", "true", "yes", "on")
+    or not getattr(sys, "frozen", False)
+)
+
+_TRAILING_SPACES = re.compile(r"[ \t　]+\n")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> List[str]:
+    """提取 [start, end) 页的文本（在子进程里运行，需要是模块级函数）"""
+    import PyPDF2
+
+    with open(path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def extract_pdf_text(path: str, max_workers: Optional[int] = None, parallel: bool = True) -> Tuple[str, int]:
+    """从 PDF 提取文本，返回 (文本, 页数)；parallel=False 时不再另起进程（已经在工作进程里时使用）"""
+    import PyPDF2
+
+    with open(path, 'rb') as f:
+        page_count = len(PyPDF2.PdfReader(f).pages)
+
+    if not parallel or not USE_PROCESS_POOL or page_count < PDF_PARALLEL_MIN_PAGES:
+        pages = _extract_pdf_pages(path, 0, page_count)
+    else:
+        workers = max_workers or min(os.cpu_count() or 2, 8)
+        step = -(-page_count // workers)
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            parts = pool.map(_extract_pdf_pages, [path] * len(ranges), *zip(*ranges))
+            pages = [page for part in parts for page in part]
+
+    return "\n".join(pages), page_count
+
+
+def extract_docx_text(path: str) -> str:
+    """从 Word 提取文本"""
+    from docx import Document
+
+    doc = Document(path)
+    return "\n".join(para.text for para in doc.paragraphs)
+
+
+def normalize_resume_text(text: str) -> str:
+    """全角转半角、去掉行尾空白、合并多余空行（保留换行，ResumeAnalyzer 按行匹配）"""
+    text = unicodedata.normalize("NFKC", text or "").replace("\r\n", "\n").replace("\r", "\n")
+    text = _TRAILING_SPACES.sub("\n", text)
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def extract_text(path: str, parallel: bool = True) -> Tuple[str, int]:
+    """按扩展名提取并规范化文本，返回 (文本, 页数)；Word 文档页数记为 0"""
+    if path.lower().endswith('.pdf'):
+        text, pages = extract_pdf_text(path, parallel=parallel)
+    else:
+        text, pages = extract_docx_text(path), 0
+    return normalize_resume_text(text), pages
+
+
+class ResumeStore:
+    """简历文本和元数据索引"""
+
+    def __init__(self, resume_dir: str = RESUME_DIR):
+        self.resume_dir = resume_dir
+        self.index_dir = os.path.join(resume_dir, ".index")
+        self.index_file = os.path.join(self.index_dir, "index.json")
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._index: Dict[str, Dict[str, Any]] = self._load_index()
+        self._scanned = False
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"加载简历索引失败，将重新扫描: {e}")
+            return {}
+
+    def _save_index(self):
+        tmp = f"{self.index_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp, self.index_file)
+
+    def _text_path(self, digest: str) -> str:
+        return os.path.join(self.index_dir, f"{digest}.txt")
+
+    def file_path(self, filename: str) -> str:
+        return os.path.join(self.resume_dir, filename)
+
+    def ingest(
+        self,
+        filename: str,
+        text: Optional[str] = None,
+        pages: Optional[int] = None,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        提取（或复用）文件文本并写入索引，返回元数据
+
+        Args:
+            text / pages: 调用方已经提取好的结果（例如后台任务），传入时不再提取
+            info: ResumeAnalyzer 提取的结构化信息，一并存入索引
+        """
+        path = self.file_path(filename)
+        st = os.stat(path)
+        digest = file_sha256(path)
+        text_path = self._text_path(digest)
+
+        if text is None and not os.path.exists(text_path):
+            text, pages = extract_text(path)
+        if text is not None:
+            with open(text_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        else:
+            # 同内容的文件已经提取过，直接复用
+            with open(text_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+
+        with self._lock:
+            previous = self._index.get(filename, {})
+            if pages is None:
+                same = [m for m in self._index.values() if m.get("sha256") == digest]
+                pages = same[0].get("pages", 0) if same else 0
+            meta = {
+                "filename": filename,
+                "sha256": digest,
+                "size": st.st_size,
+                "mtime": st.st_mtime,
+                "pages": pages,
+                "text_length": len(text),
+                "uploaded_at": previous.get("uploaded_at") or datetime.now().isoformat(),
+            }
+            if info is not None:
+                meta["info"] = info
+            elif previous.get("sha256") == digest and "info" in previous:
+                meta["info"] = previous["info"]
+            old_digest = previous.get("sha256")
+            self._index[filename] = meta
+            self._save_index()
+            if old_digest and old_digest != digest:
+                self._drop_text_if_unused(old_digest)
+        return meta
+
+    def _is_fresh(self, filename: str, meta: Dict[str, Any]) -> bool:
+        try:
+            st = os.stat(self.file_path(filename))
+        except OSError:
+            return False
+        return st.st_size == meta.get("size") and st.st_mtime == meta.get("mtime")
+
+    def get_text(self, filename: str) -> Optional[str]:
+        """读取简历文本；文件变化过或旁路文件丢失时重新提取，文件不存在返回 None"""
+        if not os.path.exists(self.file_path(filename)):
+            return None
+        meta = self._index.get(filename)
+        if meta is None or not self._is_fresh(filename, meta) or not os.path.exists(self._text_path(meta["sha256"])):
+            meta = self.ingest(filename)
+        with open(self._text_path(meta["sha256"]), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def text_by_digest(self, digest: str) -> Optional[str]:
+        """按文件哈希读取已提取的文本（同内容的文件已经提取过时复用）"""
+        try:
+            with open(self._text_path(digest), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def get_meta(self, filename: str) -> Optional[Dict[str, Any]]:
+        return self._index.get(filename)
+
+    def rescan(self) -> None:
+        """同步目录和索引：补录索引外的文件，移除已被删除的文件"""
+        names = {
+            entry.name for entry in os.scandir(self.resume_dir)
+            if entry.is_file() and entry.name.endswith(RESUME_EXTENSIONS)
+        }
+        for filename in list(self._index):
+            if filename not in names:
+                self.remove(filename)
+        for filename in names - set(self._index):
+            try:
+                self.ingest(filename)
+            except Exception as e:
+                logger.error(f"简历提取失败 {filename}: {e}")
+
+    def list(self) -> List[Dict[str, Any]]:
+        """列出简历（读索引；进程启动后第一次调用时扫描一次目录）"""
+        if not self._scanned:
+            with self._lock:
+                if not self._scanned:
+                    self.rescan()
+                    self._scanned = True
+        with self._lock:
+            return [dict(meta) for meta in self._index.values()]
+
+    def remove(self, filename: str) -> None:
+        """从索引移除；没有其他文件引用时一并删除旁路文本"""
+        with self._lock:
+            meta = self._index.pop(filename, None)
+            if meta is None:
+                return
+            self._save_index()
+            self._drop_text_if_unused(meta["sha256"])
+
+    def _drop_text_if_unused(self, digest: str) -> None:
+        if any(m.get("sha256") == digest for m in self._index.values()):
+            return
+        try:
+            os.remove(self._text_path(digest))
+        except OSError:
+            pass
+
+
+@lazy_singleton
+def get_resume_store() -> ResumeStore:
+    """获取全局简历存储"""
+    return ResumeStore()
@@ -0,0 +1,301 @@
+"""
+岗位搜索结果缓存 - 查询规范化 + stale-while-revalidate
+
+- 查询规范化：关键词按分隔符拆分（短语内部的空格保留）、小写、同义词归一、去重排序；
+  城市别名归一（"北京市"/"bj" → "北京"）。写法不同但含义相同的搜索共用一条缓存。
+  规范化只用于缓存键，请求数据源时仍使用用户原始的查询
+- 软过期（JOB_SEARCH_CACHE_SOFT_TTL_S）之内直接返回；超过软过期、未到硬过期
+  （JOB_SEARCH_CACHE_HARD_TTL_S）时先返回旧结果，同时在后台刷新
+- 同一查询并发未命中只请求一次数据源（CacheEngine.get_or_compute）
+- 有数据源超时或报错时结果不完整：照常返回，但缓存条目一写入就是软过期，
+  下次命中会在后台重新请求；后台刷新拿到的不完整结果不覆盖旧条目
+- 按数据源统计命中缓存省下的 API 调用次数
+"""
+
+import asyncio
+import dataclasses
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from ai.cache import get_cache
+from data.job_providers.base import JobSearchParams
+from data.sqlite_util import lazy_singleton
+
+logger = logging.getLogger(__name__)
+
+# 同义词 → 规范写法（只用于缓存键）。只收录同一事物的不同写法，
+# 不做扩大/缩小检索范围的改写（如 "算法" 与 "算法工程师" 不算同义）
+KEYWORD_SYNONYMS = {
+    "golang": "go",
+    "js": "javascript",
+    "ts": "typescript",
+    "k8s": "kubernetes",
+    "reactjs": "react",
+    "react.js": "react",
+    "vuejs": "vue",
+    "vue.js": "vue",
+    "nodejs": "node.js",
+}
+
+# 城市别名 → 规范名称；"全国"/"不限" 视为不限地点
+LOCATION_ALIASES = {
+    "bj": "北京", "beijing": "北京", "帝都": "北京",
+    "sh": "上海", "shanghai": "上海", "魔都": "上海",
+    "sz": "深圳", "shenzhen": "深圳",
+    "gz": "广州", "guangzhou": "广州",
+    "hz": "杭州", "hangzhou": "杭州",
+    "cd": "成都", "chengdu": "成都",
+    "全国": "", "不限": "", "any": "",
+}
+
+# 关键词之间的分隔符；空格不算，"Spring Boot" 是一个关键词
+_SPLIT = re.compile(r"[,，、/;；]+")
+_SPACES = re.compile(r"\s+")
+
+# (原始搜索参数, 进度回调) → (岗位列表, 实际请求的数据源, 是否所有数据源都成功返回)
+FetchResult = Tuple[List[Dict[str, Any]], List[str], bool]
+Fetch = Callable[[JobSearchParams, Optional[Callable]], FetchResult]
+AsyncFetch = Callable[[JobSearchParams, Optional[Callable]], Awaitable[FetchResult]]
+
+
+def _norm(text: Optional[str]) -> str:
+    return unicodedata.normalize("NFKC", text or "").strip().lower()
+
+
+def normalize_keywords(keywords: Optional[List[str]]) -> List[str]:
+    """按分隔符拆分、小写、合并多余空格、同义词归一、去重并排序"""
+    tokens = set()
+    for keyword in keywords or []:
+        for token in _SPLIT.split(_norm(keyword)):
+            token = _SPACES.sub(" ", token).strip()
+            if token:
+                tokens.add(KEYWORD_SYNONYMS.get(token, token))
+    return sorted(tokens)
+
+
+def normalize_location(location: Optional[str]) -> Optional[str]:
+    text = _norm(location).replace(" ", "")
+    text = LOCATION_ALIASES.get(text, text)
+    if len(text) > 2 and text.endswith("市"):
+        text = text[:-1]
+    return text or None
+
+
+def normalize_params(params: JobSearchParams) -> JobSearchParams:
+    """返回规范化后的搜索参数（不修改原对象），用于生成缓存键"""
+    experience = _norm(params.experience).replace(" ", "")
+    return JobSearchParams(
+        keywords=normalize_keywords(params.keywords),
+        location=normalize_location(params.location),
+        salary_min=int(params.salary_min) if params.salary_min else None,
+        experience=experience or None,
+        limit=int(params.limit or 50),
+    )
+
+
+def cache_key(params: JobSearchParams, source: str) -> str:
+    """缓存键：数据源配置 + 规范化参数（不含 limit，数量不够时按未命中处理）"""
+    return "|".join([
+        source,
+        ",".join(params.keywords),
+        params.location or "",
+        str(params.salary_min or ""),
+        params.experience or "",
+    ])
+
+
+class SearchCache:
+    """
+    搜索结果缓存
+
+    缓存值：{"jobs", "fetched_at", "limit", "providers", "complete"}；providers 是这次请求实际调用的数据源，
+    之后每次命中都按它们记一次"省下的调用"。complete=False 的条目 fetched_at 记为 0（已软过期）。
+    """
+
+    def __init__(
+        self,
+        soft_ttl_s: Optional[int] = None,
+        hard_ttl_s: Optional[int] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.soft_ttl_s = float(soft_ttl_s or os.getenv("JOB_SEARCH_CACHE_SOFT_TTL_S", "") or 600)
+        self.hard_ttl_s = int(hard_ttl_s or os.getenv("JOB_SEARCH_CACHE_HARD_TTL_S", "") or 6 * 3600)
+        self.engine = get_cache(
+            "job_search",
+            max_entries=int(max_entries or os.getenv("JOB_SEARCH_CACHE_MAX_ENTRIES", "") or 2000),
+        )
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+        self._refresh_pool: Optional[ThreadPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._saved: Counter = Counter()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    @staticmethod
+    def _prepare(params: JobSearchParams, source: str) -> Tuple[str, JobSearchParams]:
+        """(缓存键, 请求数据源用的参数)：键用规范化参数，请求仍用原始关键词和地点，只统一 limit"""
+        normalized = normalize_params(params)
+        return cache_key(normalized, source), dataclasses.replace(
+            params, keywords=list(params.keywords or []), limit=normalized.limit
+        )
+
+    def _entry(self, jobs: List[Dict[str, Any]], providers: List[str], limit: int, complete: bool) -> Dict[str, Any]:
+        return {
+            "jobs": jobs,
+            "fetched_at": time.time() if complete else 0.0,
+            "limit": limit,
+            "providers": list(providers),
+            "complete": complete,
+        }
+
+    @staticmethod
+    def _covers(entry: Dict[str, Any], limit: int) -> bool:
+        # 缓存时请求的数量不少于这次，或者当时就没取满（数据源总共只有这么多）；
+        # 不完整的结果没取满不代表数据源只有这么多
+        if entry["limit"] >= limit:
+            return True
+        return entry.get("complete", True) and len(entry["jobs"]) < entry["limit"]
+
+    def _serve(self, key: str, entry: Dict[str, Any], params: JobSearchParams) -> Tuple[List[Dict[str, Any]], bool]:
+        """记录命中统计，返回 (岗位副本, 是否需要后台刷新)"""
+        stale = time.time() - entry["fetched_at"] > self.soft_ttl_s
+        with self._lock:
+            self._stats["stale_hits" if stale else "hits"] += 1
+            self._saved.update(entry["providers"])
+            refresh = stale and key not in self._refreshing
+            if refresh:
+                self._refreshing.add(key)
+        return [dict(job) for job in entry["jobs"][: params.limit]], refresh
+
+    def _store(self, key: str, result: FetchResult, limit: int) -> None:
+        """后台刷新的结果写回；不完整时保留旧条目（仍是软过期，下次命中再刷新）"""
+        jobs, providers, complete = result
+        if not complete:
+            raise RuntimeError("部分数据源超时或出错，结果不完整")
+        self.engine.set(key, self._entry(jobs, providers, limit, complete), self.hard_ttl_s)
+
+    def _refresh_done(self, key: str, error: Optional[BaseException]) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+            self._stats["refresh_errors" if error else "refreshes"] += 1
+        if error:
+            logger.warning(f"后台刷新搜索缓存失败 [{key}]: {error}")
+
+    def get_or_fetch(
+        self,
+        params: JobSearchParams,
+        source: str,
+        fetch: Fetch,
+        progress_callback: Optional[Callable] = None,
+    ) -> List[Dict[str, Any]]:
+        """同步读取；未命中时用原始参数调用 fetch，软过期时返回旧结果并在后台线程刷新"""
+        key, params = self._prepare(params, source)
+
+        entry = self.engine.get(key)
+        if entry is not None and self._covers(entry, params.limit):
+            jobs, refresh = self._serve(key, entry, params)
+            if refresh:
+                self._submit_refresh(key, params, fetch)
+            return jobs
+
+        with self._lock:
+            self._stats["misses"] += 1
+
+        def compute() -> Dict[str, Any]:
+            jobs, providers, complete = fetch(params, progress_callback)
+            return self._entry(jobs, providers, params.limit, complete)
+
+        if entry is None:
+            entry = self.engine.get_or_compute(key, compute, self.hard_ttl_s)
+        else:
+            # 已缓存但数量不够：直接重新请求并覆盖
+            entry = compute()
+            self.engine.set(key, entry, self.hard_ttl_s)
+        return [dict(job) for job in entry["jobs"][: params.limit]]
+
+    def _submit_refresh(self, key: str, params: JobSearchParams, fetch: Fetch) -> None:
+        if self._refresh_pool is None:
+            with self._lock:
+                if self._refresh_pool is None:
+                    self._refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search-refresh")
+
+        def run():
+            try:
+                self._store(key, fetch(params, None), params.limit)
+            except Exception as e:
+                self._refresh_done(key, e)
+            else:
+                self._refresh_done(key, None)
+
+        self._refresh_pool.submit(run)
+
+    async def aget_or_fetch(
+        self,
+        params: JobSearchParams,
+        source: str,
+        fetch: AsyncFetch,
+        progress_callback: Optional[Callable] = None,
+    ) -> List[Dict[str, Any]]:
+        """异步读取；软过期时返回旧结果，并在当前事件循环里起一个刷新任务"""
+        key, params = self._prepare(params, source)
+
+        entry = self.engine.get(key)
+        if entry is not None and self._covers(entry, params.limit):
+            jobs, refresh = self._serve(key, entry, params)
+            if refresh:
+                # 事件循环只弱引用任务，这里保留引用，避免刷新中途被回收、键一直留在 _refreshing 里
+                task = asyncio.create_task(self._arefresh(key, params, fetch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return jobs
+
+        with self._lock:
+            self._stats["misses"] += 1
+
+        async def compute() -> Dict[str, Any]:
+            jobs, providers, complete = await fetch(params, progress_callback)
+            return self._entry(jobs, providers, params.limit, complete)
+
+        if entry is None:
+            entry = await self.engine.get_or_compute_async(key, compute, self.hard_ttl_s)
+        else:
+            entry = await compute()
+            self.engine.set(key, entry, self.hard_ttl_s)
+        return [dict(job) for job in entry["jobs"][: params.limit]]
+
+    async def _arefresh(self, key: str, params: JobSearchParams, fetch: AsyncFetch) -> None:
+        try:
+            self._store(key, await fetch(params, None), params.limit)
+        except asyncio.CancelledError as e:
+            # 事件循环关闭时被取消：同样要把键移出 _refreshing
+            self._refresh_done(key, e)
+            raise
+        except Exception as e:
+            self._refresh_done(key, e)
+        else:
+            self._refresh_done(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """命中情况和各数据源省下的调用次数"""
+        with self._lock:
+            return {
+                **self._stats,
+                "refreshing": len(self._refreshing),
+                "quota_saved": dict(self._saved),
+                "soft_ttl_s": self.soft_ttl_s,
+                "hard_ttl_s": self.hard_ttl_s,
+                "engine": self.engine.stats(),
+            }
+
+
+@lazy_singleton
+def get_search_cache() -> SearchCache:
+    """获取全局搜索结果缓存"""
+    return SearchCache()
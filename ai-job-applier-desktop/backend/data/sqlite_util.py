@@ -0,0 +1,56 @@
+"""
+SQLite 公用工具 - 各存储模块共用
+
+- ThreadLocalConnections：每个线程复用一个 WAL 模式的连接
+- lazy_singleton：模块级单例的 get_xxx()，首次调用时创建（双重检查加锁）
+"""
+
+import functools
+import sqlite3
+import threading
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class ThreadLocalConnections:
+    """
+    每个线程一个连接：调用实例即返回当前线程的连接，首次调用时创建
+
+    默认 isolation_level=None（自动提交，事务用 BEGIN IMMEDIATE / COMMIT 显式控制），
+    journal_mode=WAL + synchronous=NORMAL；其余参数原样传给 sqlite3.connect。
+    """
+
+    def __init__(self, db_path: str, row_factory: Optional[Callable] = None, **connect_kwargs: Any):
+        self.db_path = db_path
+        self.row_factory = row_factory
+        self.connect_kwargs = {"timeout": 10, "check_same_thread": False, "isolation_level": None, **connect_kwargs}
+        self._local = threading.local()
+
+    def __call__(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, **self.connect_kwargs)
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+def lazy_singleton(factory: Callable[[], T]) -> Callable[[], T]:
+    """把无参工厂函数变成单例 getter：只在第一次调用时执行，之后返回同一个对象"""
+    instance: Optional[T] = None
+    lock = threading.Lock()
+
+    @functools.wraps(factory)
+    def get() -> T:
+        nonlocal instance
+        if instance is None:
+            with lock:
+                if instance is None:
+                    instance = factory()
+        return instance
+
+    return get
@@ -1,8 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import argparse
 import logging
+import multiprocessing
 from dotenv import load_dotenv
 
 # 导入所有 API 路由
@@ -18,6 +19,11 @@ from api import (
     feishu
 )
 
+from ai.cache import get_all_stats
+from ai.llm_client import get_llm_cache_stats, get_llm_key_stats
+from ai.llm_metrics import llm_metrics
+from ai.performance import PerformanceMiddleware, monitor
+
 # 加载环境变量
 load_dotenv()
 
@@ -42,6 +48,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 性能监控：统计每个路由的延迟分布和并发数
+app.add_middleware(PerformanceMiddleware)
+
 # 注册所有路由
 app.include_router(auth.router)
 app.include_router(jobs.router)
@@ -53,6 +62,14 @@ app.include_router(openclaw.router)
 app.include_router(smart_apply.router)
 app.include_router(feishu.router)
 
+@app.on_event("shutdown")
+async def shutdown_workers():
+    """关闭简历解析进程池和岗位数据源的连接池"""
+    from data.resume_jobs import get_resume_jobs
+    from data.job_providers.base import aclose_clients
+    get_resume_jobs().shutdown()
+    await aclose_clients()
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -76,6 +93,37 @@ async def health_check():
     """健康检查接口"""
     return {"status": "ok", "message": "Backend is running"}
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """缓存统计（按命名空间）；job_search 含各岗位数据源因命中缓存省下的调用次数（quota_saved）"""
+    from data.search_cache import get_search_cache
+    return {
+        "namespaces": get_all_stats(),
+        "llm_response_cache": get_llm_cache_stats(),
+        "job_search": get_search_cache().stats(),
+    }
+
+@app.get("/api/performance")
+async def performance_stats():
+    """性能统计（各路由 / 函数的 p50/p90/p99、1m/5m/1h 窗口、并发数）"""
+    return monitor.get_stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 指标（LLM 调用的 token、耗时、首 token 时间、重试）"""
+    body, content_type = llm_metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/api/llm/usage")
+async def llm_usage():
+    """LLM 用量摘要（按 角色/流水线 聚合）"""
+    return llm_metrics.summary()
+
+@app.get("/api/llm/keys")
+async def llm_key_stats():
+    """LLM Key 池饱和度（RPM/TPM 占用、冷却剩余时间、429 次数）"""
+    return get_llm_key_stats()
+
 @app.get("/api/features")
 async def get_features():
     """获取功能列表"""
@@ -91,6 +139,9 @@ async def get_features():
     }
 
 if __name__ == "__main__":
+    # 打包成 exe 后，进程池的子进程会重新执行这个入口；必须最先调用，让子进程只做 worker
+    multiprocessing.freeze_support()
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--port", type=int, default=8765)
     args = parser.parse_args()
@@ -87,9 +87,17 @@ async def test_job_filter():
     print("测试 3: 投递去重器")
     print("=" * 50)
 
-    from automation.job_filter import JobFilter
-
-    job_filter = JobFilter()
+    import os
+    import shutil
+    import tempfile
+    from automation.job_filter import BlacklistManager, DeduplicateManager, JobFilter
+
+    # 用临时目录，不碰用户真实的投递记录和黑名单
+    tmp_dir = tempfile.mkdtemp(prefix="job_filter_test_")
+    job_filter = JobFilter(
+        dedup_manager=DeduplicateManager(os.path.join(tmp_dir, "applied_jobs.db")),
+        blacklist_manager=BlacklistManager(os.path.join(tmp_dir, "blacklist.json")),
+    )
 
     # 添加黑名单
     job_filter.blacklist_manager.add_company("测试外包公司", "外包")
@@ -128,6 +136,11 @@ async def test_job_filter():
     print(f"  黑名单公司: {stats['blacklisted_companies']}")
     print(f"  黑名单关键词: {stats['blacklisted_keywords']}")
 
+    # 清理（临时库里只有刚才标记的记录，days=0 全部清掉）
+    job_filter.dedup_manager.clear_old_records(days=0)
+    print(f"清理后已投递数: {job_filter.dedup_manager.get_applied_count()}（应该为0）")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
 
 async def test_human_simulator():
     """测试人类行为模拟"""
@@ -181,6 +194,402 @@ async def test_checkpoint():
     print("✅ 断点已删除")
 
 
+async def test_keyword_matcher():
+    """测试黑名单匹配器"""
+    print("\n" + "=" * 50)
+    print("测试 6: 黑名单匹配器")
+    print("=" * 50)
+
+    from automation.keyword_matcher import BlacklistMatcher, KeywordMatcher
+
+    matcher = KeywordMatcher(["he", "she", "his", "hers", "９９６"])
+    print(f"✅ 命中关键词: {matcher.find_all('ushers 996')}")
+
+    blacklist = BlacklistMatcher(
+        companies=["外包公司", "某科技"],
+        keywords=[f"关键词{i}" for i in range(5000)] + ["996"],
+    )
+    jobs = [
+        {'company': '某科技有限公司', 'job_title': 'Python开发'},
+        {'company': 'A公司', 'job_title': 'Go开发', 'description': '996工作制'},
+        {'company': 'B公司', 'job_title': 'Rust开发', 'description': '双休'},
+    ]
+    for job in jobs:
+        hit = blacklist.match(job)
+        print(f"  {job['company']} - {job['job_title']}: {hit.reason if hit else '通过'}")
+
+
+async def test_llm_completion():
+    """测试 LLM 调用（模拟客户端）：Key 池额度按实际用量修正，计量写入 llm_metrics"""
+    print("\n" + "=" * 50)
+    print("测试 7: LLM 调用计量")
+    print("=" * 50)
+
+    import os
+    from types import SimpleNamespace
+    from unittest import mock
+
+    from ai import llm_client
+    from ai.llm_metrics import llm_metrics, metric_labels
+
+    usage = SimpleNamespace(prompt_tokens=120, completion_tokens=30, prompt_cache_hit_tokens=100)
+    response = SimpleNamespace(usage=usage, choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+    raw = SimpleNamespace(headers={}, parse=lambda: response)
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        with_raw_response=SimpleNamespace(create=lambda **kwargs: raw)
+    )))
+
+    with mock.patch.dict(os.environ, {"DEEPSEEK_API_KEYS": "sk-test-llm-metrics"}), \
+            mock.patch.object(llm_client, "_pooled_sync_client", lambda settings: fake_client):
+        with metric_labels(role="test", pipeline="test_optimizations"):
+            result = llm_client.create_chat_completion(
+                model="deepseek-chat",
+                messages=[{"role": "user", "content": "你好"}],
+                max_tokens=500,
+            )
+        key_stats = llm_client.get_key_pool().stats()["keys"][0]
+
+    assert result is response
+    assert key_stats["inflight"] == 0, key_stats
+    assert key_stats["tokens_used"] == 150, key_stats
+
+    # 调用被取消（如 wait_for 超时）时也要归还 Key 的并发数和预占额度
+    async def slow_create(**kwargs):
+        await asyncio.sleep(10)
+
+    slow_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        with_raw_response=SimpleNamespace(create=slow_create)
+    )))
+    with mock.patch.dict(os.environ, {"DEEPSEEK_API_KEYS": "sk-test-llm-cancel"}), \
+            mock.patch.object(llm_client, "_pooled_async_client", lambda settings: slow_client):
+        try:
+            await asyncio.wait_for(llm_client.acreate_chat_completion(
+                model="deepseek-chat",
+                messages=[{"role": "user", "content": "你好"}],
+                max_tokens=500,
+            ), timeout=0.05)
+            raise AssertionError("应该超时")
+        except asyncio.TimeoutError:
+            pass
+        cancelled_stats = llm_client.get_key_pool().stats()["keys"][0]
+    assert cancelled_stats["inflight"] == 0, cancelled_stats
+    assert cancelled_stats["tokens_used"] == 0, cancelled_stats
+    group = next(g for g in llm_metrics.summary()["groups"] if g["pipeline"] == "test_optimizations")
+    assert group["prompt_tokens"] == 120 and group["completion_tokens"] == 30 and group["cached_tokens"] == 100, group
+    print(f"✅ Key 池: {key_stats}")
+    print(f"✅ 计量: {group}")
+
+
+async def test_cache_leader_cancel():
+    """测试缓存合并请求：leader 被取消时，跟随者接任而不是一起失败"""
+    print("\n" + "=" * 50)
+    print("测试 8: 缓存 leader 取消")
+    print("=" * 50)
+
+    from ai.cache import CacheEngine
+
+    cache = CacheEngine(namespace="test_leader_cancel")
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return f"结果#{calls}"
+
+    leader = asyncio.create_task(cache.get_or_compute_async("k", factory))
+    await asyncio.sleep(0.05)
+    followers = [asyncio.create_task(cache.get_or_compute_async("k", factory)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    leader.cancel()
+
+    results = await asyncio.gather(*followers)
+    assert leader.cancelled()
+    assert results == ["结果#2"] * 3, results
+    assert calls == 2, calls
+    print(f"✅ 跟随者结果: {results}（factory 调用 {calls} 次）")
+
+
+async def test_record_store_batch():
+    """测试投递记录批量写入：返回值只算真正插入的行，不含触发器写的 FTS / 统计行"""
+    print("\n" + "=" * 50)
+    print("测试 9: 投递记录批量写入")
+    print("=" * 50)
+
+    import os
+    import shutil
+    import tempfile
+    from data.record_store import DuplicateRecordError, RecordStore
+
+    tmp_dir = tempfile.mkdtemp(prefix="record_store_test_")
+    store = RecordStore(os.path.join(tmp_dir, "records.db"))
+    records = [
+        {"id": f"r{i}", "job_id": f"j{i}", "job_title": "Python开发", "company": "A公司", "status": "success"}
+        for i in range(10)
+    ]
+
+    assert store.insert_many(records, batch_size=4) == 10
+    assert store.insert_many(records) == 0  # id 都已存在
+    assert store.insert_many(records[:3] + [{"id": "r10", "job_id": "j10"}]) == 1
+    assert store.stats()["total"] == 11, store.stats()
+    try:
+        store.insert(records[0])
+        raise AssertionError("重复 id 应该抛 DuplicateRecordError")
+    except DuplicateRecordError:
+        pass
+    print(f"✅ 批量写入计数正确，总数 {store.stats()['total']}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+async def test_search_cache():
+    """测试搜索缓存：命中、limit 覆盖判断、软过期后台刷新、不完整结果不当作新鲜缓存"""
+    print("\n" + "=" * 50)
+    print("测试 10: 搜索结果缓存")
+    print("=" * 50)
+
+    from data.job_providers.base import JobSearchParams
+    from data.search_cache import SearchCache
+
+    cache = SearchCache(soft_ttl_s=0.2, hard_ttl_s=60)
+    calls = []
+    complete = True
+
+    async def fetch(params, progress_callback):
+        calls.append(params)
+        # 数据源总共只有 3 条
+        return [{"id": f"job{i}", "n": len(calls)} for i in range(min(params.limit, 3))], ["mock"], complete
+
+    params = JobSearchParams(keywords=["Golang", "后端"], location="北京市", limit=5)
+    first = await cache.aget_or_fetch(params, "test_swr", fetch)
+    # 同义词 / 城市别名 / 更大的 limit：当时就没取满，不再请求
+    same = await cache.aget_or_fetch(JobSearchParams(keywords=["后端", "go"], location="bj", limit=10), "test_swr", fetch)
+    assert len(calls) == 1 and calls[0].keywords == ["Golang", "后端"], calls
+    assert len(first) == 3 and same == first, (first, same)
+
+    # 软过期：先返回旧结果，后台刷新一次
+    await asyncio.sleep(0.3)
+    stale = await cache.aget_or_fetch(params, "test_swr", fetch)
+    assert stale[0]["n"] == 1, stale
+    await asyncio.gather(*cache._tasks)
+    fresh = await cache.aget_or_fetch(params, "test_swr", fetch)
+    assert len(calls) == 2 and fresh[0]["n"] == 2, (calls, fresh)
+
+    # 有数据源超时：结果照常返回，但条目已软过期，且没取满也不代表数据源只有这么多
+    complete = False
+    partial_params = JobSearchParams(keywords=["rust"], limit=5)
+    partial = await cache.aget_or_fetch(partial_params, "test_swr", fetch)
+    again = await cache.aget_or_fetch(partial_params, "test_swr", fetch)
+    assert len(partial) == 3 and again == partial
+    await asyncio.gather(*cache._tasks)
+    assert len(calls) == 4, calls  # 第二次命中触发了后台刷新
+    await cache.aget_or_fetch(JobSearchParams(keywords=["rust"], limit=10), "test_swr", fetch)
+    assert len(calls) == 5, calls  # 不完整的条目不能覆盖更大的 limit
+
+    stats = cache.stats()
+    assert stats["misses"] == 3 and stats["refreshes"] == 1 and stats["refresh_errors"] == 1, stats
+    print(f"✅ 搜索缓存统计: { {k: stats[k] for k in ('hits', 'stale_hits', 'misses', 'refreshes', 'refresh_errors')} }")
+
+
+async def test_business_rollup():
+    """测试埋点汇总：已关闭的小时/天进汇总表，水位线之后的原始行照常计数，汇总前后指标一致"""
+    print("\n" + "=" * 50)
+    print("测试 11: 埋点汇总")
+    print("=" * 50)
+
+    import json
+    import os
+    import shutil
+    import tempfile
+    from datetime import UTC, datetime, timedelta
+    from data.business_service import BusinessService
+
+    tmp_dir = tempfile.mkdtemp(prefix="business_test_")
+    service = BusinessService(os.path.join(tmp_dir, "app_data.db"), flush_size=1000, retention_days=2)
+    now = datetime.now(UTC)
+
+    def at(**delta):
+        return (now - timedelta(**delta)).isoformat()
+
+    conn = service._conn()
+    conn.executemany(
+        "INSERT INTO events(event_name, payload_json, created_at) VALUES(?, ?, ?)",
+        [
+            ("resume_processed", json.dumps({"ok": True}), at(days=5)),  # 超过保留期，汇总后删掉原始行
+            ("resume_processed", json.dumps({"ok": False}), at(days=5)),
+            ("resume_processed", json.dumps({"ok": True}), at(hours=3)),
+            ("process_quality_gate", json.dumps({"passed": False}), at(hours=3)),
+            ("process_quality_gate", json.dumps({"passed": True}), at(hours=3)),
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO feedback(rating, category, message, created_at) VALUES(?, '', 'ok', ?)",
+        [(5, at(days=10)), (3, at(days=3)), (None, at(days=3)), (4, at(minutes=1))],
+    )
+    conn.commit()
+    # 刚发生的事件：还在宽限期内，不会进汇总表
+    service.track_event("resume_processed", {"ok": True})
+    service.track_event("job_search", {})
+
+    before = service.metrics()
+    summary_before = service.feedback_summary(days=7)
+    marks = service.rollup()
+    after = service.metrics()
+    summary_after = service.feedback_summary(days=7)
+
+    edge = now - timedelta(minutes=5)
+    assert marks["events"] <= edge.strftime("%Y-%m-%dT%H") and marks["events"] > at(hours=3)[:13], marks
+    assert marks["feedback"] == edge.strftime("%Y-%m-%d"), marks
+    hourly = dict(((r[0], r[1]), (r[2], r[3])) for r in conn.execute("SELECT * FROM events_hourly"))
+    assert hourly[(at(days=5)[:13], "resume_processed")] == (2, 1), hourly
+    assert hourly[(at(hours=3)[:13], "process_quality_gate")] == (2, 1), hourly
+    assert all(name != "job_search" for _, name in hourly), hourly  # 开放桶仍在原始表里
+    assert conn.execute("SELECT COUNT(*) FROM events WHERE created_at < ?", (at(days=2),)).fetchone()[0] == 0
+
+    for section in ("funnel", "quality", "feedback"):
+        assert before[section] == after[section], (section, before[section], after[section])
+    assert after["funnel"]["process_runs"] == 4 and after["funnel"]["searches"] == 1, after["funnel"]
+    assert after["quality"]["gate_failures"] == 1, after["quality"]
+    assert summary_before["total"] == summary_after["total"] == 4
+    assert summary_before["last_days_count"] == summary_after["last_days_count"] == 3
+    assert summary_after["avg_rating_last_days"] == 3.5, summary_after
+    # 再汇总一次不会重复计数
+    service.rollup()
+    assert service.metrics()["funnel"] == after["funnel"]
+    print(f"✅ 水位线: {marks}，汇总前后指标一致")
+    service.close()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+async def test_job_detail_store():
+    """测试岗位详情存储：按数据源过期、读盘命中刷新访问时间、超出上限按 LRU 淘汰"""
+    print("\n" + "=" * 50)
+    print("测试 12: 岗位详情存储")
+    print("=" * 50)
+
+    import os
+    import shutil
+    import tempfile
+    import time
+    from unittest import mock
+    from data import job_detail_store
+    from data.job_detail_store import JobDetailStore
+
+    tmp_dir = tempfile.mkdtemp(prefix="job_detail_test_")
+    db_path = os.path.join(tmp_dir, "job_details.db")
+    store = JobDetailStore(db_path, max_entries=3, memory_entries=2)
+
+    with mock.patch.dict(os.environ, {"JOB_DETAIL_TTL_JOOBLE_S": "60"}):
+        assert store.ttl_for("jooble") == 60
+    assert store.ttl_for("bing") == job_detail_store.DEFAULT_TTLS["bing"]
+
+    # 过期：内存层和磁盘都不再返回，读到过期行时顺手删掉
+    store.put({"id": "jooble_old", "title": "旧岗位"}, ttl_s=5)
+    assert store.get("jooble_old")["title"] == "旧岗位"
+    later = time.time() + 10
+    with mock.patch.object(job_detail_store.time, "time", return_value=later):
+        assert store.get("jooble_old") is None
+        assert JobDetailStore(db_path).get("jooble_old") is None
+    assert store.stats()["entries"] == 0
+
+    for job_id in ("bing_a", "bing_b", "bing_c"):
+        store.put({"id": job_id})
+        time.sleep(0.01)
+    assert store.stats()["memory_entries"] == 2  # 内存层有界
+
+    # 新实例没有内存层：读盘命中会刷新 bing_a 的访问时间，最久未访问的变成 bing_b
+    fresh = JobDetailStore(db_path, max_entries=3)
+    assert fresh.get("bing_a") == {"id": "bing_a"}
+    fresh.put({"id": "bing_d"})
+    assert fresh.evict() == 1
+    assert fresh.stats()["entries"] == 3
+    assert JobDetailStore(db_path).get("bing_b") is None
+    assert all(JobDetailStore(db_path).get(j) for j in ("bing_a", "bing_c", "bing_d"))
+    print(f"✅ 岗位详情: {fresh.stats()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+async def test_job_index():
+    """测试本地岗位索引：mmap 加载后的结果与内存构建一致，入选集合与原来的逐条扫描一致"""
+    print("\n" + "=" * 50)
+    print("测试 13: 本地岗位索引")
+    print("=" * 50)
+
+    import random
+    import shutil
+    import tempfile
+    from data.job_index import JobIndex, parse_experience
+
+    rng = random.Random(7)
+    titles = ["Python后端开发", "Java开发工程师", "Go语言工程师", "前端开发", "数据分析师", "算法工程师"]
+    skills = ["Python", "Django", "Java", "Spring", "Go", "Docker", "React", "SQL", "机器学习"]
+    locations = ["北京", "上海", "深圳", "杭州"]
+    experiences = ["应届", "1-3年", "3-5年", "5年以上"]
+    jobs = []
+    for i in range(300):
+        lo = rng.randint(8, 40)
+        jobs.append({
+            "id": f"local_{i}",
+            "title": rng.choice(titles),
+            "company": f"公司{i % 37}",
+            "location": rng.choice(locations),
+            "salary": f"{lo}-{lo + rng.randint(5, 20)}K",
+            "experience": rng.choice(experiences),
+            "requirements": rng.sample(skills, 3),
+        })
+
+    def old_scan(keywords=(), location=None, salary_min=None):
+        """原来的逐条打分（只看入选集合）"""
+        matched = set()
+        for job in jobs:
+            score = 0
+            for keyword in keywords:
+                if keyword.lower() in job["title"].lower():
+                    score += 10
+                score += 5 * sum(keyword.lower() in req.lower() for req in job["requirements"])
+            if location and location in job["location"]:
+                score += 8
+            if salary_min and int(job["salary"].replace("K", "").split("-")[0]) >= salary_min:
+                score += 5
+            if score > 0:
+                matched.add(job["id"])
+        return matched
+
+    built = JobIndex.build(jobs, source="test")
+    tmp_dir = tempfile.mkdtemp(prefix="job_index_test_")
+    built.save(tmp_dir)
+    loaded = JobIndex.load(tmp_dir)
+    try:
+        assert len(loaded) == len(jobs) and loaded.get("local_42") == jobs[42]
+        queries = [
+            {"keywords": ["Python"]},
+            {"keywords": ["Java", "Spring"]},
+            {"keywords": ["开发"], "location": "上海"},
+            {"keywords": ["机器学习"], "salary_min": 30},
+            {"location": "深圳", "salary_min": 25},
+            {"keywords": ["Rust"]},
+        ]
+        for query in queries:
+            everything = loaded.search(limit=len(jobs), **query)
+            assert everything == built.search(limit=len(jobs), **query), query
+            assert {job["id"] for job in everything} == old_scan(**query), query
+            scores = [job["match_score"] for job in everything]
+            assert scores == sorted(scores, reverse=True), query
+            # 小 limit 走提前结束的路径，结果必须是完整排序的前几名
+            assert loaded.search(limit=5, **query) == everything[:5], query
+
+        # 经验按区间重叠匹配："3-5年" 也命中 "1-3年" 和 "5年以上"，不命中应届
+        by_experience = loaded.search(experience="3-5年", limit=len(jobs))
+        assert by_experience and all(
+            parse_experience(job["experience"])[1] >= 3 for job in by_experience
+        )
+        assert {job["experience"] for job in by_experience} == {"1-3年", "3-5年", "5年以上"}
+        assert loaded.search(keywords=["Python"], limit=0) == []
+        print(f"✅ {len(queries)} 个查询与逐条扫描的入选集合一致")
+    finally:
+        loaded.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
 async def main():
     """运行所有测试"""
     print("\n" + "=" * 50)
@@ -193,6 +602,14 @@ async def main():
         await test_job_filter()
         await test_human_simulator()
         await test_checkpoint()
+        await test_keyword_matcher()
+        await test_llm_completion()
+        await test_cache_leader_cancel()
+        await test_record_store_batch()
+        await test_search_cache()
+        await test_business_rollup()
+        await test_job_detail_store()
+        await test_job_index()
 
         print("\n" + "=" * 50)
         print("✅ 所有测试完成！")
@@ -104,6 +104,12 @@ class FounderRouter:
             agent = agent_info["instance"]
             result = agent.execute(task)
             
+            # Agent 返回 LLM 用量时记入任务（usage 结构同 llm_metrics.record 的返回值）
+            usage = result.get("usage") if isinstance(result, dict) else None
+            if usage:
+                task.tokens_used += int(usage.get("total_tokens", 0))
+                task.cost += float(usage.get("cost", 0.0))
+            
             task.status = TaskStatus.COMPLETED
             task.completed_at = datetime.now()
             task.result = result